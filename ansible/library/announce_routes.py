@@ -1,5 +1,7 @@
 #!/usr/bin/python
 
+import binascii
+import bisect
 import itertools
 import math
 import os
@@ -12,7 +14,9 @@ import sys
 import socket
 import random
 import logging
+import threading
 import time
+from collections import deque
 from multiprocessing.pool import ThreadPool
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.debug_utils import config_module_logging
@@ -45,6 +49,10 @@ Options:
     - option-name: path
       description: to figure out the path of topo_{}.yml
       required: False
+
+    - option-name: max_concurrent_peers
+      description: max number of exabgp processes the routes are announced to at the same time
+      required: False
 '''
 
 EXAMPLES = '''
@@ -84,6 +92,7 @@ BGP_SCALE_T1S = [
     't1-isolated-d510u2', 't1-isolated-d510u2s2'
 ]
 ROUTES_BATCH_SIZE = 200
+MAX_CONCURRENT_PEERS = 16
 
 # Describe default number of COLOs
 COLO_NUMBER = 30
@@ -161,27 +170,140 @@ def read_topo(topo_name, path):
         return {}
 
 
-def change_routes(action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
-    logging.debug("action = {}, ptf_ip = {}, port = {}, routes_batch_size = {}, routes = {}"
-                  .format(action, ptf_ip, port, routes_batch_size, routes))
-    messages = []
+def generate_route_messages(action, routes):
     for prefix, nexthop, aspath in routes:
         if aspath:
-            messages.append(
-                "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath))
+            yield "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath)
         else:
-            messages.append(
-                "{} route {} next-hop {}".format(action, prefix, nexthop))
-    wait_for_http(ptf_ip, port, timeout=60)
-    url = "http://%s:%d" % (ptf_ip, port)
-    for i in range(0, len(messages), routes_batch_size):
-        batch_messages = messages[i:i+routes_batch_size]
-        data = {"commands": ";".join(batch_messages)}
-        logging.debug("Posting to url={} data={}".format(url, json.dumps(data)))
-        post_data_to_url(url, data)
-
-
-def post_data_to_url(url, data):
+            yield "{} route {} next-hop {}".format(action, prefix, nexthop)
+
+
+class RoutePeer(object):
+    """
+    Exabgp process in PTF container, which routes are changed through its HTTP API.
+
+    The batches are posted over a keep-alive HTTP session, and the throughput and latency are recorded.
+    """
+
+    def __init__(self, ptf_ip, port):
+        self.ptf_ip = ptf_ip
+        self.port = port
+        self.url = "http://%s:%d" % (ptf_ip, port)
+        self.session = requests.Session()
+        self.http_ready = False
+        self.routes = 0
+        self.batches = 0
+        self.post_time = 0.0
+        self.max_post_time = 0.0
+
+    def change_routes(self, action, routes, routes_batch_size=ROUTES_BATCH_SIZE):
+        if not self.http_ready:
+            wait_for_http(self.ptf_ip, self.port, timeout=60)
+            self.http_ready = True
+        messages = generate_route_messages(action, routes)
+        while True:
+            batch_messages = list(itertools.islice(messages, routes_batch_size))
+            if not batch_messages:
+                break
+            data = {"commands": ";".join(batch_messages)}
+            logging.debug("Posting to url={} data={}".format(self.url, json.dumps(data)))
+            start = time.time()
+            post_data_to_url(self.url, data, session=self.session)
+            post_time = time.time() - start
+            self.routes += len(batch_messages)
+            self.batches += 1
+            self.post_time += post_time
+            self.max_post_time = max(self.max_post_time, post_time)
+
+    def get_stats(self):
+        return {
+            "routes": self.routes,
+            "batches": self.batches,
+            "routes_per_second": round(self.routes / self.post_time, 1) if self.post_time else None,
+            "avg_batch_latency": round(self.post_time / self.batches, 3) if self.batches else None,
+            "max_batch_latency": round(self.max_post_time, 3)
+        }
+
+
+class RouteAnnouncer(object):
+    """
+    Changes routes of multiple exabgp processes concurrently.
+
+    The route changes of each exabgp process are queued and sent in order by one thread at a time, up to
+    max_concurrent_peers exabgp processes are served at the same time.
+    """
+
+    def __init__(self, max_concurrent_peers=MAX_CONCURRENT_PEERS):
+        self.pool = ThreadPool(processes=max_concurrent_peers)
+        self.condition = threading.Condition()
+        self.peers = {}
+        # Queued route changes of each peer, and the peers being served by the pool
+        self.queues = {}
+        self.active_peers = set()
+        self.errors = []
+
+    def submit(self, action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
+        with self.condition:
+            peer = self.peers.get((ptf_ip, port))
+            if peer is None:
+                peer = self.peers[(ptf_ip, port)] = RoutePeer(ptf_ip, port)
+                self.queues[peer] = deque()
+            self.queues[peer].append((action, routes, routes_batch_size))
+            if peer not in self.active_peers:
+                self.active_peers.add(peer)
+                self.pool.apply_async(self._serve_peer, (peer,))
+
+    def _serve_peer(self, peer):
+        while True:
+            with self.condition:
+                if not self.queues[peer]:
+                    self.active_peers.discard(peer)
+                    self.condition.notify_all()
+                    return
+                route_change = self.queues[peer].popleft()
+            try:
+                peer.change_routes(*route_change)
+            except Exception as e:
+                logging.error("Change routes of {} failed: {}".format(peer.url, repr(e)))
+                with self.condition:
+                    # The following changes may depend on the failed one
+                    self.queues[peer].clear()
+                    self.errors.append(e)
+
+    def wait(self):
+        """
+        Wait until all the submitted route changes are sent, raise the first error if any change failed.
+        """
+        with self.condition:
+            while self.active_peers:
+                self.condition.wait()
+        if self.errors:
+            raise self.errors[0]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        for peer in self.peers.values():
+            peer.session.close()
+
+    def get_stats(self):
+        return dict((peer.url, peer.get_stats()) for peer in self.peers.values())
+
+
+# Route changes are sent by this announcer while it is set, otherwise they are sent right away
+route_announcer = None
+
+
+def change_routes(action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
+    logging.debug("action = {}, ptf_ip = {}, port = {}, routes_batch_size = {}, routes = {}"
+                  .format(action, ptf_ip, port, routes_batch_size, routes))
+    if route_announcer is not None:
+        route_announcer.submit(action, ptf_ip, port, routes, routes_batch_size)
+    else:
+        RoutePeer(ptf_ip, port).change_routes(action, routes, routes_batch_size)
+
+
+def post_data_to_url(url, data, session=None):
     # nosemgrep-next-line
     # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while using `requests.post`
     # To avoid this error, we add sleep time before sending request.
@@ -189,7 +311,7 @@ def post_data_to_url(url, data):
     # If one retry fails, we increase the waiting time.
     for i in range(0, 5):
         try:
-            r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
+            r = (session or requests).post(url, data=data, timeout=360, proxies={"http": None, "https": None})
             break
         except Exception as e:
             logging.debug("Got exception {}, will try to connect again".format(e))
@@ -210,14 +332,9 @@ def post_data_to_url(url, data):
         )
 
 
-def send_routes_for_each_set(args):
-    routes, port, action, ptf_ip = args
-    change_routes(action, ptf_ip, port, routes)
-
-
 def send_routes_in_parallel(route_set):
     """
-    Sends the given set of routes in parallel using a thread pool.
+    Sends the given set of routes in parallel, by the route announcer.
 
     Args:
         route_set (list): A list of route sets to send.
@@ -225,20 +342,14 @@ def send_routes_in_parallel(route_set):
     Returns:
         None
     """
-    # Create a pool of worker processes
-    pool = ThreadPool(processes=len(route_set))
-
-    # Use the ThreadPool.map function to apply the function to each set of routes
-    results = pool.map(send_routes_for_each_set, route_set)
-
-    # Optionally, process the results
-    for result in results:
-        # Process individual results here
-        pass
-
-    # Close the pool and wait for all processes to complete
-    pool.close()
-    pool.join()
+    announcer = route_announcer or RouteAnnouncer()
+    for routes, port, action, ptf_ip in route_set:
+        announcer.submit(action, ptf_ip, port, routes)
+    if announcer is not route_announcer:
+        try:
+            announcer.wait()
+        finally:
+            announcer.close()
 
 
 # AS path from Leaf router for T0 topology
@@ -291,7 +402,7 @@ def get_uplink_router_as_path(uplink_router_type, spine_asn):
 # Generate prefixs of route
 def generate_prefix(subnet_size, ip_base, offset):
     ip = get_new_ip(ip_base, offset)
-    prefixlen = (ip_base.max_prefixlen - int(math.log(subnet_size, 2)))
+    prefixlen = ip_base.max_prefixlen - (int(subnet_size).bit_length() - 1)
     prefix = "{}/{}".format(ip, prefixlen)
     return prefix
 
@@ -752,6 +863,49 @@ def get_new_ip(curr_ip, skip_count):
     return new_ip
 
 
+def parse_prefix(prefix):
+    """
+    Parse the prefix into integers, the address in the prefix doesn't need to be the network address
+    Sample input:
+    str, "192.168.0.1/24"
+    Sample output:
+    (4, 3232235520, 3232235775), which are the ip version, first and last address of the prefix
+    """
+    address, _, prefixlen = str(prefix).partition("/")
+    if ":" in address:
+        version, family, max_prefixlen = 6, socket.AF_INET6, 128
+    else:
+        version, family, max_prefixlen = 4, socket.AF_INET, 32
+    value = int(binascii.hexlify(socket.inet_pton(family, address)), 16)
+    host_mask = (1 << (max_prefixlen - int(prefixlen or max_prefixlen))) - 1
+    first = value & ~host_mask
+    return version, first, first | host_mask
+
+
+class PrefixIntervals(object):
+    """
+    Address intervals of a set of prefixes, to check whether a prefix is a subnet of any of them.
+
+    Two prefixes are either disjoint or one contains the other, so the prefixes contained by another one are
+    dropped and the remaining intervals are sorted and disjoint, which can be searched by bisect.
+    """
+
+    def __init__(self, prefixes):
+        self.starts = {4: [], 6: []}
+        self.ends = {4: [], 6: []}
+        for version, first, last in sorted(parse_prefix(prefix) for prefix in prefixes):
+            ends = self.ends[version]
+            if ends and last <= ends[-1]:
+                continue
+            self.starts[version].append(first)
+            ends.append(last)
+
+    def contains(self, prefix):
+        version, first, last = parse_prefix(prefix)
+        index = bisect.bisect_right(self.starts[version], first) - 1
+        return index >= 0 and last <= self.ends[version][index]
+
+
 def get_next_ip_by_net(net_str):
     """
     Get the nearest next non-overlapping ip address based on the net_str
@@ -760,10 +914,8 @@ def get_next_ip_by_net(net_str):
     Sample output:
     <class 'ipaddress.ip_address'>, 192.168.3.0/32
     """
-    net = ipaddress.ip_network(UNICODE_TYPE(net_str), strict=False)
-    net_size = int(net.broadcast_address) + 1 - int(net.network_address)
-    next_net = get_new_ip(net.network_address, net_size)
-    return next_net
+    version, _, last = parse_prefix(net_str)
+    return (ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address)(last + 1)
 
 
 def get_next_ip(skip_nets):
@@ -779,14 +931,10 @@ def get_next_ip(skip_nets):
     Sample output:
     <class 'ipaddress.ip_address'>, 192.168.3.0/32
     """
-    max_next_ip = None
-    for vlan in skip_nets:
-        next_ip = get_next_ip_by_net(vlan)
-        if max_next_ip is None:
-            max_next_ip = next_ip
-        elif next_ip > max_next_ip:
-            max_next_ip = next_ip
-    return max_next_ip
+    if not skip_nets:
+        return None
+    version, last = max(parse_prefix(vlan)[::2] for vlan in skip_nets)
+    return (ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address)(last + 1)
 
 
 def get_ip_base_by_vlan_config(vlan_configs):
@@ -1653,11 +1801,11 @@ def adhoc_routes(topo, ptf_ip, peers_routes_to_change, action):
 
 
 def get_ipv4_routes(routes):
-    return [r for r in routes if ipaddress.ip_network(UNICODE_TYPE(r[0])).version == 4]
+    return [r for r in routes if parse_prefix(r[0])[0] == 4]
 
 
 def get_ipv6_routes(routes):
-    return [r for r in routes if ipaddress.ip_network(UNICODE_TYPE(r[0])).version == 6]
+    return [r for r in routes if parse_prefix(r[0])[0] == 6]
 
 
 def filterout_subnet_ipv4(aggregate_routes, candidate_routes):
@@ -1671,13 +1819,8 @@ def filterout_subnet_ipv6(aggregate_routes, candidate_routes):
 
 
 def filterout_subnet(aggregate_routes, candidate_routes):
-    subnets = []
-    for ar in aggregate_routes:
-        ar_net = ipaddress.ip_network(UNICODE_TYPE(ar[0]))
-        for cr in candidate_routes:
-            if ipaddress.ip_network(UNICODE_TYPE(cr[0])).subnet_of(ar_net):
-                subnets.append(cr)
-    return list(set(candidate_routes) - set(subnets))
+    aggregate_intervals = PrefixIntervals(ar[0] for ar in aggregate_routes)
+    return [cr for cr in candidate_routes if not aggregate_intervals.contains(cr[0])]
 
 
 def convert_routes_to_str(topo_routes):
@@ -1702,7 +1845,8 @@ def main():
             peers_routes_to_change=dict(required=False, type='dict', default={}),
             log_path=dict(required=False, type='str', default='/tmp'),
             upstream_neighbor_groups=dict(required=False, type='int', default=0),
-            downstream_neighbor_groups=dict(required=False, type='int', default=0)
+            downstream_neighbor_groups=dict(required=False, type='int', default=0),
+            max_concurrent_peers=dict(required=False, type='int', default=MAX_CONCURRENT_PEERS)
         ),
         supports_check_mode=False)
 
@@ -1733,53 +1877,56 @@ def main():
 
     topo_type = get_topo_type(topo_name)
     topo_routes = {}
+    result = dict(changed=True, topo_routes=topo_routes)
+    global route_announcer
+    route_announcer = RouteAnnouncer(module.params['max_concurrent_peers'])
     try:
         if adhoc:
             adhoc_routes(topo, ptf_ip, peers_routes_to_change, action)
-            module.exit_json(change=True)
+            result = dict(change=True)
         elif topo_type == "t0":
             fib_t0(topo, ptf_ip, no_default_route=is_storage_backend, action=action,
                    upstream_neighbor_groups=upstream_neighbor_groups, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t1" or topo_type == "smartswitch-t1":
             fib_t1_lag(
                 topo, ptf_ip, topo_name, no_default_route=is_storage_backend, action=action,
                 tor_default_route=tor_default_route, downstream_neighbor_groups=downstream_neighbor_groups,
                 topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t2":
             fib_t2_lag(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "t0-mclag":
             fib_t0_mclag(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "m1":
             fib_m1(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "m0":
             fib_m0(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "mx":
             fib_mx(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "c0":
             fib_c0(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(changed=True, topo_routes=convert_routes_to_str(topo_routes))
         elif topo_type == "dpu":
             fib_dpu(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=topo_routes)
         elif topo_type == "lt2":
             fib_lt2_routes(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=topo_routes)
         elif topo_type == "ft2":
             fib_ft2_routes(topo, ptf_ip, action=action, topo_routes=topo_routes)
-            module.exit_json(change=True, topo_routes=convert_routes_to_str(topo_routes))
+            result = dict(change=True, topo_routes=topo_routes)
         else:
-            module.exit_json(
-                msg='Unsupported topology "{}" - skipping announcing routes'.format(topo_name))
+            result = dict(msg='Unsupported topology "{}" - skipping announcing routes'.format(topo_name))
+        route_announcer.wait()
     except Exception as e:
         module.fail_json(msg='Announcing routes failed, topo_name={}, topo_type={}, exception={}'
                          .format(topo_name, topo_type, repr(e)))
+    finally:
+        route_announcer.close()
+
+    announce_stats = route_announcer.get_stats()
+    logging.debug("Announce stats: {}".format(json.dumps(announce_stats)))
+    if "topo_routes" in result:
+        result["topo_routes"] = convert_routes_to_str(topo_routes)
+    module.exit_json(announce_stats=announce_stats, **result)
 
 
 if __name__ == '__main__':
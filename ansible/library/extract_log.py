@@ -10,6 +10,7 @@ import hashlib
 import sys
 import re
 import gzip
+import mmap
 import os
 import locale
 DOCUMENTATION = '''
@@ -20,6 +21,10 @@ description: The module scans the 'directory' in search of files which filenames
 The found files are ungzipped and combined together in the rotation order. After that all lines after
 'start_string' are copied into a file with name 'target_filename'. All input strings with 'nsible' in it
 aren't considered as 'start_string' to avoid clashing with ansible output.
+When 'end_string' is set, only the window between the last 'start_string' and the first following 'end_string'
+is streamed into 'target_filename'. The rotated files are searched for the start string from the newest one,
+plain files are searched backwards from their end, and the files before the start string are not read at all.
+The module returns a manifest with the byte range copied from each file then.
 
 Options:
     - option-name: directory
@@ -42,6 +47,17 @@ Options:
       required: True
       Default: None
 
+    - option-name: end_string
+      description: a string which first copy after the start tag is used as an end tag, the line with it
+                   is the last extracted line
+      required: False
+      Default: None
+
+    - option-name: compress
+      description: save the extracted lines gzip compressed, so the file is quicker to fetch
+      required: False
+      Default: False
+
 '''
 
 EXAMPLES = '''
@@ -58,6 +74,15 @@ EXAMPLES = '''
     dest: '/tmp/'
     flat: yes
 
+- name: Extract syslog entries between the loganalyzer markers into a compressed file
+  extract_log:
+    directory: '/var/log'
+    file_prefix: 'syslog'
+    start_string: 'start-LogAnalyzer-test.2023-01-01-00:00:00'
+    end_string: 'end-LogAnalyzer-test.2023-01-01-00:00:00'
+    target_filename: '/tmp/syslog.gz'
+    compress: yes
+
 - name: Extract all sairedis.rec entries since the last reboot
   extract_log:
     directory: '/var/log/swss'
@@ -88,6 +113,9 @@ EXAMPLES = '''
 
 logger = logging.getLogger('ExtractLog')
 
+# Size of the blocks in which a plain log file is searched backwards for the start string
+SEEK_BLOCK_SIZE = 1024 * 1024
+
 
 def extract_lines(directory, filename, target_string):
     path = os.path.join(directory, filename)
@@ -249,11 +277,17 @@ def calculate_files_to_copy(filenames, file_with_latest_line):
     return files_to_copy
 
 
-def combine_logs_and_save(directory, filenames, start_string, target_string, target_filename):
+def open_target_file(target_filename, compress, mode):
+    if compress:
+        return gzip.open(target_filename, mode=mode)
+    return open(target_filename, mode)
+
+
+def combine_logs_and_save(directory, filenames, start_string, target_string, target_filename, compress=False):
     do_copy = False
     line_processed = 0
     line_copied = 0
-    with open(target_filename, 'w') as fp:
+    with open_target_file(target_filename, compress, 'wt') as fp:
         for filename in reversed(filenames):
             path = os.path.join(directory, filename)
             dt = datetime.datetime.fromtimestamp(os.path.getctime(path))
@@ -282,10 +316,97 @@ def combine_logs_and_save(directory, filenames, start_string, target_string, tar
                 path, line_processed, line_copied))
 
 
-def extract_log(directory, prefixname, target_string, target_filename):
+def is_extract_log_line(line):
+    """Lines logged on behalf of the extract_log module mention the start and end strings too"""
+    return b'extract_log' in line
+
+
+def find_last_line_offset(path, target_string):
+    """Returns the offset of the last line with @target_string in the file @path, or None if there is no such line.
+    Plain files are searched backwards from their end in blocks of SEEK_BLOCK_SIZE bytes, so only the tail of the
+    file is read. Compressed files can't be searched backwards, they are streamed and the offset is in the
+    decompressed content"""
+    target = target_string.encode('utf-8')
+    if 'gz' in path:
+        found = None
+        offset = 0
+        with gzip.open(path, mode='rb') as f:
+            for line in f:
+                if target in line and not is_extract_log_line(line):
+                    found = offset
+                offset += len(line)
+        return found
+
+    if os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        log_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        end = len(log_map)
+        while end >= len(target):
+            begin = max(0, end - SEEK_BLOCK_SIZE)
+            pos = log_map.rfind(target, begin, end)
+            if pos == -1:
+                if begin == 0:
+                    break
+                # Overlap the next block so a string crossing the block boundary is found
+                end = begin + len(target) - 1
+                continue
+            line_start = log_map.rfind(b'\n', 0, pos) + 1
+            line_end = log_map.find(b'\n', pos)
+            line_end = len(log_map) if line_end == -1 else line_end + 1
+            if not is_extract_log_line(log_map[line_start:line_end]):
+                return line_start
+            end = pos + len(target) - 1
+    finally:
+        log_map.close()
+    return None
+
+
+def extract_window_and_save(directory, filenames, start_string, end_string, target_filename, compress=False):
+    """Copies the lines from the last line with @start_string up to the first following line with @end_string
+    into @target_filename. Assumes @filenames are sorted and first file in @filenames is the newest log file.
+    Returns the manifest, a list of the copied byte ranges of the files in the rotation order"""
+    for start_index, filename in enumerate(filenames):
+        start_offset = find_last_line_offset(os.path.join(directory, filename), start_string)
+        if start_offset is not None:
+            break
+    else:
+        raise Exception("{} was not found in {}".format(start_string, directory))
+
+    end = end_string.encode('utf-8')
+    manifest = []
+    with open_target_file(target_filename, compress, 'wb') as fp:
+        for index in range(start_index, -1, -1):
+            path = os.path.join(directory, filenames[index])
+            start = start_offset if index == start_index else 0
+            position = start
+            end_found = False
+            with (gzip.open(path, mode='rb') if 'gz' in path else open(path, 'rb')) as f:
+                f.seek(start)
+                for line in f:
+                    fp.write(line)
+                    position += len(line)
+                    if end in line and not is_extract_log_line(line):
+                        end_found = True
+                        break
+            manifest.append({'file': path, 'start': start, 'end': position})
+            logger.debug("extract_log window from file {}, bytes {}-{}".format(path, start, position))
+            if end_found:
+                break
+        else:
+            logger.debug("extract_log end string {} was not found".format(end_string))
+    return manifest
+
+
+def extract_log(directory, prefixname, target_string, target_filename, end_string=None, compress=False):
     logger.debug("extract_log for start string {}".format(
         target_string.replace("start-", "")))
     filenames = list_files(directory, prefixname)
+    if end_string:
+        logger.debug("extract_log window from files {}".format(filenames))
+        return extract_window_and_save(directory, filenames, target_string, end_string, target_filename, compress)
+
     logger.debug("extract_log from files {}".format(filenames))
     file_with_latest_line, file_create_time, latest_line, file_size = extract_latest_line_with_string(
         directory, filenames, target_string)
@@ -296,9 +417,10 @@ def extract_log(directory, prefixname, target_string, target_filename):
     files_to_copy = calculate_files_to_copy(filenames, file_with_latest_line)
     logger.debug("extract_log subsequent files {}".format(files_to_copy))
     combine_logs_and_save(directory, files_to_copy,
-                          latest_line, target_string, target_filename)
+                          latest_line, target_string, target_filename, compress)
     filenames = list_files(directory, prefixname)
     logger.debug("extract_log check logs files {}".format(filenames))
+    return None
 
 
 def main():
@@ -308,6 +430,8 @@ def main():
             file_prefix=dict(required=True, type='str'),
             start_string=dict(required=True, type='str'),
             target_filename=dict(required=True, type='str'),
+            end_string=dict(required=False, type='str', default=None),
+            compress=dict(required=False, type='bool', default=False),
         ),
         supports_check_mode=False)
 
@@ -318,12 +442,14 @@ def main():
     p = module.params
 
     try:
-        extract_log(p['directory'], p['file_prefix'],
-                    p['start_string'], p['target_filename'])
+        manifest = extract_log(p['directory'], p['file_prefix'], p['start_string'], p['target_filename'],
+                               end_string=p['end_string'], compress=p['compress'])
     except Exception:
         tb = traceback.format_exc()
         module.fail_json(msg=tb)
-    module.exit_json()
+    if manifest is None:
+        module.exit_json()
+    module.exit_json(manifest=manifest)
 
 
 if __name__ == '__main__':
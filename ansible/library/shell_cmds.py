@@ -4,7 +4,7 @@
 # The ansible builtin module "command" and "shell" can run a single command on the remote device and get its output.
 # This module is to support running multiple commands in sequential and return the results of these commands. This
 # enhancement can reduce some overhead of establishing connection with the remote host when we want to run multiple
-# commands.
+# commands. The commands can also be run concurrently by specifying option "parallel".
 #
 # Example of module output:
 # {
@@ -24,7 +24,8 @@
 #       "cmd_with_timeout": "",
 #       "rc": 0,
 #       "timeout": 0,
-#       "err_msg": ""
+#       "err_msg": "",
+#       "duration": 0.004021
 #     },
 #     {
 #       "stderr_lines": [],
@@ -37,7 +38,8 @@
 #       "cmd_with_timeout": "",
 #       "rc": 0,
 #       "timeout": 0,
-#       "err_msg": ""
+#       "err_msg": "",
+#       "duration": 0.003893
 #     }
 #   ],
 #   "cmds": [
@@ -52,12 +54,14 @@
 #         "ls /home",
 #         "pwd"
 #       ],
-#       "continue_on_fail": false
+#       "continue_on_fail": false,
+#       "parallel": false
 #     }
 #   }
 # }
 
 import datetime
+import threading
 
 from ansible.module_utils.basic import AnsibleModule
 
@@ -73,6 +77,8 @@ options:
     cmds: List of commands. Each command should be a string.
     continue_on_fail: Bool. Specify whether to continue running rest of the commands if any of the command failed.
     timeout: Integer. Specify time limit (in second) for each command. 0 means no limit. Default value is 0.
+    parallel: Bool. Run the commands concurrently. When continue_on_fail is False, the commands which have not
+              started yet when a command fails are not run. Default value is False.
 '''
 
 EXAMPLES = r'''
@@ -84,8 +90,19 @@ EXAMPLES = r'''
         - pwd
     continue_on_fail: False
     timeout: 30
+
+# Run multiple commands concurrently
+- name: Run multiple commands on remote host in parallel
+  shell_cmds:
+    cmds:
+        - config interface shutdown Ethernet0
+        - config interface shutdown Ethernet4
+    parallel: True
 '''
 
+# Maximum number of commands run concurrently in parallel mode
+MAX_PARALLEL_CMDS = 16
+
 
 def run_cmd(module, cmd, timeout):
     cmd_with_timeout = ''
@@ -114,36 +131,67 @@ def run_cmd(module, cmd, timeout):
         stderr_lines=err.splitlines(),
         timeout=timeout,
         start=str(start),
-        end=str(end)
+        end=str(end),
+        duration=(end - start).total_seconds()
     )
     return result
 
 
+def run_cmds_in_parallel(module, cmds, timeout, continue_on_fail):
+    """Run the commands concurrently, return the results of the commands which were run in the original order."""
+    results = [None] * len(cmds)
+    pending = list(range(len(cmds)))
+    lock = threading.Lock()
+    failed = threading.Event()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending or failed.is_set():
+                    return
+                index = pending.pop(0)
+            result = run_cmd(module, cmds[index], timeout)
+            results[index] = result
+            if result['rc'] != 0 and not continue_on_fail:
+                failed.set()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(len(cmds), MAX_PARALLEL_CMDS))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [result for result in results if result is not None]
+
+
 def main():
 
     module = AnsibleModule(
         argument_spec=dict(
             cmds=dict(type='list', required=True),
             continue_on_fail=dict(type='bool', default=True),
-            timeout=dict(type='int', default=0)
+            timeout=dict(type='int', default=0),
+            parallel=dict(type='bool', default=False)
         )
     )
 
     cmds = module.params['cmds']
     continue_on_fail = module.params['continue_on_fail']
     timeout = module.params['timeout']
+    parallel = module.params['parallel']
 
     startd = datetime.datetime.now()
 
     results = []
-    failed_cmds = []
-    for cmd in cmds:
-        result = run_cmd(module, cmd, timeout)
-        results.append(result)
-        if result['rc'] != 0:
-            failed_cmds.append(cmd)
-            if not continue_on_fail:
+    if parallel and cmds:
+        results = run_cmds_in_parallel(module, cmds, timeout, continue_on_fail)
+    else:
+        for cmd in cmds:
+            result = run_cmd(module, cmd, timeout)
+            results.append(result)
+            if result['rc'] != 0 and not continue_on_fail:
                 break
+    failed_cmds = [result['cmd'] for result in results if result['rc'] != 0]
 
     endd = datetime.datetime.now()
     delta = endd - startd
@@ -1,9 +1,23 @@
+import array
+import binascii
+import bisect
+import hashlib
+import os
+import pickle
 import re
+import socket
+import sys
+import tempfile
 import six
 
-from ipaddress import ip_address, ip_network
+from ipaddress import ip_address, IPv4Address, IPv6Address
 from lpm import LpmDict
 
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 # These subnets are excluded from FIB test
 # reference: RFC 5735 Special Use IPv4 Addresses
 #            RFC 5156 Special Use IPv6 Addresses
@@ -25,6 +39,66 @@ EXCLUDE_IPV6_PREFIXES = [
     'ff00::/8'              # Multicast             RFC 4291
 ]
 
+# Bump when the format of the cached FIB changes
+FIB_CACHE_VERSION = 1
+FIB_CACHE_DIR = tempfile.gettempdir()
+
+'''
+Fib is a class used in FIB test for LPM and IP segmentation.
+
+The prefixes of the FIB file segment the whole IP space into ranges: every
+prefix starts a range at its first IP and at the IP after its last IP. The
+range boundaries are kept as a sorted array of integers per IP version, and
+every range is mapped to the next hop of its longest matching prefix, so an
+LPM lookup is a binary search of the boundaries. The next hops are interned,
+a FIB has only a few distinct next hop groups.
+
+Parsing a big FIB file takes a while, so the parsed FIB is cached in a file
+named by the hash of the FIB file and of the excluded prefixes.
+'''
+
+
+class IpRanges(Sequence):
+    """
+    Sequence of the IP ranges of a FIB, the ranges are created on access. Partial slices are views of the same
+    boundaries, full and stepped slices are lists.
+    """
+
+    def __init__(self, boundaries, address_class, start=0, stop=None):
+        self._boundaries = boundaries
+        self._address_class = address_class
+        self._max_ip = (1 << address_class(0).max_prefixlen) - 1
+        self._start = start
+        self._stop = len(boundaries) if stop is None else stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1 or (start, stop) == (0, len(self)):
+                # a copy of the ranges, callers shuffle or change it
+                return [self[i] for i in range(start, stop, step)]
+            return IpRanges(self._boundaries, self._address_class,
+                            self._start + start, self._start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IP range index out of range")
+        index += self._start
+        if index + 1 < len(self._boundaries):
+            end = self._boundaries[index + 1] - 1
+        else:
+            end = self._max_ip
+        return LpmDict.IpInterval(self._address_class(self._boundaries[index]), self._address_class(end))
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
 
 class Fib():
     class NextHop():
@@ -46,45 +120,130 @@ class Fib():
 
     # Initialize FIB with FIB file
     def __init__(self, file_path):
-        self._ipv4_lpm_dict = LpmDict()
-        for ip in EXCLUDE_IPV4_PREFIXES:
-            self._ipv4_lpm_dict[ip] = self.NextHop()
-
-        self._ipv6_lpm_dict = LpmDict(ipv4=False)
-        for ip in EXCLUDE_IPV6_PREFIXES:
-            self._ipv6_lpm_dict[ip] = self.NextHop()
-
-        # filter out empty lines and lines starting with '#'
-        pattern = re.compile("^#.*$|^[ \t]*$")
-
-        with open(file_path, 'r') as f:
-            for line in f.readlines():
-                if pattern.match(line):
-                    continue
-                entry = line.split(' ', 1)
-                prefix = ip_network(six.text_type(entry[0]))
-                next_hop = self.NextHop(entry[1])
-                if prefix.version == 4:
-                    self._ipv4_lpm_dict[str(prefix)] = next_hop
-                elif prefix.version == 6:
-                    self._ipv6_lpm_dict[str(prefix)] = next_hop
-
-    def __getitem__(self, ip):
+        with open(file_path, 'rb') as f:
+            content = f.read()
+
+        digest = hashlib.sha1(content)
+        digest.update(repr((FIB_CACHE_VERSION, sys.version_info[0],
+                            EXCLUDE_IPV4_PREFIXES, EXCLUDE_IPV6_PREFIXES)).encode())
+        cache_file = os.path.join(FIB_CACHE_DIR, 'fib_{}.pickle'.format(digest.hexdigest()))
+        try:
+            with open(cache_file, 'rb') as f:
+                next_hops, tables = pickle.load(f)
+        except Exception:
+            next_hops, tables = self._parse(content.decode())
+            self._save_cache(cache_file, (next_hops, tables))
+
+        # Next hops are interned, the ranges refer to them by index
+        self._next_hops = [self.NextHop(next_hop) for next_hop in next_hops]
+        (self._ipv4_boundaries, self._ipv4_next_hops), (self._ipv6_boundaries, self._ipv6_next_hops) = tables
+
+    @staticmethod
+    def _save_cache(cache_file, data):
+        try:
+            fd, tmp_file = tempfile.mkstemp(dir=FIB_CACHE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def _parse(content):
+        """
+        Parse the FIB file content.
+
+        Returns: (next hop strings, ((IPv4 boundaries, IPv4 range next hops), (IPv6 boundaries, IPv6 range next hops)))
+            where range next hops are indices of the next hop strings, -1 for ranges not covered by any prefix.
+        """
+        next_hop_indices = {'': 0}
+        # (network, prefix length) => next hop index
+        prefixes = {4: {}, 6: {}}
+
+        def add_prefix(prefix, next_hop):
+            address, _, prefixlen = prefix.partition('/')
+            if ':' in address:
+                version, family, bits = 6, socket.AF_INET6, 128
+            else:
+                version, family, bits = 4, socket.AF_INET, 32
+            network = int(binascii.hexlify(socket.inet_pton(family, address)), 16)
+            prefixlen = int(prefixlen) if prefixlen else bits
+            if not 0 <= prefixlen <= bits:
+                raise ValueError('{} is not a valid prefix'.format(prefix))
+            if network & (((1 << bits) - 1) >> prefixlen):
+                raise ValueError('{} has host bits set'.format(prefix))
+            if next_hop not in next_hop_indices:
+                next_hop_indices[next_hop] = len(next_hop_indices)
+            prefixes[version][(network, prefixlen)] = next_hop_indices[next_hop]
+
+        for prefix in EXCLUDE_IPV4_PREFIXES + EXCLUDE_IPV6_PREFIXES:
+            add_prefix(prefix, '')
+
+        for line in content.splitlines():
+            # filter out empty lines and lines starting with '#'
+            if line.startswith('#') or not line.strip(' \t'):
+                continue
+            entry = line.split(' ', 1)
+            add_prefix(entry[0], entry[1].strip() if len(entry) > 1 else '')
+
+        next_hops = sorted(next_hop_indices, key=next_hop_indices.get)
+        tables = (Fib._build_ranges(prefixes[4], 32, array.array('L')),
+                  Fib._build_ranges(prefixes[6], 128, []))
+        return next_hops, tables
+
+    @staticmethod
+    def _build_ranges(prefixes, bits, boundaries):
+        """
+        Segment the IP space by the prefixes and find the next hop of the longest matching prefix of every range.
+
+        The prefixes are either nested or disjoint, so while the ranges are walked in order, the prefixes covering
+        the current range form a stack with the longest matching prefix on the top.
+        """
+        max_ip = (1 << bits) - 1
+        # The first IP is a non-routable meta-address, it is always a boundary
+        starts = {0}
+        for network, prefixlen in prefixes:
+            # The default route doesn't segment the IP space
+            if prefixlen:
+                starts.add(network)
+                end = network | (max_ip >> prefixlen)
+                if end != max_ip:
+                    starts.add(end + 1)
+        boundaries.extend(sorted(starts))
+
+        ordered_prefixes = sorted(prefixes)
+        range_next_hops = array.array('l')
+        covering = []
+        index = 0
+        for start in boundaries:
+            while covering and covering[-1][0] < start:
+                covering.pop()
+            while index < len(ordered_prefixes) and ordered_prefixes[index][0] == start:
+                network, prefixlen = ordered_prefixes[index]
+                covering.append((network | (max_ip >> prefixlen), prefixes[ordered_prefixes[index]]))
+                index += 1
+            range_next_hops.append(covering[-1][1] if covering else -1)
+        return boundaries, range_next_hops
+
+    def _lookup(self, ip):
         ip = ip_address(six.text_type(ip))
         if ip.version == 4:
-            return self._ipv4_lpm_dict[str(ip)]
-        elif ip.version == 6:
-            return self._ipv6_lpm_dict[str(ip)]
+            boundaries, range_next_hops = self._ipv4_boundaries, self._ipv4_next_hops
+        else:
+            boundaries, range_next_hops = self._ipv6_boundaries, self._ipv6_next_hops
+        return range_next_hops[bisect.bisect_right(boundaries, int(ip)) - 1]
+
+    def __getitem__(self, ip):
+        next_hop = self._lookup(ip)
+        if next_hop < 0:
+            raise KeyError(ip)
+        return self._next_hops[next_hop]
 
     def __contains__(self, ip):
-        ip_obj = ip_address(six.text_type(ip))
-        if ip_obj.version == 4:
-            return self._ipv4_lpm_dict.contains(ip)
-        elif ip_obj.version == 6:
-            return self._ipv6_lpm_dict.contains(ip)
+        return self._lookup(ip) >= 0
 
     def ipv4_ranges(self):
-        return self._ipv4_lpm_dict.ranges()
+        return IpRanges(self._ipv4_boundaries, IPv4Address)
 
     def ipv6_ranges(self):
-        return self._ipv6_lpm_dict.ranges()
+        return IpRanges(self._ipv6_boundaries, IPv6Address)
@@ -0,0 +1,51 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fib  # noqa: E402
+
+FIB_CONTENT = """\
+# two routes
+192.168.0.0/24 [0 1]
+20.0.0.0/8 [2]
+"""
+
+
+class TestIpRanges(unittest.TestCase):
+    """Test cases for the IP ranges of a FIB."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = fib.FIB_CACHE_DIR
+        fib.FIB_CACHE_DIR = self.tmp_dir
+        fib_file = os.path.join(self.tmp_dir, 'fib.txt')
+        with open(fib_file, 'w') as f:
+            f.write(FIB_CONTENT)
+        self.fib = fib.Fib(fib_file)
+
+    def tearDown(self):
+        fib.FIB_CACHE_DIR = self.cache_dir
+        shutil.rmtree(self.tmp_dir)
+
+    # The test scripts shuffle the full slice of the ranges of small FIBs
+    def test_full_slice_can_be_shuffled(self):
+        ip_ranges = self.fib.ipv4_ranges()
+        covered_ip_ranges = ip_ranges[:]
+        random.shuffle(covered_ip_ranges)
+        self.assertEqual(sorted(str(r.get_first_ip()) for r in covered_ip_ranges),
+                         sorted(str(r.get_first_ip()) for r in ip_ranges))
+
+    def test_partial_slice(self):
+        ip_ranges = self.fib.ipv4_ranges()
+        self.assertEqual([str(r.get_first_ip()) for r in ip_ranges[1:3]],
+                         [str(r.get_first_ip()) for r in list(ip_ranges)[1:3]])
+        self.assertEqual(len(ip_ranges[:2] + ip_ranges[2:]), len(ip_ranges))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,7 @@ Usage:          Examples of how to use log analyzer
 
 import sys
 import getopt
+import json
 import re
 import os
 import os.path
@@ -32,9 +33,16 @@ import csv
 import time
 import logging
 import logging.handlers
+import mmap
+import shutil
 import subprocess
 from datetime import datetime
 
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
 # ---------------------------------------------------------------------
 # Global variables
 # ---------------------------------------------------------------------
@@ -58,6 +66,144 @@ err_start_ignore_marker = -8
 # will not be picked up by the analyzer.
 MAX_LOG_MESSAGE_LENGTH = 1000
 
+# -- Block size used to seek backwards through the log file for the start marker
+MARKER_SEEK_BLOCK_SIZE = 1024 * 1024
+
+# -- Shortest literal substring of a regex which is worth using for prefiltering log lines
+MIN_REQUIRED_LITERAL_LENGTH = 3
+
+
+def extract_required_literal(pattern):
+    '''
+    @summary: Find the longest literal substring which every match of the regex must contain.
+
+    Only literals placed directly in the top level sequence of the regex are considered,
+    everything else (alternations, repeats, classes) breaks the literal run.
+
+    @param pattern: regular expression string.
+
+    @return: Literal string, or None if the regex has no usable literal.
+    '''
+    parsed = sre_parse.parse(pattern)
+    state = getattr(parsed, 'state', None) or parsed.pattern
+    if state.flags & re.IGNORECASE:
+        return None
+
+    literal = ''
+    current = []
+    for op, av in list(parsed) + [(None, None)]:
+        if op == sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if len(current) > len(literal):
+            literal = ''.join(current)
+        current = []
+
+    return literal if len(literal) >= MIN_REQUIRED_LITERAL_LENGTH else None
+
+
+class MessagePatternSet:
+    '''
+    @summary: Set of regular expressions matched against log lines in a single pass.
+
+    Every regex is compiled on its own. Lines are first checked against one regex built of
+    the required literal substrings of all the patterns, and only the patterns whose literal
+    is present in the line (plus patterns without a literal) are confirmed with their regex.
+    This keeps the analysis time proportional to the log size rather than to the log size
+    times the number of patterns.
+    '''
+
+    # -- pattern string -> (compiled regex, required literal), shared by all pattern sets
+    compiled_patterns = {}
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # -- Combined regex string, kept for diagnostic messages
+        self.pattern = '|'.join(self.patterns)
+        self.regexes = []
+
+        literal_indices = {}
+        self.unfiltered_indices = []
+        for index, pattern in enumerate(self.patterns):
+            if pattern not in self.compiled_patterns:
+                self.compiled_patterns[pattern] = (re.compile(pattern), extract_required_literal(pattern))
+            regex, literal = self.compiled_patterns[pattern]
+            self.regexes.append(regex)
+            if literal is None:
+                self.unfiltered_indices.append(index)
+            else:
+                literal_indices.setdefault(literal, []).append(index)
+
+        self.literal_indices = list(literal_indices.items())
+        if self.literal_indices:
+            self.literal_regex = re.compile('|'.join(re.escape(literal) for literal, _ in self.literal_indices))
+        else:
+            self.literal_regex = None
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def candidate_indices(self, line):
+        '''
+        @summary: Get indices of the patterns which may match the line, in pattern order.
+        '''
+        if self.literal_regex is None or not self.literal_regex.search(line):
+            return self.unfiltered_indices
+
+        candidates = list(self.unfiltered_indices)
+        for literal, indices in self.literal_indices:
+            if literal in line:
+                candidates.extend(indices)
+        candidates.sort()
+        return candidates
+
+    def find(self, line, anchored=False):
+        '''
+        @summary: Find the first pattern matching the line.
+
+        @param line: log line to be matched.
+
+        @param anchored: match the patterns at the beginning of the line only.
+
+        @return: Index of the matched pattern, or None if no pattern matches.
+        '''
+        for index in self.candidate_indices(line):
+            regex = self.regexes[index]
+            if (regex.match(line) if anchored else regex.search(line)):
+                return index
+        return None
+
+    def find_all(self, line):
+        '''
+        @summary: Get indices of all the patterns matching the line.
+        '''
+        return [index for index in self.candidate_indices(line) if self.regexes[index].search(line)]
+
+    def search(self, line):
+        return self.find(line) is not None
+
+    def match(self, line):
+        return self.find(line, anchored=True) is not None
+
+
+def find_unused_regex(messages_regex, lines):
+    '''
+    @summary: Find regular expressions which do not match any of the lines.
+
+    @param messages_regex: list of regular expression strings.
+
+    @param lines: list of log lines.
+
+    @return: List of regular expressions without matches, in the original order.
+    '''
+    pattern_set = MessagePatternSet(messages_regex)
+    used = set()
+    for line in lines:
+        used.update(pattern_set.find_all(line))
+        if len(used) == len(pattern_set):
+            break
+    return [regex for index, regex in enumerate(pattern_set.patterns) if index not in used]
+
 
 class AnsibleLogAnalyzer:
     '''
@@ -246,6 +392,81 @@ class AnsibleLogAnalyzer:
 
         return False
 
+    def create_checkpoint_file_path(self, out_dir):
+        return os.path.join(out_dir, "checkpoint.loganalysis." + self.run_id)
+    # ---------------------------------------------------------------------
+
+    def save_log_checkpoint(self, checkpoint_file, log_file=system_log_file):
+        '''
+        @summary: Save inode and size of the log file, the log appended after this point
+                  can later be extracted by extract_log_since_checkpoint().
+
+        @param checkpoint_file: File path to store the checkpoint.
+        @param log_file:        Log file to take the checkpoint of.
+        '''
+        log_stat = os.stat(log_file)
+        with open(checkpoint_file, 'w') as fp:
+            fp.write('%d %d\n' % (log_stat.st_ino, log_stat.st_size))
+        self.print_diagnostic_message(
+            'log file:{}, checkpoint inode {} offset {}'.format(log_file, log_stat.st_ino, log_stat.st_size))
+
+    def extract_log_since_checkpoint(self, checkpoint_file, target_file, log_file=system_log_file):
+        '''
+        @summary: Copy the log appended since the checkpoint into the target file.
+
+        The log may be rotated once after the checkpoint was taken, either by renaming
+        the log file to <log_file>.1 or by copying it there and truncating the log file.
+        In that case the tail of <log_file>.1 is copied followed by the whole log file.
+
+        @param checkpoint_file: File path of the checkpoint saved by save_log_checkpoint().
+        @param target_file:     File path to store the extracted log.
+        @param log_file:        Log file the checkpoint was taken of.
+
+        @return: True if the extracted log contains both start and end markers,
+                 False if it has to be extracted from all the rotated log files.
+        '''
+        if not os.path.exists(checkpoint_file):
+            self.print_diagnostic_message('checkpoint {} not found'.format(checkpoint_file))
+            return False
+
+        with open(checkpoint_file, 'r') as fp:
+            inode, offset = [int(item) for item in fp.read().split()]
+        os.remove(checkpoint_file)
+
+        rotated_log_file = log_file + '.1'
+        with open(log_file, 'rb') as log_fp:
+            log_stat = os.fstat(log_fp.fileno())
+            if log_stat.st_ino == inode and log_stat.st_size >= offset:
+                sources = [(log_fp, offset)]
+            elif os.path.exists(rotated_log_file):
+                rotated_fp = open(rotated_log_file, 'rb')
+                rotated_stat = os.fstat(rotated_fp.fileno())
+                if rotated_stat.st_size < offset or inode not in (rotated_stat.st_ino, log_stat.st_ino):
+                    rotated_fp.close()
+                    self.print_diagnostic_message('log file:{} rotated more than once'.format(log_file))
+                    return False
+                sources = [(rotated_fp, offset), (log_fp, 0)]
+            else:
+                return False
+
+            with open(target_file, 'wb') as target_fp:
+                for source_fp, source_offset in sources:
+                    source_fp.seek(source_offset)
+                    shutil.copyfileobj(source_fp, target_fp)
+                    if source_fp is not log_fp:
+                        source_fp.close()
+
+        if os.path.getsize(target_file) == 0:
+            return False
+        with open(target_file, 'rb') as target_fp:
+            log_map = mmap.mmap(target_fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return (self.find_start_marker_line(log_map, self.create_start_marker()) is not None and
+                        log_map.rfind(self.create_end_marker().encode('utf-8')) != -1)
+            finally:
+                log_map.close()
+    # ---------------------------------------------------------------------
+
     def place_marker(self, log_file_list, marker, wait_for_marker=False):
         '''
         @summary: Place marker into '/dev/log' and each log file specified.
@@ -306,8 +527,8 @@ class AnsibleLogAnalyzer:
 
         @param file_list : List of file paths, contains search expressions.
 
-        @return: A regex class instance, corresponding to loaded regex expressions.
-            Will be used for matching operations by callers.
+        @return: A MessagePatternSet instance, corresponding to loaded regex expressions,
+            and the list of the regex expressions. Will be used for matching operations by callers.
         '''
         messages_regex = []
 
@@ -359,7 +580,7 @@ class AnsibleLogAnalyzer:
                         sys.exit(err_invalid_string_format)
 
         if (len(messages_regex)):
-            regex = re.compile('|'.join(messages_regex))
+            regex = MessagePatternSet(messages_regex)
         else:
             regex = None
         return regex, messages_regex
@@ -376,21 +597,21 @@ class AnsibleLogAnalyzer:
             'ignore' set - will not be reported (will be ignored)
 
         @param match_messages_regex:
-            regex class instance containing messages to match against.
+            MessagePatternSet or regex class instance containing messages to match against.
 
         @param ignore_messages_regex:
-            regex class instance containing messages to ignore match against.
+            MessagePatternSet or regex class instance containing messages to ignore match against.
 
         @return: True is str matches regex criteria, otherwise False.
         '''
 
         ret_code = False
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
+        if ((match_messages_regex is not None) and (match_messages_regex.search(str))):
             if (ignore_messages_regex is None):
                 ret_code = True
 
-            elif (not ignore_messages_regex.findall(str)):
+            elif (not ignore_messages_regex.search(str)):
                 self.print_diagnostic_message('matching line: %s' % str)
                 ret_code = True
 
@@ -411,17 +632,74 @@ class AnsibleLogAnalyzer:
             if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
                 ret_code = True
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
+            if (expect_messages_regex is not None) and (expect_messages_regex.search(str)):
                 ret_code = True
 
         return ret_code
 
+    def find_start_marker_line(self, log_map, start_marker):
+        '''
+        @summary: Seek backwards through a memory mapped log file for the last line
+                  containing the start marker.
+
+        The file is searched from its end in blocks of MARKER_SEEK_BLOCK_SIZE bytes,
+        so only the tail of the log which follows the start marker is paged in.
+        Lines which mention the marker on behalf of extract_log are skipped.
+
+        @param log_map: mmap object of the log file.
+
+        @param start_marker: start marker string.
+
+        @return: Tuple (line_start, line_end) with byte offsets of the start marker line,
+                 or None if the marker was not found.
+        '''
+        marker = start_marker.encode('utf-8')
+        end = len(log_map)
+        while end >= len(marker):
+            begin = max(0, end - MARKER_SEEK_BLOCK_SIZE)
+            pos = log_map.rfind(marker, begin, end)
+            if pos == -1:
+                if begin == 0:
+                    break
+                # -- Overlap the next block so a marker crossing the block boundary is found
+                end = begin + len(marker) - 1
+                continue
+
+            line_start = log_map.rfind(b'\n', 0, pos) + 1
+            line_end = log_map.find(b'\n', pos)
+            line_end = len(log_map) if line_end == -1 else line_end + 1
+            if b'extract_log' not in log_map[line_start:line_end]:
+                return line_start, line_end
+            end = pos + len(marker) - 1
+
+        return None
+    # ---------------------------------------------------------------------
+
+    def iter_log_lines(self, log_map, offset):
+        '''
+        @summary: Iterate over lines of a memory mapped log file starting at given offset.
+
+        @param log_map: mmap object of the log file.
+
+        @param offset: byte offset to start reading from.
+
+        @return: Generator of decoded log lines.
+        '''
+        log_map.seek(offset)
+        for line in iter(log_map.readline, b''):
+            yield line.decode('utf-8', errors='replace')
+    # ---------------------------------------------------------------------
+
     def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
                      maximum_log_length=None):
         '''
         @summary: Analyze input file content for messages matching input regex
                   expressions. See line_matches() for details on matching criteria.
 
+        The log file is memory mapped and searched backwards for the start marker,
+        then only the lines which follow the start marker are scanned, so the memory
+        usage does not depend on the size of the log file.
+
         @param log_file_path: Patch to the log file.
 
         @param match_messages_regex:
@@ -433,83 +711,101 @@ class AnsibleLogAnalyzer:
         @param expect_messages_regex:
             regex class instance containing messages that are expected to appear in logfile.
 
-        @param end_marker_regex - end marker
-
         @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
 
-        @return: List of strings match search criteria.
+        @return: Lists of matching and expected strings, in the order they appear in the log file.
         '''
 
         self.print_diagnostic_message('analyzing file: %s' % log_file_path)
 
-        # -- indicates whether log analyzer currently is in the log range between start
-        # -- and end marker. see analyze_file method.
+        if self.is_filename_stdin(log_file_path):
+            return self.analyze_lines(sys.stdin, True, False, match_messages_regex, ignore_messages_regex,
+                                      expect_messages_regex, maximum_log_length)
+
         check_marker = self.require_marker_check(log_file_path)
-        in_analysis_range = not check_marker
-        stdin_as_input = self.is_filename_stdin(log_file_path)
+        start_marker = self.create_start_marker()
+
+        with open(log_file_path, 'rb') as log_file:
+            if os.fstat(log_file.fileno()).st_size == 0:
+                log_map = None
+                marker_line = None
+            else:
+                log_map = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+                marker_line = self.find_start_marker_line(log_map, start_marker)
+
+        try:
+            if marker_line is not None:
+                self.print_diagnostic_message(
+                    'found start marker: %s' % start_marker)
+            elif check_marker:
+                print('ERROR: start marker was not found')
+                sys.exit(err_no_start_marker)
+
+            log_lines = self.iter_log_lines(log_map, marker_line[1] if marker_line else 0) \
+                if log_map is not None else []
+            return self.analyze_lines(log_lines, False, check_marker, match_messages_regex, ignore_messages_regex,
+                                      expect_messages_regex, maximum_log_length)
+        finally:
+            if log_map is not None:
+                log_map.close()
+    # ---------------------------------------------------------------------
+
+    def analyze_lines(self, log_lines, stdin_as_input, check_marker, match_messages_regex, ignore_messages_regex,
+                      expect_messages_regex, maximum_log_length=None):
+        '''
+        @summary: Analyze log lines which follow the start marker.
+
+        @param log_lines: Iterable of log lines, following the start marker.
+
+        @param stdin_as_input: True if the lines are read from stdin, markers are not checked then.
+
+        @param check_marker: True if the log file is expected to contain default end marker.
+            Lines after the end marker are analyzed only for files which do not follow default markers.
+
+        @return: Lists of matching and expected strings, in the order they appear in the log file.
+        '''
         matching_lines = []
         expected_lines = []
-        found_start_marker = False
         found_end_marker = False
-        if stdin_as_input:
-            log_file = sys.stdin
-        else:
-            log_file = open(log_file_path, 'r')
-
-        start_marker = self.create_start_marker()
+        in_analysis_range = True
         end_marker = self.create_end_marker()
 
+        if maximum_log_length is None:
+            maximum_log_length = MAX_LOG_MESSAGE_LENGTH
+
         ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
-            if stdin_as_input:
-                in_analysis_range = True
-            else:
-                if end_marker in rev_line:
+        for line in log_lines:
+            if not stdin_as_input:
+                if end_marker in line:
                     self.print_diagnostic_message(
                         'found end marker: %s' % end_marker)
                     if (found_end_marker):
                         print('ERROR: duplicate end marker found')
                         sys.exit(err_duplicate_end_marker)
                     found_end_marker = True
-                    in_analysis_range = True
-                    continue
-                elif self.end_ignore_marker_prefix in rev_line:
-                    marker_run_id = rev_line.split(
-                        self.end_ignore_marker_prefix)[1]
-                    ignore_marker_run_ids.append(marker_run_id)
-                    self.print_diagnostic_message('found end ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.end_ignore_marker_prefix):])
-                    if not in_analysis_range:
-                        print('ERROR: duplicate end ignore marker found')
-                        sys.exit(err_end_ignore_marker)
-                    in_analysis_range = False
+                    in_analysis_range = not check_marker
                     continue
 
-                elif self.start_ignore_marker_prefix in rev_line:
-                    marker_run_id = ignore_marker_run_ids.pop()
+                elif self.start_ignore_marker_prefix in line:
+                    marker_run_id = line.split(
+                        self.start_ignore_marker_prefix)[1]
+                    ignore_marker_run_ids.append(marker_run_id)
                     self.print_diagnostic_message('found start ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.start_ignore_marker_prefix):])
-                    if in_analysis_range or marker_run_id not in rev_line:
+                                                  % line[line.index(self.start_ignore_marker_prefix):])
+                    if not in_analysis_range:
                         print('ERROR: unexpected start ignore marker found')
                         sys.exit(err_start_ignore_marker)
-                    in_analysis_range = True
+                    in_analysis_range = False
                     continue
 
-            if not stdin_as_input:
-                if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
-                    self.print_diagnostic_message(
-                        'found start marker: %s' % start_marker)
-                    if (found_start_marker):
-                        print('ERROR: duplicate start marker found')
-                        sys.exit(err_duplicate_start_marker)
-                    found_start_marker = True
-
-                    if (not in_analysis_range):
-                        print(
-                            ('ERROR: found start marker:%s without corresponding end marker' % rev_line))
-                        sys.exit(err_no_end_marker)
-                    in_analysis_range = False
-                    break
+                elif self.end_ignore_marker_prefix in line:
+                    self.print_diagnostic_message('found end ignore marker: %s'
+                                                  % line[line.index(self.end_ignore_marker_prefix):])
+                    if in_analysis_range or not ignore_marker_run_ids or ignore_marker_run_ids.pop() not in line:
+                        print('ERROR: unexpected end ignore marker found')
+                        sys.exit(err_end_ignore_marker)
+                    in_analysis_range = not (check_marker and found_end_marker)
+                    continue
 
             if in_analysis_range:
                 # Skip long logs in sairedis recording since most likely
@@ -517,26 +813,19 @@ class AnsibleLogAnalyzer:
                 # without much insight while they are time consuming to analyze
                 # In advanced_reboot test, we need to analyze the bulk operations for mac learning
                 # So we need to allow long lines
-                if maximum_log_length is None:
-                    maximum_log_length = MAX_LOG_MESSAGE_LENGTH
-                if not check_marker and len(rev_line) > maximum_log_length:
+                if not check_marker and len(line) > maximum_log_length:
                     continue
 
-                if self.line_is_expected(rev_line, expect_messages_regex):
-                    expected_lines.append(rev_line)
+                if self.line_is_expected(line, expect_messages_regex):
+                    expected_lines.append(line)
 
-                elif self.line_matches(rev_line, match_messages_regex, ignore_messages_regex):
-                    matching_lines.append(rev_line)
+                elif self.line_matches(line, match_messages_regex, ignore_messages_regex):
+                    matching_lines.append(line)
 
         # care about the markers only if input is not stdin or no need to check start marker
-        if not stdin_as_input and check_marker:
-            if (not found_start_marker):
-                print('ERROR: start marker was not found')
-                sys.exit(err_no_start_marker)
-
-            if (not found_end_marker):
-                print('ERROR: end marker was not found')
-                sys.exit(err_no_end_marker)
+        if not stdin_as_input and check_marker and not found_end_marker:
+            print('ERROR: end marker was not found')
+            sys.exit(err_no_end_marker)
 
         return matching_lines, expected_lines
     # ---------------------------------------------------------------------
@@ -571,9 +860,6 @@ class AnsibleLogAnalyzer:
             match_strings, expect_strings = self.analyze_file(log_file, match_messages_regex, ignore_messages_regex,
                                                               expect_messages_regex,
                                                               maximum_log_length=maximum_log_length)
-
-            match_strings.reverse()
-            expect_strings.reverse()
             res[log_file] = [match_strings, expect_strings]
 
         return res
@@ -589,6 +875,10 @@ def usage():
     print('                                 to all log files specified in --logs parameter.')
     print('                                 analyze - perform log analysis of files specified in --logs parameter.')
     print('                                 add_end_marker - add end marker to all log files specified in --logs parameter.')           # noqa: E501
+    print('                                 extract_incremental - add end marker and extract syslog appended since the')
+    print('                                 checkpoint saved by init --incremental into out_dir/syslog.')
+    print('                                 analyze_remote - analyze log files specified in --logs parameter with')
+    print('                                 the regular expressions from --patterns_file, print the result as JSON.')
     print('--out_dir path                   Directory path where to place output files, ')
     print('                                 must be present when --action == analyze')
     print('--logs path{,path}               List of full paths to log files to be analyzed.')
@@ -607,11 +897,17 @@ def usage():
     print('                                 All the strings from these files will be expected to present')
     print('                                 in one of specified log files during the analysis. Must be present')
     print('                                 when action == analyze.')
+    print('--incremental                    With init action, save syslog checkpoint into out_dir before placing')
+    print('                                 start marker, to be used by extract_incremental action.')
+    print('--patterns_file path             JSON file with "match", "ignore" and "expect" lists of regular')
+    print('                                 expressions. Must be present when action == analyze_remote.')
+    print('--maximum_log_length length      With analyze_remote action, skip the messages longer than length.')
 
 # ---------------------------------------------------------------------
 
 
-def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in):
+def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in,
+                 patterns_file=None):
     '''
     @summary: This function validates command line parameter 'action' and
         other related parameters.
@@ -623,6 +919,17 @@ def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in,
 
     if action in ['init', 'add_end_marker', 'add_start_ignore_mark', 'add_end_ignore_mark']:
         ret_code = True
+    elif action == 'extract_incremental':
+        if out_dir is None or len(out_dir) == 0:
+            print('ERROR: missing required out_dir for extract_incremental action')
+            ret_code = False
+    elif action == 'analyze_remote':
+        if patterns_file is None or len(patterns_file) == 0:
+            print('ERROR: missing required patterns_file for analyze_remote action')
+            ret_code = False
+        elif log_files_in is None or len(log_files_in) == 0:
+            print('ERROR: missing required logs for analyze_remote action')
+            ret_code = False
     elif action == 'analyze':
         if out_dir is None or len(out_dir) == 0:
             print('ERROR: missing required out_dir for analyze action')
@@ -701,12 +1008,7 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
             "\n-------------------------------------------------\n\n")
         out_file.write('Total matches:%d\n' % match_cnt)
         # Find unused regex matches
-        for regex in messages_regex_e:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
-            else:
-                unused_regex_messages.append(regex)
+        unused_regex_messages.extend(find_unused_regex(messages_regex_e, expected_lines_total))
 
         out_file.write('Total expected and found matches:%d\n' % expected_cnt)
         out_file.write('Total expected but not found matches: %d\n\n' %
@@ -761,6 +1063,30 @@ def write_summary_file(run_id, out_dir, analysis_result_per_file, unused_regex_m
 # ---------------------------------------------------------------------
 
 
+def analyze_remote(analyzer, log_file_list, patterns_file, maximum_log_length):
+    '''
+    @summary: Analyze log files with the regular expressions loaded from a JSON file
+        and print the result as JSON, so the caller gets only the matched lines.
+
+    @param patterns_file: JSON file with "match", "ignore" and "expect" lists of regular expressions.
+
+    @return: void
+    '''
+    if not os.path.exists(patterns_file):
+        # -- The caller copies the patterns file and tries again
+        print(json.dumps({"patterns_found": False}))
+        return
+
+    with open(patterns_file) as fp:
+        patterns = json.load(fp)
+
+    pattern_sets = [MessagePatternSet(patterns[key]) if len(patterns[key]) else None
+                    for key in ("match", "ignore", "expect")]
+    result = analyzer.analyze_file_list(log_file_list, *pattern_sets, maximum_log_length=maximum_log_length)
+    print(json.dumps({"patterns_found": True, "result": result}))
+# ---------------------------------------------------------------------
+
+
 def main(argv):
 
     action = None
@@ -772,12 +1098,16 @@ def main(argv):
     ignore_files_in = None
     expect_files_in = None
     verbose = False
+    incremental = False
+    patterns_file = None
+    maximum_log_length = None
 
     try:
         opts, args = getopt.getopt(argv, "a:r:s:l:o:m:i:e:vh",
                                    ["action=", "run_id=", "start_marker=", "logs=",
                                     "out_dir=", "match_files_in=", "ignore_files_in=",
-                                    "expect_files_in=", "verbose", "help"])
+                                    "expect_files_in=", "verbose", "help", "incremental",
+                                    "patterns_file=", "maximum_log_length="])
 
     except getopt.GetoptError:
         print("Invalid option specified")
@@ -816,7 +1146,17 @@ def main(argv):
         elif (opt in ("-v", "--verbose")):
             verbose = True
 
-    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in)
+        elif (opt == "--incremental"):
+            incremental = True
+
+        elif (opt == "--patterns_file"):
+            patterns_file = arg
+
+        elif (opt == "--maximum_log_length"):
+            maximum_log_length = int(arg)
+
+    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in,
+                         patterns_file)
             and check_run_id(run_id)):
         usage()
         sys.exit(err_invalid_input)
@@ -827,8 +1167,20 @@ def main(argv):
 
     result = {}
     if action == "init":
+        if incremental and out_dir:
+            analyzer.save_log_checkpoint(analyzer.create_checkpoint_file_path(out_dir))
         analyzer.place_marker(log_file_list, analyzer.create_start_marker())
         return 0
+    elif action == "extract_incremental":
+        analyzer.place_marker(
+            log_file_list, analyzer.create_end_marker(), wait_for_marker=True)
+        extracted = analyzer.extract_log_since_checkpoint(analyzer.create_checkpoint_file_path(out_dir),
+                                                          os.path.join(out_dir, os.path.basename(system_log_file)))
+        print(json.dumps({"extracted": extracted}))
+        return 0
+    elif action == "analyze_remote":
+        analyze_remote(analyzer, log_file_list, patterns_file, maximum_log_length)
+        return 0
     elif action == "analyze":
         match_file_list = match_files_in.split(tokenizer)
         ignore_file_list = ignore_files_in.split(tokenizer)
@@ -174,6 +174,8 @@ SUB_INTERFACE_SEPARATOR = '.'
 SUB_INTERFACE_VLAN_ID = '10'
 
 RT_TABLE_FILEPATH = "/etc/iproute2/rt_tables"
+# network devices of the host network namespace
+HOST_NET_DEVICES_PATH = "/sys/class/net"
 
 MIN_THREAD_WORKER_COUNT = 8
 LOG_SEPARATOR = "=" * 120
@@ -512,6 +514,7 @@ class VMTopology(object):
             PTF (int_if) ----------- injected port (ext_if)
 
         """
+        add_veth_if_args = []
         for vm, vlans in self.injected_fp_ports.items():
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
@@ -526,23 +529,27 @@ class VMTopology(object):
                         'sub_interface_separator', SUB_INTERFACE_SEPARATOR)
                     vlan_subintf_vlan_id = properties.get(
                         'sub_interface_vlan_id', SUB_INTERFACE_VLAN_ID)
-                    self.add_veth_if_to_docker(
-                        ext_if, int_if,
+                    add_veth_if_args.append((ext_if, int_if, dict(
                         create_vlan_subintf=create_vlan_subintf,
                         sub_interface_separator=vlan_subintf_sep,
                         sub_interface_vlan_id=vlan_subintf_vlan_id
-                    )
+                    )))
                 else:
-                    self.add_veth_if_to_docker(ext_if, int_if)
+                    add_veth_if_args.append((ext_if, int_if, {}))
+
+        # The veth pairs are independent of each other, set them up concurrently
+        self.worker.map(lambda args: self.add_veth_if_to_docker(args[0], args[1], **args[2]), add_veth_if_args)
 
     def add_injected_VM_ports_to_docker(self):
+        add_veth_if_args = []
         for k, attr in self.OVS_LINKs.items():
             vlans = attr['vlans'][:]
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
                 int_if = PTF_FP_IFACE_TEMPLATE % ptf_index
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
-                self.add_veth_if_to_docker(injected_iface, int_if)
+                add_veth_if_args.append((injected_iface, int_if))
+        self.worker.map(lambda args: self.add_veth_if_to_docker(*args), add_veth_if_args)
 
     def add_mgmt_port_to_docker(self, mgmt_bridge, mgmt_ip, mgmt_gw,
                                 mgmt_ipv6_addr=None, mgmt_gw_v6=None, extra_mgmt_ip_addr=None,
@@ -929,9 +936,10 @@ class VMTopology(object):
                     (br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
                      injected_iface, vm_iface, disconnect_vm)
                 )
+        port_map = VMTopology.get_ovs_port_map()
         with VMTopologyWorker.safe_subprocess_manager() as [processes, tmpdir]:
-            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes,
-                                                             tmpdir=tmpdir), bind_ovs_ports_args)
+            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes, tmpdir=tmpdir,
+                                                             port_map=port_map), bind_ovs_ports_args)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Create VM links for {} : {}".format(k, attr))
@@ -1125,55 +1133,46 @@ class VMTopology(object):
                                    |                      +---- vm_iface
                                    +----------------------+
         """
-        br = VMTopology.get_ovs_bridge_by_port(injected_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, injected_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(dut_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, dut_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(vm_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, vm_iface))
-
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' %
-                           (br_name, injected_iface))
-
-        if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, dut_iface))
-
-        if vm_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, vm_iface))
+        port_map = kwargs.get("port_map")
+        if port_map is None:
+            port_map = VMTopology.get_ovs_port_map()
+
+        # Move the ports from other bridges to the bridge in a single transaction
+        vsctl_cmds = []
+        for port in (injected_iface, dut_iface, vm_iface):
+            br = port_map.get(port)
+            if br == br_name:
+                continue
+            if br is not None:
+                vsctl_cmds.append('--if-exists del-port %s %s' % (br, port))
+            vsctl_cmds.append('--may-exist add-port %s %s' % (br_name, port))
+            port_map[port] = br_name
+        if vsctl_cmds:
+            VMTopology.cmd('ovs-vsctl -- %s' % ' -- '.join(vsctl_cmds))
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
         dut_iface_id = bindings[dut_iface]
         injected_iface_id = bindings[injected_iface]
         vm_iface_id = bindings[vm_iface]
 
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
+        all_cmds = []
+        bind_helper = lambda cmd: \
+            all_cmds.append(cmd.split()[-1])  # noqa: E731
 
         if disconnect_vm:
             # Drop packets from VM
-            VMTopology.cmd(
+            bind_helper(
                 "ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
         else:
             # Add flow from a VM to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, vm_iface_id, dut_iface_id))
+            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, vm_iface_id, dut_iface_id))
 
         if disconnect_vm:
             # Add flow from external iface to ptf container
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
+            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, dut_iface_id, injected_iface_id))
         else:
-            all_cmds = []
-            bind_helper = lambda cmd: \
-                all_cmds.append(cmd.split()[-1])  # noqa: E731
-
             # Add flow from external iface to a VM and a ptf container
             # Allow BGP, IPinIP, fragmented packets, ICMP, SNMP packets and layer2 packets from DUT to neighbors
             # Block other traffic from DUT to EOS for EOS's stability,
@@ -1251,14 +1250,21 @@ class VMTopology(object):
             bind_helper("ovs-ofctl add-flow %s 'table=0,in_port=%s,action=output:%s'" %
                         (br_name, injected_iface_id, dut_iface_id))
 
-            if all_cmds:
-                processes = kwargs.get("processes")
-                tmpdir = kwargs.get("tmpdir")
-                with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
-                    for rule in all_cmds:
-                        f.write(rule.strip("'") + "\n")
+        # Replace the old bindings with all the flows in a single call
+        processes = kwargs.get("processes")
+        tmpdir = kwargs.get("tmpdir")
+        with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
+            for rule in all_cmds:
+                f.write(rule.strip("'") + "\n")
 
-                processes.append(VMTopology.fire_and_forget("ovs-ofctl add-flows {} {}".format(br_name, f.name)))
+        replace_flows_cmd = "ovs-ofctl replace-flows {} {}".format(br_name, f.name)
+        if processes is not None:
+            processes.append(VMTopology.fire_and_forget(replace_flows_cmd))
+        else:
+            try:
+                VMTopology.cmd(replace_flows_cmd)
+            finally:
+                os.remove(f.name)
 
     def unbind_ovs_ports(self, br_name, vm_port, **kwargs):
         """unbind all ports except the vm port from an ovs bridge"""
@@ -1601,9 +1607,9 @@ class VMTopology(object):
     def intf_exists(intf, pid=None, netns=None):
         """Check if the specified interface exists.
 
-        This function uses command "ifconfig <intf name>" to check the existence of the specified interface. By default
-        the command is executed on host. If a pid is specified, this command is executed in the network namespace
-        of the specified pid. The meaning is to check if the interface exists in a specific docker.
+        This function checks the existence of the specified interface in sysfs of the host by default. If a pid is
+        specified, command "ifconfig <intf name>" is executed in the network namespace of the specified pid. The
+        meaning is to check if the interface exists in a specific docker.
         If a netns is specified, this command is executed in the specified network namespace. The specified network
         namespace is not a docker container. It is a network namespace created using the "ip netns" command.
         The both pip and netns arguments are specified, the pid argument takes precedence.
@@ -1616,6 +1622,10 @@ class VMTopology(object):
         Returns:
             bool: True if the interface exists. Otherwise False.
         """
+        if not pid and not netns:
+            # Check the host network namespace without spawning any process
+            return os.path.exists(os.path.join(HOST_NET_DEVICES_PATH, intf))
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1628,9 +1638,9 @@ class VMTopology(object):
     def intf_not_exists(intf, pid=None, netns=None):
         """Check if the specified interface does not exist.
 
-        This function uses command "ifconfig <intf name>" to check the existence of the specified interface. By default
-        the command is executed on host. If a pid is specified, this command is executed in the network namespace
-        of the specified pid. The meaning is to check if the interface exists in a specific docker.
+        This function checks the existence of the specified interface in sysfs of the host by default. If a pid is
+        specified, command "ifconfig <intf name>" is executed in the network namespace of the specified pid. The
+        meaning is to check if the interface exists in a specific docker.
         If a netns is specified, this command is executed in the specified network namespace. The specified network
         namespace is not a docker container. It is a network namespace created using the "ip netns" command.
         The both pip and netns arguments are specified, the pid argument takes precedence.
@@ -1643,6 +1653,9 @@ class VMTopology(object):
         Returns:
             bool: True if the interface does not exist. Otherwise False.
         """
+        if not pid and not netns:
+            return not os.path.exists(os.path.join(HOST_NET_DEVICES_PATH, intf))
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1775,6 +1788,22 @@ class VMTopology(object):
                 ports.add(port)
         return ports
 
+    @staticmethod
+    def get_ovs_port_map():
+        """Get the bridge of every ovs port from a single 'ovs-vsctl show'"""
+        out = VMTopology.cmd('ovs-vsctl show')
+        port_map = {}
+        bridge = None
+        for line in out.split('\n'):
+            matched = re.match(r'^\s+(Bridge|Port)\s+"?([^"]+)"?$', line)
+            if not matched:
+                continue
+            if matched.group(1) == 'Bridge':
+                bridge = matched.group(2)
+            else:
+                port_map[matched.group(2)] = bridge
+        return port_map
+
     @staticmethod
     def get_ovs_bridge_by_port(port):
         try:
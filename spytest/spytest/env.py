@@ -117,6 +117,9 @@ dev_defaults = {
     "SPYTEST_CMDLINE_ARGS": "",
     "SPYTEST_SUITE_ARGS": "",
     "SPYTEST_TEXTFSM_DUMP_INDENT_JSON": None,
+    "SPYTEST_TEXTFSM_CACHE_DIR": None,
+    "SPYTEST_TEXTFSM_PARSE_PROCESSES": "0",
+    "SPYTEST_TEXTFSM_PARSE_MIN_SIZE": "65536",
     "SPYTEST_TESTBED_EXCLUDE_DEVICES": None,
     "SPYTEST_TESTBED_INCLUDE_DEVICES": None,
     "SPYTEST_LOGS_PATH": None,
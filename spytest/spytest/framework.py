@@ -3991,6 +3991,9 @@ class WorkArea(object):
     def parse_show(self, dut, cmd, output, tmpl=None):
         return self.net.parse_show(dut, cmd, output, tmpl=tmpl)
 
+    def parse_show_iter(self, dut, cmd, output, tmpl=None):
+        return self.net.parse_show_iter(dut, cmd, output, tmpl=tmpl)
+
     def remove_prompt(self, dut, output):
         return self.net.remove_prompt(dut, output)
 
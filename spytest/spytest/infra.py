@@ -617,6 +617,10 @@ def parse_show(dut, cmd, output, tmpl=None):
     return getwa().parse_show(dut, cmd, output, tmpl)
 
 
+def parse_show_iter(dut, cmd, output, tmpl=None):
+    return getwa().parse_show_iter(dut, cmd, output, tmpl)
+
+
 def remove_prompt(dut, output):
     return getwa().remove_prompt(dut, output)
 
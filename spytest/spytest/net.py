@@ -2850,11 +2850,18 @@ class Net(object):
         return msg
 
     def _tmpl_apply(self, devname, cmd, output, tmpl=None):
+        request = self._tmpl_apply_async(devname, cmd, output, tmpl)
+        return self._tmpl_wait(devname, cmd, output, request)
+
+    # start parsing the output, the large outputs are parsed
+    # in the parse pool when SPYTEST_TEXTFSM_PARSE_PROCESSES is set
+    def _tmpl_apply_async(self, devname, cmd, output, tmpl=None):
+        return self.tmpl[devname].apply_async(output, cmd, tmpl)
+
+    def _tmpl_wait(self, devname, cmd, output, request):
+        tmpl = request.tmpl
         try:
-            if tmpl is not None:
-                _, parsed = self.tmpl[devname].apply_textfsm(tmpl, output)
-            else:
-                tmpl, parsed = self.tmpl[devname].apply(output, cmd)
+            tmpl, parsed = request.get()
             msg = self._trace_tmpl(cmd, tmpl)
             self.dut_log(devname, msg, lvl=LEVEL_TXTFSM)
             self.dut_log(devname, str(parsed), lvl=LEVEL_TXTFSM)
@@ -5976,6 +5983,10 @@ class Net(object):
     def parse_show(self, devname, cmd, output, tmpl=None):
         return self._tmpl_apply(devname, cmd, output, tmpl)
 
+    def parse_show_iter(self, devname, cmd, output, tmpl=None):
+        for row in self.tmpl[devname].iter_rows(output, cmd, tmpl):
+            yield row
+
     def remove_prompt(self, devname, output):
         access = self._get_dev_access(devname)
         if access["last-prompt"]:
@@ -6010,11 +6021,20 @@ class Net(object):
         if not self._cmd_lock(devname, cmd):
             return None
         line = utils.get_line_number(3)
-        retval = self._show(line, devname, cmd, **kwargs)
+        actual_cmd, output, request = self._show_start(line, devname, cmd, **kwargs)
         self._cmd_unlock(devname, cmd)
-        return retval
+        if request is None:
+            return output
+        # parse after releasing the device so that other commands can be sent meanwhile
+        return self._tmpl_wait(devname, actual_cmd, output, request)
 
     def _show(self, line, devname, cmd, **kwargs):
+        actual_cmd, output, request = self._show_start(line, devname, cmd, **kwargs)
+        if request is None:
+            return output
+        return self._tmpl_wait(devname, actual_cmd, output, request)
+
+    def _show_start(self, line, devname, cmd, **kwargs):
         opts = self._parse_cli_opts(devname, cmd, **kwargs)
 
         cmd = self.wa.hooks.verify_command(devname, cmd, opts.ctype)
@@ -6110,9 +6130,9 @@ class Net(object):
         output = self._fill_sample_data(devname, cmd, opts.skip_error_check,
                                         opts.skip_tmpl, output, line)
         if opts.skip_tmpl:
-            return output
+            return actual_cmd, output, None
 
-        return self._tmpl_apply(devname, actual_cmd, output)
+        return actual_cmd, output, self._tmpl_apply_async(devname, actual_cmd, output)
 
     def _cmd_unlock(self, devname, cmd):
         if not self.cmd_lock_support:
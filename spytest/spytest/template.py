@@ -2,6 +2,11 @@ import sys
 import os
 import re
 import json
+import atexit
+import pickle
+import hashlib
+import threading
+import multiprocessing
 from collections import OrderedDict
 
 bundled_parser = os.getenv("SPYTEST_TEXTFSM_USE_BUNDLED_PARSER")
@@ -19,12 +24,194 @@ from spytest import env  # noqa: E402
 import utilities.common as utils  # noqa: E402
 
 
+class TemplateCache(object):
+    """
+    Index tables, command to template memo and parsed templates shared by
+    all the Template objects using the same root and index files.
+
+    The parsed TextFSM objects are kept per thread and reset before use,
+    instead of parsing the template file for every command output.
+    The command memo can be saved across runs in SPYTEST_TEXTFSM_CACHE_DIR,
+    the cache file name includes the hash of the index and template files.
+    """
+    caches = dict()
+    lock = threading.Lock()
+    max_commands = 10000
+
+    def __init__(self, root, indexes):
+        self.root = root
+        self.cli_tables = OrderedDict()
+        for index in indexes:
+            self.cli_tables[index] = clitable.CliTable(index, root)
+        self.commands = dict()
+        self.misses = 0
+        self.local = threading.local()
+        self.cache_file = None
+        cache_dir = env.get("SPYTEST_TEXTFSM_CACHE_DIR")
+        if cache_dir:
+            name = "textfsm.{}.pickle".format(self.digest(indexes))
+            self.cache_file = os.path.join(cache_dir, name)
+            self.load()
+            atexit.register(self.save)
+
+    @classmethod
+    def get(cls, root, indexes):
+        key = (root, tuple(indexes))
+        with cls.lock:
+            if key not in cls.caches:
+                cls.caches[key] = cls(root, indexes)
+            return cls.caches[key]
+
+    def digest(self, indexes):
+        md5 = hashlib.md5()
+        fnames = [os.path.join(self.root, index) for index in indexes]
+        for dirpath, _, files in sorted(os.walk(self.root)):
+            fnames.extend(os.path.join(dirpath, f) for f in sorted(files) if f.endswith(".tmpl"))
+        for fname in fnames:
+            md5.update(os.path.relpath(fname, self.root).encode())
+            with open(fname, "rb") as fh:
+                md5.update(fh.read())
+        return md5.hexdigest()
+
+    def load(self):
+        try:
+            with open(self.cache_file, "rb") as fh:
+                self.commands = pickle.load(fh)
+        except Exception:
+            self.commands = dict()
+
+    def save(self):
+        if not self.misses:
+            return
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            tmp_file = "{}.{}".format(self.cache_file, os.getpid())
+            with open(tmp_file, "wb") as fh:
+                pickle.dump(self.commands, fh, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self.cache_file)
+            self.misses = 0
+        except Exception:
+            print(utils.stack_trace(None, True))
+
+    # find the template and index of the given command, along with
+    # the templates matching the given attributes in the same index
+    def lookup(self, cmd, attrs):
+        key = (cmd, attrs.get("Platform"), attrs.get("cli"))
+        entry = self.commands.get(key)
+        if entry is None:
+            entry = [None, None, None]
+            for index, cli_table in self.cli_tables.items():
+                row_idx = cli_table.index.GetRowMatch(dict(Command=cmd))
+                if row_idx != 0:
+                    entry = [cli_table.index.index[row_idx]['Template'], index, None]
+                    row_idx = cli_table.index.GetRowMatch(attrs)
+                    if row_idx != 0:
+                        entry[2] = cli_table.index.index[row_idx]['Template']
+                    break
+            if len(self.commands) >= self.max_commands:
+                self.commands.clear()
+            self.commands[key] = entry
+            self.misses = self.misses + 1
+        return entry
+
+    def get_fsm(self, tmpl_file):
+        fsms = getattr(self.local, "fsms", None)
+        if fsms is None:
+            fsms = self.local.fsms = dict()
+        re_table = fsms.get(tmpl_file)
+        if re_table is None:
+            with open(os.path.join(self.root, tmpl_file), "r") as tmpl_fp:
+                re_table = textfsm.TextFSM(tmpl_fp)
+            fsms[tmpl_file] = re_table
+        else:
+            re_table.Reset()
+        return re_table
+
+    def parse(self, tmpl_file, data):
+        re_table = self.get_fsm(tmpl_file)
+        return re_table.header, re_table.ParseText(data)
+
+    def new_fsm(self, tmpl_file):
+        with open(os.path.join(self.root, tmpl_file), "r") as tmpl_fp:
+            return textfsm.TextFSM(tmpl_fp)
+
+
+# templates of the parse pool worker processes
+worker_templates = dict()
+
+
+def parse_worker(args, output, cmd, tmpl):
+    template = worker_templates.get(args)
+    if template is None:
+        template = worker_templates[args] = Template(*args)
+    return ParseRequest.parse(template, output, cmd, tmpl)
+
+
+class ParsePool(object):
+    """
+    Process pool parsing the large command outputs, so that parsing neither
+    holds the device nor competes for the GIL with the other device threads.
+
+    Enabled with SPYTEST_TEXTFSM_PARSE_PROCESSES, only the outputs of at least
+    SPYTEST_TEXTFSM_PARSE_MIN_SIZE characters are sent to the pool.
+    The workers are spawned, as forking the device threads could copy the
+    locks held by them into the workers.
+    """
+    pool = None
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, output):
+        processes = env.getint("SPYTEST_TEXTFSM_PARSE_PROCESSES", 0)
+        if processes <= 0 or len(output) < env.getint("SPYTEST_TEXTFSM_PARSE_MIN_SIZE", 65536):
+            return None
+        with cls.lock:
+            if cls.pool is None:
+                cls.pool = multiprocessing.get_context("spawn").Pool(processes)
+                atexit.register(cls.pool.terminate)
+            return cls.pool
+
+
+class ParseRequest(object):
+    """
+    Parsing of a command output, started in the parse pool when enabled.
+    The output is parsed in the calling thread on get() otherwise.
+    """
+
+    def __init__(self, template, output, cmd, tmpl=None):
+        self.template = template
+        self.output = output
+        self.cmd = cmd
+        self.tmpl = tmpl
+        self.async_result = None
+        pool = ParsePool.get(output)
+        if pool:
+            args = (template.args, output, cmd, tmpl)
+            self.async_result = pool.apply_async(parse_worker, args)
+
+    @staticmethod
+    def parse(template, output, cmd, tmpl=None):
+        if tmpl is not None:
+            _, parsed = template.apply_textfsm(tmpl, output)
+            return [tmpl, parsed]
+        return template.apply(output, cmd)
+
+    # wait for the result, returns template file and parsed rows
+    def get(self):
+        if self.async_result:
+            return self.async_result.get()
+        return self.parse(self.template, self.output, self.cmd, self.tmpl)
+
+
 class Template(object):
 
     def __init__(self, platform=None, cli=None, root=None):
         self.reinit(platform, cli, root)
 
     def reinit(self, platform=None, cli=None, root=None):
+        platform_arg, root_arg = platform, root
         root = root or env.get("SPYTEST_TEXTFSM_ROOT", "templates")
         basedir = os.path.join(os.path.dirname(__file__), '..', root)
         basedir = os.path.abspath(basedir)
@@ -34,30 +221,33 @@ class Template(object):
             self.root = basedir
         self.samples = os.path.join(self.root, 'test')
         index = env.get("SPYTEST_TEXTFSM_INDEX_FILENAME", platform or "index")
-        self.cli_tables = OrderedDict()
+        indexes = []
         for index in index.split(","):
             if not os.path.exists(os.path.join(self.root, index)):
                 index = "index"
-            self.cli_tables[index] = clitable.CliTable(index, self.root)
+            if index not in indexes:
+                indexes.append(index)
+        self.cache = TemplateCache.get(self.root, indexes)
+        self.cli_tables = self.cache.cli_tables
         self.platform = platform
         self.cli = cli
+        self.args = (platform_arg, cli, root_arg)
+
+    def get_attrs(self, cmd):
+        attrs = dict(Command=cmd)
+        if self.platform:
+            attrs["Platform"] = self.platform
+        if self.cli:
+            attrs["cli"] = self.cli
+        return attrs
 
     # find the template given command
     def get_tmpl(self, cmd):
-        attrs = dict(Command=cmd)
-        for cli_table in self.cli_tables.values():
-            row_idx = cli_table.index.GetRowMatch(attrs)
-            if row_idx != 0:
-                return cli_table.index.index[row_idx]['Template']
-        return None
+        return self.cache.lookup(cmd, self.get_attrs(cmd))[0]
 
     def get_table(self, cmd):
-        attrs = dict(Command=cmd)
-        for cli_table in self.cli_tables.values():
-            row_idx = cli_table.index.GetRowMatch(attrs)
-            if row_idx != 0:
-                return cli_table
-        return None
+        index = self.cache.lookup(cmd, self.get_attrs(cmd))[1]
+        return self.cli_tables.get(index)
 
     # retrieve template and sample file given the command
     def read_sample(self, cmd):
@@ -84,24 +274,57 @@ class Template(object):
 
     # find template the given command and apply on given data
     def apply(self, output, cmd):
-        attrs = dict(Command=cmd)
-        if self.platform:
-            attrs["Platform"] = self.platform
-        if self.cli:
-            attrs["cli"] = self.cli
-
-        tmpl_file = self.get_tmpl(cmd)
+        attrs = self.get_attrs(cmd)
+        tmpl_file, index, templates = self.cache.lookup(cmd, attrs)
         if not tmpl_file:
             raise ValueError('Unknown command "%s"' % (cmd))
 
-        cli_table = self.get_table(cmd)
-        if not cli_table:
-            raise ValueError('Unable to parse command "%s"' % (cmd))
+        if not templates:
+            raise clitable.CliTableError('No template found for attributes: "%s"' % attrs)
 
-        cli_table.ParseCmd(output, attrs)
-        objs = self.result(cli_table.header, cli_table)
+        if ":" in templates:
+            # the rows parsed by multiple templates are joined by the index table
+            cli_table = self.cli_tables[index]
+            cli_table.ParseCmd(output, attrs, templates)
+            objs = self.result(cli_table.header, cli_table)
+        else:
+            header, rows = self.cache.parse(templates, output)
+            objs = self.result(header, rows)
         return [tmpl_file, objs]
 
+    # start parsing the output, see ParseRequest
+    def apply_async(self, output, cmd, tmpl=None):
+        return ParseRequest(self, output, cmd, tmpl)
+
+    # parse the output incrementally and yield the rows one by one
+    def iter_rows(self, output, cmd=None, tmpl=None, chunk_lines=1000):
+        if tmpl is None:
+            tmpl, _, templates = self.cache.lookup(cmd, self.get_attrs(cmd))
+            if not tmpl:
+                raise ValueError('Unknown command "%s"' % (cmd))
+            if not templates or ":" in templates:
+                for obj in self.apply(output, cmd)[1]:
+                    yield obj
+                return
+            tmpl = templates
+
+        # own FSM as the iteration can be interleaved with other parsing
+        re_table = self.cache.new_fsm(tmpl)
+        header = [name.lower() for name in re_table.header]
+        # Fillup values are updated in the earlier rows, so these are kept till the end
+        fillup = any("Fillup" in value.OptionNames() for value in re_table.values)
+        lines = output.splitlines()
+        for start in range(0, len(lines), chunk_lines):
+            rows = re_table.ParseText("\n".join(lines[start:start + chunk_lines]), eof=False)
+            if re_table._cur_state_name in ("End", "EOF"):
+                break
+            if not fillup:
+                for row in rows:
+                    yield dict(zip(header, row))
+                del rows[:]
+        for row in re_table.ParseText("", eof=True):
+            yield dict(zip(header, row))
+
     def result(self, header, rows):
         objs = []
         for row in rows:
@@ -159,13 +382,9 @@ class Template(object):
 
     # apply the given template on given data
     def apply_textfsm(self, tmpl_file, data):
-        tmpl_file2 = os.path.join(self.root, tmpl_file)
-        tmpl_fp = open(tmpl_file2, "r")
-        re_table = textfsm.TextFSM(tmpl_fp)
-        out = re_table.ParseText(data)
-        tmpl_fp.close()
-        objs = self.result(re_table.header, out)
-        return re_table.header, objs
+        header, out = self.cache.parse(tmpl_file, data)
+        objs = self.result(header, out)
+        return header, objs
 
 
 if __name__ == "__main__":
@@ -6,8 +6,15 @@ in the data returned by recv. Instead, it delivers the VLAN TCI in a control
 message. Python 2.x doesn't have built-in support for recvmsg, so we have to
 use ctypes to call it. The recv function exported by this module reconstructs
 the VLAN tag if it was offloaded.
+
+The RxRing and TxRing classes use the PACKET_MMAP rings instead, which move
+bursts of packets between the kernel and the process without a system call
+per packet. The VLAN tag is reconstructed from the ring frame header.
 """
 
+import mmap
+import select
+import socket
 import struct
 from ctypes import sizeof
 from ctypes import get_errno
@@ -24,11 +31,26 @@ from ctypes import c_ushort
 from ctypes import c_uint
 from ctypes import Structure
 from ctypes import c_uint32
+from ctypes import string_at
 
 ETH_P_8021Q = 0x8100
 SOL_PACKET = 263
 PACKET_AUXDATA = 8
 TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_LOSS = 14
+TPACKET_V2 = 1
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1
+# offset of the packet data in the TX ring frame, the aligned size of struct tpacket2_hdr
+TPACKET2_HDRLEN = 32
 
 
 class struct_iovec(Structure):
@@ -70,6 +92,34 @@ class struct_tpacket_auxdata(Structure):
     ]
 
 
+class struct_tpacket_req(Structure):
+    _fields_ = [
+        ("tp_block_size", c_uint),
+        ("tp_block_nr", c_uint),
+        ("tp_frame_size", c_uint),
+        ("tp_frame_nr", c_uint),
+    ]
+
+
+class struct_tpacket_req3(Structure):
+    _fields_ = [
+        ("tp_block_size", c_uint),
+        ("tp_block_nr", c_uint),
+        ("tp_frame_size", c_uint),
+        ("tp_frame_nr", c_uint),
+        ("tp_retire_blk_tov", c_uint),
+        ("tp_sizeof_priv", c_uint),
+        ("tp_feature_req_word", c_uint),
+    ]
+
+
+# struct tpacket_hdr_v1 fields following the block descriptor version and offset_to_priv
+BLOCK_STATUS_OFFSET = 8
+BLOCK_PKTS = struct.Struct("=II")  # num_pkts, offset_to_first_pkt
+
+# struct tpacket3_hdr fields tp_next_offset, tp_snaplen, tp_status, tp_mac, tp_vlan_tci and tp_vlan_tpid
+TPACKET3_HDR = struct.Struct("=I8xI4xIH2x4xIH")
+
 libc = CDLL("libc.so.6")
 recvmsg = libc.recvmsg
 recvmsg.argtypes = [c_int, POINTER(struct_msghdr), c_int]
@@ -131,3 +181,145 @@ def recv(sk, bufsize):
         return buf.raw[:12] + tag + buf.raw[12:rv]
     else:
         return buf.raw[:rv]
+
+
+def tag_vlan(data, status, tci, tpid):
+    if tci != 0 or status & TP_STATUS_VLAN_VALID:
+        tpid = tpid if status & TP_STATUS_VLAN_TPID_VALID else ETH_P_8021Q
+        return data[:12] + struct.pack("!HH", tpid, tci) + data[12:]
+    return data
+
+
+class RxRing(object):
+    """
+    TPACKET_V3 receive ring of an AF_PACKET socket
+
+    The kernel fills blocks of variable sized frames and hands over a block
+    when it is full or when the block timeout expires, so the packets are
+    received in bursts with at most one poll per block.
+    @sk Bound AF_PACKET socket
+    @block_size Size of the ring block, limits the maximum packet size
+    @block_nr Number of blocks in the ring
+    @timeout Block retire timeout in milliseconds
+    """
+
+    def __init__(self, sk, block_size=1 << 18, block_nr=8, timeout=10):
+        req = struct_tpacket_req3()
+        req.tp_block_size = block_size
+        req.tp_block_nr = block_nr
+        req.tp_frame_size = 2048
+        req.tp_frame_nr = block_size * block_nr // req.tp_frame_size
+        req.tp_retire_blk_tov = timeout
+        sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        sk.setsockopt(SOL_PACKET, PACKET_RX_RING, string_at(byref(req), sizeof(req)))
+        self.ring = mmap.mmap(sk.fileno(), block_size * block_nr,
+                              mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.block = 0
+        self.poller = select.poll()
+        self.poller.register(sk.fileno(), select.POLLIN | select.POLLERR)
+
+    def block_ready(self, offset):
+        status = struct.unpack_from("=I", self.ring, offset + BLOCK_STATUS_OFFSET)[0]
+        return bool(status & TP_STATUS_USER)
+
+    def recv_burst(self, timeout=1.0):
+        """
+        Receive the packets of the next block
+        @timeout Maximum seconds to wait for a block
+        Returns empty list when no block is ready within the timeout
+        """
+        offset = self.block * self.block_size
+        if not self.block_ready(offset):
+            self.poller.poll(int(timeout * 1000))
+            if not self.block_ready(offset):
+                return []
+
+        num_pkts, pkt_offset = BLOCK_PKTS.unpack_from(self.ring, offset + BLOCK_STATUS_OFFSET + 4)
+        pkt_offset = offset + pkt_offset
+        packets = []
+        for _ in range(num_pkts):
+            next_offset, snaplen, status, mac, tci, tpid = TPACKET3_HDR.unpack_from(self.ring, pkt_offset)
+            data = self.ring[pkt_offset + mac:pkt_offset + mac + snaplen]
+            packets.append(tag_vlan(data, status, tci, tpid))
+            pkt_offset = pkt_offset + next_offset
+
+        # give the block back to the kernel
+        struct.pack_into("=I", self.ring, offset + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+        self.block = (self.block + 1) % self.block_nr
+        return packets
+
+    def close(self):
+        self.ring.close()
+
+
+class TxRing(object):
+    """
+    TPACKET_V2 transmit ring on an AF_PACKET socket bound to the interface
+
+    The packets are copied into the ring frames and the kernel sends all the
+    queued frames on flush, with one system call for the whole burst.
+    @iface Interface name
+    @frame_size Size of the ring frame, limits the maximum packet size
+    @frame_nr Number of frames in the ring
+    """
+
+    def __init__(self, iface, frame_size=1 << 14, frame_nr=64):
+        self.sk = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self.sk.bind((iface, 0))
+            req = struct_tpacket_req()
+            req.tp_block_size = frame_size
+            req.tp_block_nr = frame_nr
+            req.tp_frame_size = frame_size
+            req.tp_frame_nr = frame_nr
+            self.sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            # skip the malformed frames instead of stopping the ring
+            self.sk.setsockopt(SOL_PACKET, PACKET_LOSS, 1)
+            self.sk.setsockopt(SOL_PACKET, PACKET_TX_RING, string_at(byref(req), sizeof(req)))
+            self.ring = mmap.mmap(self.sk.fileno(), frame_size * frame_nr,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sk.close()
+            raise
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self.frame = 0
+        self.pending = 0
+
+    def frame_available(self, offset):
+        return struct.unpack_from("=I", self.ring, offset)[0] == TP_STATUS_AVAILABLE
+
+    def send(self, data, flush=True):
+        """
+        Queue the packet in the ring
+        @data Packet bytes
+        @flush Send the queued packets now
+        """
+        if len(data) > self.frame_size - TPACKET2_HDRLEN:
+            raise ValueError("packet length {} exceeds the TX ring frame".format(len(data)))
+        offset = self.frame * self.frame_size
+        if not self.frame_available(offset):
+            self.flush()
+            if not self.frame_available(offset):
+                raise RuntimeError("TX ring is full")
+        start = offset + TPACKET2_HDRLEN
+        self.ring[start:start + len(data)] = data
+        struct.pack_into("=I", self.ring, offset + 4, len(data))
+        struct.pack_into("=I", self.ring, offset, TP_STATUS_SEND_REQUEST)
+        self.frame = (self.frame + 1) % self.frame_nr
+        self.pending = self.pending + 1
+        if flush or self.pending >= self.frame_nr:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        """Send the queued packets, waits till the kernel has sent them"""
+        if self.pending:
+            self.pending = 0
+            self.sk.send(b"")
+
+    def close(self):
+        self.ring.close()
+        self.sk.close()
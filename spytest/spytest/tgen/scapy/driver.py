@@ -121,9 +121,9 @@ class ScapyDriver(object):
             # read packets
             while self.rx_any_enable():
                 try:
-                    packet = self.packet.readp(self.iface, self.port)
-                    if packet:
-                        self.handle_recv(packet)
+                    frames = self.packet.readp_burst(self.iface, self.port)
+                    if frames:
+                        self.handle_recv(frames)
                 except Exception as e:
                     if str(e) != "[Errno 100] Network is down":
                         self.logger.debug(e, traceback.format_exc())
@@ -145,28 +145,42 @@ class ScapyDriver(object):
                 self.packet.set_link(status)
             self.iface_status = status
 
-    def handle_stats(self, packet):
-        pktlen = 0 if not packet else len(packet)
-        framesReceived = self.port.incrStat('framesReceived')
-        self.port.incrStat('bytesReceived', pktlen)
+    def handle_stats(self, frames):
+        pktlens = [len(data) for data in frames]
+        framesReceived = self.port.incrStat('framesReceived', len(frames))
+        self.port.incrStat('bytesReceived', sum(pktlens))
         if self.dbg > 2:
             self.logger.debug("{} framesReceived: {}".format(self.iface, framesReceived))
-        if pktlen > 1518:
-            self.port.incrStat('oversizeFramesReceived')
-        for stream in self.port.track_streams:
-            if self.packet.match_stream(stream, packet):
-                stream.incrStat('framesReceived')
-                stream.incrStat('bytesReceived', pktlen)
-                break  # no need to check in other streams
-
-    def handle_capture(self, packet):
-        self.pkts_captured.append(packet)
-
-    def handle_recv(self, packet):
+        oversize = len([pktlen for pktlen in pktlens if pktlen > 1518])
+        if oversize:
+            self.port.incrStat('oversizeFramesReceived', oversize)
+
+        # account the frames to the streams by the signature before CRC
+        signatures = self.packet.stream_signatures(self.port.track_streams)
+        sizes = set(len(signature) for signature in signatures)
+        stream_stats = {}
+        for data, pktlen in zip(frames, pktlens):
+            for size in sizes:
+                stream = signatures.get(data[-size - 4:-4])
+                if stream:
+                    stats = stream_stats.setdefault(stream, [0, 0])
+                    stats[0] = stats[0] + 1
+                    stats[1] = stats[1] + pktlen
+                    break  # no need to check in other streams
+        for stream, (framesReceived, bytesReceived) in stream_stats.items():
+            if self.dbg > 2:
+                self.logger.debug("{}/{} framesReceived: {}".format(self.iface, stream.stream_id, framesReceived))
+            stream.incrStat('framesReceived', framesReceived)
+            stream.incrStat('bytesReceived', bytesReceived)
+
+    def handle_capture(self, frames):
+        self.pkts_captured.extend(frames)
+
+    def handle_recv(self, frames):
         if self.statState.is_set():
-            self.handle_stats(packet)
+            self.handle_stats(frames)
         if self.captureState.is_set():
-            self.handle_capture(packet)
+            self.handle_capture(frames)
 
     def txInit(self):
         self.txState = threading.Event()
@@ -349,6 +363,7 @@ class ScapyDriver(object):
                 self.txThreadMainInner()
             except Exception as e:
                 self.logger.log_exception(e, traceback.format_exc())
+            self.packet.flush()
             self.clear_tx_state()
 
     def txThreadMainInnerStart(self, pwa_list, sids):
@@ -410,7 +425,7 @@ class ScapyDriver(object):
                 self.pwa_wait(pwa)
                 try:
                     send_start_time = self.utils.clock()
-                    pkt = self.send_packet(pwa, pwa.stream.stream_id)
+                    pkt = self.send_packet(pwa, pwa.stream.stream_id, flush=False)
                     bytesSent = len(pkt)
                     send_time = self.utils.clock() - send_start_time
 
@@ -454,6 +469,9 @@ class ScapyDriver(object):
         if self.dbg > 2 or (self.dbg > 1 and pwa.left != 0):
             self.logger.debug("stream: {} delay: {} pps: {}".format(pwa.stream.stream_id, delay, pwa.rate_pps))
         delay = 0 if delay < 0 else delay
+        if delay > 0:
+            # send the queued packets before waiting
+            self.packet.flush()
         if delay > 1.0 / 10:
             self.utils.msleep(delay * 1000, 10)
         elif delay > 1.0 / 100:
@@ -465,8 +483,8 @@ class ScapyDriver(object):
         else:
             self.utils.usleep(delay * 1000 * 1000)
 
-    def send_packet(self, pwa, stream_name):
-        return self.packet.send_packet(pwa, self.iface, stream_name, pwa.left)
+    def send_packet(self, pwa, stream_name, flush=True):
+        return self.packet.send_packet(pwa, self.iface, stream_name, pwa.left, flush)
 
     def createInterface(self, intf):
         return self.packet.if_create(intf)
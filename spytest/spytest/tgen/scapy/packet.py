@@ -1,5 +1,4 @@
 import os
-import zlib
 import time
 import copy
 import random
@@ -31,6 +30,7 @@ from interface import PacketInterface
 from bgp_exabgp import ExaBgp
 from dot1x import Dot1x
 from dhcps import Dhcps
+from stream_plan import StreamPlan
 
 try:
     print("SCAPY VERSION = {}".format(Conf().version))
@@ -154,6 +154,10 @@ class ScapyPacket(object):
         self.finished = False
         self.mtu = 9194
         self.use_bridge = bool(os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1") != "0")
+        self.use_ring = bool(os.getenv("SPYTEST_SCAPY_USE_RING", "1") != "0")
+        self.rx_ring = None
+        self.tx_ring = None
+        self.tx_ring_failed = False
         self.logger.info("use_bridge = {}".format(self.use_bridge))
         self.pp = PacketProtocol(self)
         self.pi = PacketInterface(self)
@@ -261,7 +265,10 @@ class ScapyPacket(object):
         self.dot1x.cleanup()
         self.dhcps.cleanup()
         self.finished = True
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.rx_sock = self.close_sock(self.rx_sock)
+        self.tx_ring = self.close_sock(self.tx_ring)
+        self.tx_ring_failed = False
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
         self.init_bridge(self.iface)
@@ -282,32 +289,52 @@ class ScapyPacket(object):
                 raise exp
             raise RunTimeException(exp, msg)
         afpacket.enable_auxdata(self.rx_sock)
+        if self.use_ring:
+            try:
+                self.rx_ring = afpacket.RxRing(self.rx_sock)
+            except Exception as exp:
+                self.logger.info("Failed to create RX ring {} {}".format(self.iface, exp))
 
     def set_link(self, status):
         msg = "link:{} status:{}".format(self.iface, status)
         self.logger.debug(msg)
 
-    def readp(self, iface, port):
+    def readp_burst(self, iface, port):
 
         if self.dry:
             time.sleep(2)
-            return None
+            return []
 
         if not self.iface:
-            return None
+            return []
 
         try:
-            data = afpacket.recv(self.rx_sock, 12 * 1024)
+            if self.rx_ring:
+                frames = self.rx_ring.recv_burst()
+            else:
+                frames = [afpacket.recv(self.rx_sock, 12 * 1024)]
         except Exception as exp:
             if self.finished:
-                return None
+                return []
             raise exp
-        packet = Ether(data)
+
         self.stats_lock.acquire()
-        self.rx_count = self.rx_count + 1
+        self.rx_count = self.rx_count + len(frames)
         self.stats_lock.release()
         self.trace_stats()
 
+        # dissect only the frames needed by the protocol emulation
+        for data in frames:
+            if self.dbg > 1 or self.pp.is_protocol_frame(data):
+                self.readp_frame(iface, port, data)
+        if frames:
+            self.pp.process_periodic(port)
+
+        return frames
+
+    def readp_frame(self, iface, port, data):
+        packet = Ether(data)
+
         if self.dbg > 1:
             cmd = "" if not self.show_summary else packet.command()
             msg = "readp:{} len:{} count:{} {}".format
@@ -319,24 +346,55 @@ class ScapyPacket(object):
         # handle protocol packets
         self.pp.process(port, packet)
 
-        return packet
-
-    def sendp(self, pkt, data, iface, stream_name, left):
+    def sendp(self, pkt, data, iface, stream_name, left, flush=True):
         self.stats_lock.acquire()
         self.tx_count = self.tx_count + 1
         self.stats_lock.release()
         self.trace_stats()
 
         if self.dbg > 2 or (self.dbg > 1 and left != 0):
+            pkt = pkt or Ether(data)
             cmd = "" if not self.show_summary else pkt.command()
             msg = "sendp:{}:{} len:{} count:{} {}".format
             self.logger.debug(msg(iface, stream_name, len(data), self.tx_count, cmd))
 
         if self.dbg > 3:
-            self.trace_packet(pkt, self.hex)
+            self.trace_packet(pkt or Ether(data), self.hex)
+
+        if self.send_ring(data, iface, flush):
+            return len(data)
 
         return self.send(data, iface)
 
+    def send_ring(self, data, iface, flush):
+        if self.dry or not self.use_ring or iface != self.iface:
+            return False
+
+        if not self.tx_ring:
+            if self.tx_ring_failed:
+                return False
+            try:
+                self.tx_ring = afpacket.TxRing(iface)
+            except Exception as exp:
+                self.tx_ring_failed = True
+                self.logger.info("Failed to create TX ring {} {}".format(iface, exp))
+                return False
+
+        try:
+            self.tx_ring.send(data, flush)
+            return True
+        except Exception as exp:
+            self.logger.error("Failed to send ring {}".format(self.expmsg(data, iface, exp, "ring-send")))
+            return False
+
+    def flush(self):
+        if not self.tx_ring:
+            return
+        try:
+            self.tx_ring.flush()
+        except Exception as exp:
+            self.logger.error("Failed to flush TX ring {} {}".format(self.iface, exp))
+
     def mkcmd(self, data):
         try:
             pkt = Ether(data)
@@ -413,27 +471,11 @@ class ScapyPacket(object):
         if hex:
             self.logger.debug(hexdump(pkt, dump=True))
 
-    def send_packet(self, pwa, iface, stream_name, left):
-        if pwa.padding:
-            strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
-        else:
-            strpkt = self.utils.tobytes(pwa.pkt)
-
+    def send_packet(self, pwa, iface, stream_name, left, flush=True):
         # insert stream id before CRC
-        if pwa.add_signature:
-            sid = pwa.stream.get_sid()
-            sid = sid or "DeadBeef"
-            if sid:
-                sid = binascii.unhexlify(sid)
-                strpkt = strpkt[:-len(sid)] + sid
-
-        try:
-            crc1 = '{:08x}'.format(socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
-            crc = binascii.unhexlify(crc1)
-        except Exception:
-            crc = binascii.unhexlify('00' * 4)
-        bstr = strpkt + self.utils.tobytes(crc)
-        self.sendp(Ether(bstr), bstr, iface, stream_name, left)
+        signature = pwa.signature if pwa.add_signature else None
+        bstr = pwa.plan.build(pwa.padding, signature)
+        self.sendp(None, bstr, iface, stream_name, left, flush)
         return bstr
 
     def check(self, pkt):
@@ -890,19 +932,8 @@ class ScapyPacket(object):
         pwa.duration = duration
         pwa.duration2 = duration2
         pwa.stream = stream
-        pwa.mac_src_count = 0
-        pwa.mac_dst_count = 0
-        pwa.arp_src_hw_count = 0
-        pwa.arp_dst_hw_count = 0
-        pwa.ip_src_count = 0
-        pwa.ip_dst_count = 0
-        pwa.ipv6_src_count = 0
-        pwa.ipv6_dst_count = 0
-        pwa.vlan_id_count = 0
-        pwa.tcp_src_port_count = 0
-        pwa.tcp_dst_port_count = 0
-        pwa.udp_src_port_count = 0
-        pwa.udp_dst_port_count = 0
+        pwa.plan = StreamPlan(pkt, stream.kws, self.utils, self.logger)
+        pwa.signature = binascii.unhexlify(stream.get_sid() or "DeadBeef")
 
         if self.dbg > 3:
             self.trace_packet(pkt)
@@ -925,7 +956,7 @@ class ScapyPacket(object):
             frame_size = random.randrange(pwa.frame_size_min, pwa.frame_size_max + 1)
             padLen = int(frame_size - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
+                pwa.padding = binascii.unhexlify('00' * padLen)
                 pwa.add_signature = True
         elif pwa.length_mode in ["increment", "incr"]:
             pktLen = len(pwa.pkt)
@@ -939,243 +970,13 @@ class ScapyPacket(object):
                 pwa.frame_size_current = frame_size
             padLen = int(pwa.frame_size_current - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
+                pwa.padding = binascii.unhexlify('00' * padLen)
                 pwa.add_signature = True
 
     def build_next_dma(self, pwa):
 
-        # Change Ether SRC MAC
-        mac_src_mode = pwa.stream.kws.get("mac_src_mode", "fixed").strip()
-        mac_src_step = pwa.stream.kws.get("mac_src_step", "00:00:00:00:00:01")
-        mac_src_count = self.utils.intval(pwa.stream.kws, "mac_src_count", 0)
-        if mac_src_mode in ["increment", "decrement"]:
-            if mac_src_mode in ["increment"]:
-                pwa.pkt[0].src = self.utils.incrementMac(pwa.pkt[0].src, mac_src_step)
-            else:
-                pwa.pkt[0].src = self.utils.decrementMac(pwa.pkt[0].src, mac_src_step)
-            pwa.mac_src_count = pwa.mac_src_count + 1
-            if mac_src_count > 0 and pwa.mac_src_count >= mac_src_count:
-                pwa.pkt[0].src = pwa.stream.kws["mac_src"][0]
-                pwa.mac_src_count = 0
-        elif mac_src_mode in ["list"]:
-            pwa.mac_src_count = pwa.mac_src_count + 1
-            if pwa.mac_src_count >= len(pwa.stream.kws["mac_src"]):
-                pwa.pkt[0].src = pwa.stream.kws["mac_src"][0]
-                pwa.mac_src_count = 0
-            else:
-                pwa.pkt[0].src = pwa.stream.kws["mac_src"][pwa.mac_src_count]
-        elif mac_src_mode != "fixed":
-            self.logger.todo("unhandled", "mac_src_mode", mac_src_mode)
-
-        # Change Ether DST MAC
-        mac_dst_mode = pwa.stream.kws.get("mac_dst_mode", "fixed").strip()
-        mac_dst_step = pwa.stream.kws.get("mac_dst_step", "00:00:00:00:00:01")
-        mac_dst_count = self.utils.intval(pwa.stream.kws, "mac_dst_count", 0)
-        if mac_dst_mode in ["increment", "decrement"]:
-            if mac_dst_mode in ["increment"]:
-                pwa.pkt[0].dst = self.utils.incrementMac(pwa.pkt[0].dst, mac_dst_step)
-            else:
-                pwa.pkt[0].dst = self.utils.decrementMac(pwa.pkt[0].dst, mac_dst_step)
-            pwa.mac_dst_count = pwa.mac_dst_count + 1
-            if mac_dst_count > 0 and pwa.mac_dst_count >= mac_dst_count:
-                pwa.pkt[0].dst = pwa.stream.kws["mac_dst"][0]
-                pwa.mac_dst_count = 0
-        elif mac_dst_mode in ["list"]:
-            pwa.mac_dst_count = pwa.mac_dst_count + 1
-            if pwa.mac_dst_count >= len(pwa.stream.kws["mac_dst"]):
-                pwa.pkt[0].dst = pwa.stream.kws["mac_dst"][0]
-                pwa.mac_dst_count = 0
-            else:
-                pwa.pkt[0].dst = pwa.stream.kws["mac_dst"][pwa.mac_dst_count]
-        elif mac_dst_mode != "fixed":
-            self.logger.todo("unhandled", "mac_dst_mode", mac_dst_mode)
-
-        # Change ARP SRC MAC
-        if ARP in pwa.pkt:
-            arp_src_hw_mode = pwa.stream.kws.get("arp_src_hw_mode", "fixed").strip()
-            arp_src_hw_step = pwa.stream.kws.get("arp_src_hw_step", "00:00:00:00:00:01")
-            arp_src_hw_count = self.utils.intval(pwa.stream.kws, "arp_src_hw_count", 0)
-            if arp_src_hw_mode in ["increment", "decrement"]:
-                if arp_src_hw_mode in ["increment"]:
-                    pwa.pkt[ARP].hwsrc = self.utils.incrementMac(pwa.pkt[ARP].hwsrc, arp_src_hw_step)
-                else:
-                    pwa.pkt[ARP].hwsrc = self.utils.decrementMac(pwa.pkt[ARP].hwsrc, arp_src_hw_step)
-                pwa.arp_src_hw_count = pwa.arp_src_hw_count + 1
-                if arp_src_hw_count > 0 and pwa.arp_src_hw_count >= arp_src_hw_count:
-                    pwa.pkt[ARP].hwsrc = pwa.stream.kws.get("arp_src_hw_addr", "00:00:01:00:00:02").replace(".", ":")
-                    pwa.arp_src_hw_count = 0
-            elif arp_src_hw_mode != "fixed":
-                self.logger.todo("unhandled", "arp_src_hw_mode", arp_src_hw_mode)
-
-        # Change ARP DST MAC
-        if ARP in pwa.pkt:
-            arp_dst_hw_mode = pwa.stream.kws.get("arp_dst_hw_mode", "fixed").strip()
-            arp_dst_hw_step = pwa.stream.kws.get("arp_dst_hw_step", "00:00:00:00:00:01")
-            arp_dst_hw_count = self.utils.intval(pwa.stream.kws, "arp_dst_hw_count", 0)
-            if arp_dst_hw_mode in ["increment", "decrement"]:
-                if arp_dst_hw_mode in ["increment"]:
-                    pwa.pkt[ARP].hwdst = self.utils.incrementMac(pwa.pkt[ARP].hwdst, arp_dst_hw_step)
-                else:
-                    pwa.pkt[ARP].hwdst = self.utils.decrementMac(pwa.pkt[ARP].hwdst, arp_dst_hw_step)
-                pwa.arp_dst_hw_count = pwa.arp_dst_hw_count + 1
-                if arp_dst_hw_count > 0 and pwa.arp_dst_hw_count >= arp_dst_hw_count:
-                    pwa.pkt[ARP].hwdst = pwa.stream.kws.get("arp_dst_hw_addr", "00:00:00:00:00:00").replace(".", ":")
-                    pwa.arp_dst_hw_count = 0
-            elif arp_dst_hw_mode != "fixed":
-                self.logger.todo("unhandled", "arp_dst_hw_mode", arp_dst_hw_mode)
-
-        # Change SRC IP
-        if IP in pwa.pkt:
-            ip_src_mode = pwa.stream.kws.get("ip_src_mode", "fixed").strip()
-            ip_src_step = pwa.stream.kws.get("ip_src_step", "0.0.0.1")
-            ip_src_count = self.utils.intval(pwa.stream.kws, "ip_src_count", 0)
-            if ip_src_mode in ["increment", "decrement"]:
-                if ip_src_mode in ["increment"]:
-                    pwa.pkt[IP].src = self.utils.incrementIPv4(pwa.pkt[IP].src, ip_src_step)
-                else:
-                    pwa.pkt[IP].src = self.utils.decrementIPv4(pwa.pkt[IP].src, ip_src_step)
-                pwa.ip_src_count = pwa.ip_src_count + 1
-                if ip_src_count > 0 and pwa.ip_src_count >= ip_src_count:
-                    pwa.pkt[IP].src = pwa.stream.kws.get("ip_src_addr", "0.0.0.0")
-                    pwa.ip_src_count = 0
-            elif ip_src_mode != "fixed":
-                self.logger.todo("unhandled", "ip_src_mode", ip_src_mode)
-
-        # Change DST IP
-        if IP in pwa.pkt:
-            ip_dst_mode = pwa.stream.kws.get("ip_dst_mode", "fixed").strip()
-            ip_dst_step = pwa.stream.kws.get("ip_dst_step", "0.0.0.1")
-            ip_dst_count = self.utils.intval(pwa.stream.kws, "ip_dst_count", 0)
-            if ip_dst_mode in ["increment", "decrement"]:
-                if ip_dst_mode in ["increment"]:
-                    pwa.pkt[IP].dst = self.utils.incrementIPv4(pwa.pkt[IP].dst, ip_dst_step)
-                else:
-                    pwa.pkt[IP].dst = self.utils.decrementIPv4(pwa.pkt[IP].dst, ip_dst_step)
-                pwa.ip_dst_count = pwa.ip_dst_count + 1
-                if ip_dst_count > 0 and pwa.ip_dst_count >= ip_dst_count:
-                    pwa.pkt[IP].dst = pwa.stream.kws.get("ip_dst_addr", "192.0.0.1")
-                    pwa.ip_dst_count = 0
-            elif ip_dst_mode != "fixed":
-                self.logger.todo("unhandled", "ip_dst_mode", ip_dst_mode)
-
-        # Change SRC IPv6
-        if IPv6 in pwa.pkt:
-            ipv6_src_mode = pwa.stream.kws.get("ipv6_src_mode", "fixed").strip()
-            ipv6_src_step = pwa.stream.kws.get("ipv6_src_step", "::1")
-            ipv6_src_count = self.utils.intval(pwa.stream.kws, "ipv6_src_count", 0)
-            if ipv6_src_mode in ["increment", "decrement"]:
-                if ipv6_src_mode in ["increment"]:
-                    pwa.pkt[IPv6].src = self.utils.incrementIPv6(pwa.pkt[IPv6].src, ipv6_src_step)
-                else:
-                    pwa.pkt[IPv6].src = self.utils.decrementIPv6(pwa.pkt[IPv6].src, ipv6_src_step)
-                pwa.ipv6_src_count = pwa.ipv6_src_count + 1
-                if ipv6_src_count > 0 and pwa.ipv6_src_count >= ipv6_src_count:
-                    pwa.pkt[IPv6].src = pwa.stream.kws.get("ipv6_src_addr", "fe80:0:0:0:0:0:0:12")
-                    pwa.ipv6_src_count = 0
-            elif ipv6_src_mode != "fixed":
-                self.logger.todo("unhandled", "ipv6_src_mode", ipv6_src_mode)
-
-        # Change DST IPv6
-        if IPv6 in pwa.pkt:
-            ipv6_dst_mode = pwa.stream.kws.get("ipv6_dst_mode", "fixed").strip()
-            ipv6_dst_step = pwa.stream.kws.get("ipv6_dst_step", "::1")
-            ipv6_dst_count = self.utils.intval(pwa.stream.kws, "ipv6_dst_count", 0)
-            if ipv6_dst_mode in ["increment", "decrement"]:
-                if ipv6_dst_mode in ["increment"]:
-                    pwa.pkt[IPv6].dst = self.utils.incrementIPv6(pwa.pkt[IPv6].dst, ipv6_dst_step)
-                else:
-                    pwa.pkt[IPv6].dst = self.utils.decrementIPv6(pwa.pkt[IPv6].dst, ipv6_dst_step)
-                pwa.ipv6_dst_count = pwa.ipv6_dst_count + 1
-                if ipv6_dst_count > 0 and pwa.ipv6_dst_count >= ipv6_dst_count:
-                    pwa.pkt[IPv6].dst = pwa.stream.kws.get("ipv6_dst_addr", "fe80:0:0:0:0:0:0:22")
-                    pwa.ipv6_dst_count = 0
-            elif ipv6_dst_mode != "fixed":
-                self.logger.todo("unhandled", "ipv6_dst_mode", ipv6_dst_mode)
-
-        # Change VLAN
-        if Dot1Q in pwa.pkt:
-            vlan_id_mode = pwa.stream.kws.get("vlan_id_mode", "fixed").strip()
-            vlan_id_step = self.utils.intval(pwa.stream.kws, "vlan_id_step", 1)
-            vlan_id_count = self.utils.intval(pwa.stream.kws, "vlan_id_count", 0)
-            if vlan_id_mode in ["increment", "decrement"]:
-                if vlan_id_mode in ["increment"]:
-                    pwa.pkt[Dot1Q].vlan = pwa.pkt[Dot1Q].vlan + vlan_id_step
-                else:
-                    pwa.pkt[Dot1Q].vlan = pwa.pkt[Dot1Q].vlan - vlan_id_step
-                pwa.vlan_id_count = pwa.vlan_id_count + 1
-                if vlan_id_count > 0 and pwa.vlan_id_count >= vlan_id_count:
-                    pwa.pkt[Dot1Q].vlan = self.utils.intval(pwa.stream.kws, "vlan_id", 0)
-                    pwa.vlan_id_count = 0
-            elif vlan_id_mode != "fixed":
-                self.logger.todo("unhandled", "vlan_id_mode", vlan_id_mode)
-
-        # Change TCP SRC PORT
-        if TCP in pwa.pkt:
-            tcp_src_port_mode = pwa.stream.kws.get("tcp_src_port_mode", "fixed").strip()
-            tcp_src_port_step = self.utils.intval(pwa.stream.kws, "tcp_src_port_step", 1)
-            tcp_src_port_count = self.utils.intval(pwa.stream.kws, "tcp_src_port_count", 0)
-            if tcp_src_port_mode in ["increment", "decrement", "incr", "decr"]:
-                if tcp_src_port_mode in ["increment", "incr"]:
-                    pwa.pkt[TCP].sport = pwa.pkt[TCP].sport + tcp_src_port_step
-                else:
-                    pwa.pkt[TCP].sport = pwa.pkt[TCP].sport - tcp_src_port_step
-                pwa.tcp_src_port_count = pwa.tcp_src_port_count + 1
-                if tcp_src_port_count > 0 and pwa.tcp_src_port_count >= tcp_src_port_count:
-                    pwa.pkt[TCP].sport = self.utils.intval(pwa.stream.kws, "tcp_src_port", 0)
-                    pwa.tcp_src_port_count = 0
-            elif tcp_src_port_mode != "fixed":
-                self.logger.todo("unhandled", "tcp_src_port_mode", tcp_src_port_mode)
-
-        # Change TCP DST PORT
-        if TCP in pwa.pkt:
-            tcp_dst_port_mode = pwa.stream.kws.get("tcp_dst_port_mode", "fixed").strip()
-            tcp_dst_port_step = self.utils.intval(pwa.stream.kws, "tcp_dst_port_step", 1)
-            tcp_dst_port_count = self.utils.intval(pwa.stream.kws, "tcp_dst_port_count", 0)
-            if tcp_dst_port_mode in ["increment", "decrement", "incr", "decr"]:
-                if tcp_dst_port_mode in ["increment", "incr"]:
-                    pwa.pkt[TCP].dport = pwa.pkt[TCP].sport + tcp_dst_port_step
-                else:
-                    pwa.pkt[TCP].dport = pwa.pkt[TCP].sport - tcp_dst_port_step
-                pwa.tcp_dst_port_count = pwa.tcp_dst_port_count + 1
-                if tcp_dst_port_count > 0 and pwa.tcp_dst_port_count >= tcp_dst_port_count:
-                    pwa.pkt[TCP].dport = self.utils.intval(pwa.stream.kws, "tcp_dst_port", 0)
-                    pwa.tcp_dst_port_count = 0
-            elif tcp_dst_port_mode != "fixed":
-                self.logger.todo("unhandled", "tcp_dst_port_mode", tcp_dst_port_mode)
-
-        # Change UDP SRC PORT
-        if UDP in pwa.pkt:
-            udp_src_port_mode = pwa.stream.kws.get("udp_src_port_mode", "fixed").strip()
-            udp_src_port_step = self.utils.intval(pwa.stream.kws, "udp_src_port_step", 1)
-            udp_src_port_count = self.utils.intval(pwa.stream.kws, "udp_src_port_count", 0)
-            if udp_src_port_mode in ["increment", "decrement", "incr", "decr"]:
-                if udp_src_port_mode in ["increment", "incr"]:
-                    pwa.pkt[UDP].sport = pwa.pkt[UDP].sport + udp_src_port_step
-                else:
-                    pwa.pkt[UDP].sport = pwa.pkt[UDP].sport - udp_src_port_step
-                pwa.udp_src_port_count = pwa.udp_src_port_count + 1
-                if udp_src_port_count > 0 and pwa.udp_src_port_count >= udp_src_port_count:
-                    pwa.pkt[UDP].sport = self.utils.intval(pwa.stream.kws, "udp_src_port", 0)
-                    pwa.udp_src_port_count = 0
-            elif udp_src_port_mode != "fixed":
-                self.logger.todo("unhandled", "udp_src_port_mode", udp_src_port_mode)
-
-        # Change UDP DST PORT
-        if UDP in pwa.pkt:
-            udp_dst_port_mode = pwa.stream.kws.get("udp_dst_port_mode", "fixed").strip()
-            udp_dst_port_step = self.utils.intval(pwa.stream.kws, "udp_dst_port_step", 1)
-            udp_dst_port_count = self.utils.intval(pwa.stream.kws, "udp_dst_port_count", 0)
-            if udp_dst_port_mode in ["increment", "decrement", "incr", "decr"]:
-                if udp_dst_port_mode in ["increment", "incr"]:
-                    pwa.pkt[UDP].dport = pwa.pkt[UDP].sport + udp_dst_port_step
-                else:
-                    pwa.pkt[UDP].dport = pwa.pkt[UDP].sport - udp_dst_port_step
-                pwa.udp_dst_port_count = pwa.udp_dst_port_count + 1
-                if udp_dst_port_count > 0 and pwa.udp_dst_port_count >= udp_dst_port_count:
-                    pwa.pkt[UDP].dport = self.utils.intval(pwa.stream.kws, "udp_dst_port", 0)
-                    pwa.udp_dst_port_count = 0
-            elif udp_dst_port_mode != "fixed":
-                self.logger.todo("unhandled", "udp_dst_port_mode", udp_dst_port_mode)
+        # patch the changing fields in the packet bytes
+        pwa.plan.next()
 
         # add padding based on length_mode
         self.add_padding(pwa, False)
@@ -1222,21 +1023,15 @@ class ScapyPacket(object):
         pps = self.utils.min_value(pwa.rate_pps, self.max_rate_pps)
         return (1.0 * pwa.pkts_per_burst) / float(pps)
 
-    def match_stream(self, stream, pkt):
-        sid = stream.get_sid()
-        if not sid:
-            return False
-        sid = binascii.unhexlify(sid)
-        strpkt = self.utils.tobytes(pkt)
-        sig = strpkt[-len(sid) - 4:-4]
-        msg = "{} {}".format(binascii.hexlify(sid), binascii.hexlify(sig))
-        if sid == sig:
-            self.logger.debug("{}: CMP0: {}".format(self.iface, msg))
-            return True
-        if self.dbg > 2:
-            self.logger.debug("{}: CMP1: {}".format(self.iface, msg))
-            self.trace_packet(pkt, hex=True, force=True)
-        return False
+    @staticmethod
+    def stream_signatures(streams):
+        """Get the streams by the signature inserted before CRC"""
+        signatures = {}
+        for stream in streams:
+            sid = stream.get_sid()
+            if sid:
+                signatures.setdefault(binascii.unhexlify(sid), stream)
+        return signatures
 
     def if_create(self, intf):
         return self.pi.if_create(intf)
@@ -1,4 +1,5 @@
 import copy
+import struct
 import binascii
 import traceback
 
@@ -20,6 +21,13 @@ from scapy.contrib.igmp import IGMP
 from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mr, IGMPv3gr, IGMPv3mq
 from scapy.utils import chexdump
 
+# ether types of the VLAN tags skipped to reach the L3 header
+VLAN_ETHER_TYPES = [0x8100, 0x88a8, 0x9100]
+ETH_P_PAE = 0x888e
+ETH_P_IP = 0x0800
+IP_PROTOS = [2, 89]  # IGMP, OSPF
+BOOTP_PORTS = [67, 68]
+
 
 class PacketProtocol(object):
 
@@ -32,6 +40,34 @@ class PacketProtocol(object):
     def __del__(self):
         pass
 
+    @staticmethod
+    def is_protocol_frame(data):
+        """
+        Check the header bytes of the received frame to find if it can be handled by process()
+        """
+        try:
+            offset = 12
+            ether_type = struct.unpack_from("!H", data, offset)[0]
+            while ether_type in VLAN_ETHER_TYPES:
+                offset = offset + 4
+                ether_type = struct.unpack_from("!H", data, offset)[0]
+            offset = offset + 2
+            if ether_type == ETH_P_PAE:
+                return True
+            if ether_type != ETH_P_IP:
+                return False
+            ver_ihl, proto = struct.unpack_from("!B8xB", data, offset)
+            if proto in IP_PROTOS:
+                return True
+            if proto != 17:
+                return False
+            offset = offset + (ver_ihl & 0x0F) * 4
+            sport, dport = struct.unpack_from("!HH", data, offset)
+            return bool(sport in BOOTP_PORTS or dport in BOOTP_PORTS)
+        except struct.error:
+            # truncated frame
+            return False
+
     def process(self, port, pkt):
 
         if IP in pkt and pkt.proto == 89:
@@ -46,6 +82,7 @@ class PacketProtocol(object):
         if EAP in pkt:
             self.dot1x_rx(port, pkt)
 
+    def process_periodic(self, port):
         self.igmp_tx_query_periodic(port)
         self.dot1x_tx_periodic(port)
 
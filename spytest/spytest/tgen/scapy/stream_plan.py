@@ -0,0 +1,271 @@
+import socket
+import struct
+import zlib
+import binascii
+
+from scapy.layers.l2 import Ether, Dot1Q, ARP
+from scapy.layers.inet import IP, UDP, TCP
+from scapy.layers.inet6 import IPv6, IPv6ExtHdrHopByHop, ICMPv6EchoRequest, ICMPv6ND_NS, ICMPv6ND_NA
+from scapy.layers.inet6 import ICMPv6MLReport, MIP6MH_BRR, _ICMPv6, _IPv6ExtHdr
+
+
+def adjust_checksum(data, offset, old, new, udp=False):
+    """Update the internet checksum at offset after the 16-bit aligned bytes old are replaced with new (RFC 1624)"""
+    csum = (data[offset] << 8) | data[offset + 1]
+    if udp and csum == 0:
+        # UDP over IPv4 without checksum
+        return
+    total = ~csum & 0xFFFF
+    for i in range(0, len(old), 2):
+        total += (~((old[i] << 8) | old[i + 1]) & 0xFFFF) + ((new[i] << 8) | new[i + 1])
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    csum = ~total & 0xFFFF
+    if udp and csum == 0:
+        csum = 0xFFFF
+    data[offset] = csum >> 8
+    data[offset + 1] = csum & 0xFF
+
+
+def frame_check_sequence(data):
+    """Get the CRC appended to the frame, same as formatting htonl(crc32) as hex string"""
+    return struct.pack(">I", socket.htonl(zlib.crc32(data) & 0xFFFFFFFF))
+
+
+def rebuild_checksums(pkt):
+    """Clear the checksums of all the layers, so that scapy computes them when the packet is built"""
+    layer = pkt
+    while layer:
+        for name in ["chksum", "cksum"]:
+            if name in layer.fields:
+                setattr(layer, name, None)
+        layer = layer.payload
+    return pkt
+
+
+class FieldPatch(object):
+    """
+    A packet field which changes on every packet.
+
+    The value occupies the low bits of the size bytes at offset, it is stepped in increment/decrement mode and
+    restarts from the first value after count packets, or cycles through the values in list mode.
+    """
+
+    def __init__(self, offset, size, first, step=0, count=0, values=None, bits=None, checksums=None):
+        self.offset = offset
+        self.size = size
+        self.first = first
+        self.value = first
+        self.step = step
+        self.count = count
+        self.values = values
+        self.mask = (1 << (bits or size * 8)) - 1
+        self.checksums = checksums or []
+        self.sent = 0
+
+    def next_value(self):
+        self.sent = self.sent + 1
+        if self.values is not None:
+            if self.sent >= len(self.values):
+                self.sent = 0
+            self.value = self.values[self.sent]
+        elif self.count > 0 and self.sent >= self.count:
+            self.sent = 0
+            self.value = self.first
+        else:
+            self.value = (self.value + self.step) & self.mask
+        return self.value
+
+
+class StreamPlan(object):
+    """
+    Raw bytes of the stream packet and the field patches to build the next packets.
+
+    The stream kws are parsed once when the plan is compiled, the next packets are built by patching the fields
+    of the raw bytes and updating the checksums incrementally, instead of changing and rebuilding scapy packets.
+    The packets are rebuilt by scapy when the IPv6 addresses change and the upper layer checksum is not known.
+    """
+
+    def __init__(self, pkt, kws, utils, logger):
+        self.utils = utils
+        self.logger = logger
+        self.kws = kws
+        self.data = bytearray(utils.tobytes(pkt))
+        self.patches = []
+        self.rebuild = False
+
+        # offsets of the checksums covering the fields, the upper layer
+        # checksum of IP/IPv6 covers the addresses in the pseudo header
+        ip_csum, ip_l4_csums, ipv6_l4_csums = [], [], []
+        tcp_csums, udp_csums = [], []
+        if TCP in pkt:
+            tcp_csums = [(self.layer_offset(pkt, TCP) + 16, False)]
+        if UDP in pkt:
+            udp_csums = [(self.layer_offset(pkt, UDP) + 6, True)]
+        if IP in pkt:
+            ip_csum = [(self.layer_offset(pkt, IP) + 10, False)]
+            upper = pkt[IP].payload
+            if isinstance(upper, (TCP, UDP)):
+                ip_l4_csums = self.upper_csums(pkt, upper)
+        if IPv6 in pkt:
+            upper = pkt[IPv6].payload
+            while isinstance(upper, _IPv6ExtHdr):
+                upper = upper.payload
+            if isinstance(upper, (TCP, UDP, _ICMPv6)):
+                ipv6_l4_csums = self.upper_csums(pkt, upper)
+            elif any(name in upper.fields for name in ["chksum", "cksum"]):
+                # other checksums covering the IPv6 pseudo header
+                self.rebuild = True
+
+        self.add_mac_patch("mac_src", 6, self.kws.get("mac_src"))
+        self.add_mac_patch("mac_dst", 0, self.kws.get("mac_dst"))
+        if ARP in pkt:
+            arp_offset = self.layer_offset(pkt, ARP)
+            self.add_mac_patch("arp_src_hw", arp_offset + 8)
+            self.add_mac_patch("arp_dst_hw", arp_offset + 18)
+        if IP in pkt:
+            ip_offset = self.layer_offset(pkt, IP)
+            self.add_ip_patch("ip_src", ip_offset + 12, 4, "0.0.0.1", ip_csum + ip_l4_csums)
+            self.add_ip_patch("ip_dst", ip_offset + 16, 4, "0.0.0.1", ip_csum + ip_l4_csums)
+        if IPv6 in pkt:
+            ipv6_offset = self.layer_offset(pkt, IPv6)
+            patches = len(self.patches)
+            self.add_ip_patch("ipv6_src", ipv6_offset + 8, 16, "::1", ipv6_l4_csums)
+            self.add_ip_patch("ipv6_dst", ipv6_offset + 24, 16, "::1", ipv6_l4_csums)
+            self.rebuild = self.rebuild and len(self.patches) > patches
+        if Dot1Q in pkt:
+            self.add_int_patch("vlan_id", self.layer_offset(pkt, Dot1Q), 2, bits=12)
+        if TCP in pkt:
+            tcp_offset = self.layer_offset(pkt, TCP)
+            self.add_int_patch("tcp_src_port", tcp_offset, 2, checksums=tcp_csums, short_modes=True)
+            self.add_int_patch("tcp_dst_port", tcp_offset + 2, 2, checksums=tcp_csums, short_modes=True)
+        if UDP in pkt:
+            udp_offset = self.layer_offset(pkt, UDP)
+            self.add_int_patch("udp_src_port", udp_offset, 2, checksums=udp_csums, short_modes=True)
+            self.add_int_patch("udp_dst_port", udp_offset + 2, 2, checksums=udp_csums, short_modes=True)
+
+    @staticmethod
+    def layer_offset(pkt, layer):
+        return len(pkt) - len(pkt[layer])
+
+    @staticmethod
+    def upper_csums(pkt, upper):
+        offset = len(pkt) - len(upper)
+        if isinstance(upper, TCP):
+            return [(offset + 16, False)]
+        if isinstance(upper, UDP):
+            return [(offset + 6, True)]
+        return [(offset + 2, False)]
+
+    def get_mode(self, prefix, modes):
+        mode = self.kws.get("{}_mode".format(prefix), "fixed").strip()
+        if mode in modes or mode == "fixed":
+            return mode
+        self.logger.todo("unhandled", "{}_mode".format(prefix), mode)
+        return "fixed"
+
+    def read(self, offset, size):
+        return int(binascii.hexlify(self.data[offset:offset + size]), 16)
+
+    def add_patch(self, patch):
+        self.patches.append(patch)
+
+    def add_mac_patch(self, prefix, offset, values=None):
+        modes = ["increment", "decrement", "list"] if values is not None else ["increment", "decrement"]
+        mode = self.get_mode(prefix, modes)
+        if mode == "fixed":
+            return
+        first = self.read(offset, 6)
+        if mode == "list":
+            values = [int(mac.replace(":", "").replace(".", ""), 16) for mac in values]
+            self.add_patch(FieldPatch(offset, 6, first, values=values))
+            return
+        step = int(self.kws.get("{}_step".format(prefix), "00:00:00:00:00:01").replace(":", "").replace(".", ""), 16)
+        count = self.utils.intval(self.kws, "{}_count".format(prefix), 0)
+        step = step if mode == "increment" else -step
+        self.add_patch(FieldPatch(offset, 6, first, step=step, count=count))
+
+    def add_ip_patch(self, prefix, offset, size, default_step, checksums):
+        mode = self.get_mode(prefix, ["increment", "decrement"])
+        if mode == "fixed":
+            return
+        step = self.kws.get("{}_step".format(prefix), default_step)
+        family = socket.AF_INET if size == 4 else socket.AF_INET6
+        step = int(binascii.hexlify(socket.inet_pton(family, step)), 16)
+        count = self.utils.intval(self.kws, "{}_count".format(prefix), 0)
+        step = step if mode == "increment" else -step
+        self.add_patch(FieldPatch(offset, size, self.read(offset, size), step=step, count=count, checksums=checksums))
+
+    def add_int_patch(self, prefix, offset, size, bits=None, checksums=None, short_modes=False):
+        modes = ["increment", "decrement", "incr", "decr"] if short_modes else ["increment", "decrement"]
+        mode = self.get_mode(prefix, modes)
+        if mode == "fixed":
+            return
+        step = self.utils.intval(self.kws, "{}_step".format(prefix), 1)
+        count = self.utils.intval(self.kws, "{}_count".format(prefix), 0)
+        step = step if mode in ["increment", "incr"] else -step
+        first = self.read(offset, size) & ((1 << (bits or size * 8)) - 1)
+        self.add_patch(FieldPatch(offset, size, first, step=step, count=count, bits=bits, checksums=checksums))
+
+    def next(self):
+        """Patch the fields of the raw bytes for the next packet"""
+        data = self.data
+        for patch in self.patches:
+            start, end = patch.offset, patch.offset + patch.size
+            old = data[start:end]
+            value = patch.next_value()
+            value = (self.read(start, patch.size) & ~patch.mask) | value
+            new = bytearray(binascii.unhexlify("{:0{}x}".format(value, patch.size * 2)))
+            data[start:end] = new
+            for offset, udp in patch.checksums:
+                adjust_checksum(data, offset, old, new, udp)
+        if self.rebuild:
+            self.data = bytearray(self.utils.tobytes(rebuild_checksums(Ether(bytes(data)))))
+
+    def build(self, padding=None, signature=None):
+        """Get the frame bytes including the padding, signature and CRC"""
+        strpkt = bytes(self.data)
+        if padding:
+            strpkt = strpkt + padding
+        if signature:
+            strpkt = strpkt[:-len(signature)] + signature
+        return strpkt + frame_check_sequence(strpkt)
+
+
+def check_checksums(count=300):
+    """Verify the checksums of the patched packets against the ones computed by scapy"""
+    from utils import Utils
+    l2 = Ether(src="00:00:00:00:00:01", dst="00:00:00:00:00:02")
+    ipv4 = l2 / IP(src="10.0.0.1", dst="20.0.0.1")
+    ipv6 = l2 / IPv6(src="2001::1", dst="2002::1")
+    ipv4_kws = dict(ip_src_mode="increment", ip_src_step="0.0.1.1", ip_dst_mode="decrement")
+    ipv6_kws = dict(ipv6_src_mode="increment", ipv6_src_step="::1:1", ipv6_dst_mode="decrement")
+    port_kws = dict(tcp_src_port_mode="increment", tcp_dst_port_mode="decrement", tcp_dst_port_step=7,
+                    udp_src_port_mode="incr", udp_src_port_step=3, udp_dst_port_mode="decr")
+    cases = [
+        ("ipv4-tcp", ipv4 / TCP(sport=1000, dport=2000) / ("x" * 10), dict(ipv4_kws, **port_kws)),
+        ("ipv4-udp", ipv4 / UDP(sport=1000, dport=2000) / ("x" * 11), dict(ipv4_kws, **port_kws)),
+        ("ipv6-tcp", ipv6 / TCP(sport=1000, dport=2000) / ("x" * 10), dict(ipv6_kws, **port_kws)),
+        ("ipv6-udp", ipv6 / UDP(sport=1000, dport=2000) / ("x" * 11), dict(ipv6_kws, **port_kws)),
+        ("icmpv6-echo", ipv6 / ICMPv6EchoRequest(data="x" * 11), ipv6_kws),
+        ("icmpv6-ns", ipv6 / ICMPv6ND_NS(tgt="2002::1"), dict(ipv6_dst_mode="increment")),
+        ("icmpv6-na", ipv6 / ICMPv6ND_NA(tgt="2001::1"), ipv6_kws),
+        ("icmpv6-mld", ipv6 / IPv6ExtHdrHopByHop() / ICMPv6MLReport(), ipv6_kws),
+        ("ipv6-mip6", ipv6 / MIP6MH_BRR(), ipv6_kws),
+    ]
+    errors = []
+    for name, pkt, kws in cases:
+        pkt = Ether(bytes(pkt))
+        plan = StreamPlan(pkt, kws, Utils, None)
+        for _ in range(count):
+            plan.next()
+            data = bytes(plan.data)
+            if data != bytes(rebuild_checksums(Ether(data))):
+                errors.append("{}: wrong checksum in {}".format(name, binascii.hexlify(data)))
+                break
+    return errors
+
+
+if __name__ == "__main__":
+    for error in check_checksums():
+        print(error)
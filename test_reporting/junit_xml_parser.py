@@ -26,6 +26,7 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
 import argparse
 import glob
 import json
+import multiprocessing
 import sys
 import os
 
@@ -178,23 +179,12 @@ def validate_junit_xml_archive(directory_name, strict=False):
     roots = []
     metadata_source = None
     metadata = {}
-    doc_list = glob.glob(os.path.join(directory_name, "tr.xml"))
-    doc_list += glob.glob(os.path.join(directory_name, "*test*.xml"))
-    doc_list += glob.glob(os.path.join(directory_name, "**", "*test*.xml"), recursive=True)
-    doc_list = set(doc_list)
-
-    total_size = 0
-    for document in doc_list:
-        total_size += os.path.getsize(document)
-
-    if total_size > MAXIMUM_XML_SIZE:
-        raise JUnitXMLValidationError("provided directory is too large")
+    doc_list = _find_junit_xml_documents(directory_name)
 
     for document in doc_list:
         try:
             root = validate_junit_xml_file(document)
-            root_metadata = {k: v for k, v in _parse_test_metadata(root).items()
-                             if k in REQUIRED_METADATA_PROPERTIES and k != "timestamp"}
+            root_metadata = _get_run_metadata(_parse_test_metadata(root))
 
             if root_metadata:
                 # All metadata from a single test run should be identical, so we
@@ -203,10 +193,7 @@ def validate_junit_xml_archive(directory_name, strict=False):
                     metadata_source = document
                     metadata = root_metadata
 
-                if root_metadata != metadata:
-                    raise JUnitXMLValidationError(f"{document} metadata differs from {metadata_source}\n"
-                                                  f"{document}: {root_metadata}\n"
-                                                  f"{metadata_source}: {metadata}")
+                _check_run_metadata(document, root_metadata, metadata_source, metadata)
 
             roots.append((root, document))
         except Exception as e:
@@ -220,6 +207,33 @@ def validate_junit_xml_archive(directory_name, strict=False):
     return roots
 
 
+def _find_junit_xml_documents(directory_name):
+    doc_list = glob.glob(os.path.join(directory_name, "tr.xml"))
+    doc_list += glob.glob(os.path.join(directory_name, "*test*.xml"))
+    doc_list += glob.glob(os.path.join(directory_name, "**", "*test*.xml"), recursive=True)
+    doc_list = sorted(set(doc_list))
+
+    total_size = 0
+    for document in doc_list:
+        total_size += os.path.getsize(document)
+
+    if total_size > MAXIMUM_XML_SIZE:
+        raise JUnitXMLValidationError("provided directory is too large")
+
+    return doc_list
+
+
+def _get_run_metadata(test_metadata):
+    return {k: v for k, v in test_metadata.items() if k in REQUIRED_METADATA_PROPERTIES and k != "timestamp"}
+
+
+def _check_run_metadata(document, root_metadata, metadata_source, metadata):
+    if root_metadata != metadata:
+        raise JUnitXMLValidationError(f"{document} metadata differs from {metadata_source}\n"
+                                      f"{document}: {root_metadata}\n"
+                                      f"{metadata_source}: {metadata}")
+
+
 def validate_junit_xml_path(path, strict=False):
     if os.path.isfile(path):
         roots = [(validate_junit_xml_file(path), path)]
@@ -247,6 +261,10 @@ def _validate_test_summary(root):
     else:
         raise JUnitXMLValidationError(f"Either {TESTSUITES_TAG} or {TESTSUITE_TAG} tag are not found on root element")
 
+    _validate_testsuite_attributes(testsuit_element)
+
+
+def _validate_testsuite_attributes(testsuit_element):
     for xml_field, expected_type in REQUIRED_TESTSUITE_ATTRIBUTES:
         if xml_field not in testsuit_element.keys():
             raise JUnitXMLValidationError(f"{xml_field} not found in <{TESTSUITE_TAG}> element")
@@ -330,16 +348,17 @@ def _validate_test_case_properties(root):
         print("missing testcase property: {}".format(list(missing_testcase_property)))
 
 
-def _validate_test_cases(root):
-    def _validate_test_case(test_case):
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            if attribute not in test_case.keys():
-                raise JUnitXMLValidationError(
-                    f'"{attribute}" not found in test case '
-                    f"\"{test_case.get('name', 'Name Not Found')}\""
-                )
-        _validate_test_case_properties(test_case)
+def _validate_test_case(test_case):
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        if attribute not in test_case.keys():
+            raise JUnitXMLValidationError(
+                f'"{attribute}" not found in test case '
+                f"\"{test_case.get('name', 'Name Not Found')}\""
+            )
+    _validate_test_case_properties(test_case)
 
+
+def _validate_test_cases(root):
     cases = root.findall(TESTCASE_TAG)
 
     for test_case in cases:
@@ -374,6 +393,140 @@ def parse_test_result(roots):
     return test_result_json
 
 
+def parse_junit_xml_path(path, strict=False, processes=None):
+    """Validate and parse a JUnit XML file or archive into JSON.
+
+    Each file is streamed instead of being loaded as a whole, the test cases are parsed as they are read and
+    dropped afterwards. The files of an archive are parsed in a process pool.
+
+    Args:
+        path: The name of the XML file, or of the directory containing XML documents.
+        strict: Fail if ANY file in the directory is not valid, instead of skipping it.
+        processes: The number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        A dict containing the parsed test result, in the same format as parse_test_result.
+
+    Raises:
+        JUnitXMLValidationError: if the file or the directory is not valid, see validate_junit_xml_path.
+    """
+    if os.path.isfile(path):
+        documents = [path]
+        strict = True
+    elif os.path.isdir(path):
+        documents = _find_junit_xml_documents(path)
+    else:
+        raise JUnitXMLValidationError("file not found")
+
+    processes = min(processes or multiprocessing.cpu_count(), len(documents))
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            parsed_documents = pool.map(_stream_junit_xml_document, documents)
+    else:
+        parsed_documents = [_stream_junit_xml_document(document) for document in documents]
+
+    test_result_json = defaultdict(dict)
+    metadata_source = None
+    metadata = {}
+    parsed_count = 0
+    for document, (parsed, error) in zip(documents, parsed_documents):
+        try:
+            if error:
+                raise error
+            root_metadata, test_metadata, test_cases, test_summary = parsed
+            if root_metadata:
+                # All metadata from a single test run should be identical, so we
+                # just use the first one we see to validate the rest.
+                if not metadata_source:
+                    metadata_source = document
+                    metadata = root_metadata
+
+                _check_run_metadata(document, root_metadata, metadata_source, metadata)
+        except Exception as e:
+            if strict:
+                if len(documents) == 1:
+                    raise
+                raise JUnitXMLValidationError(f"could not parse {document}: {e}") from e
+
+            print(f"could not parse {document}: {e} - skipping")
+            continue
+
+        test_result_json["test_metadata"] = _update_test_metadata(test_result_json["test_metadata"], test_metadata)
+        test_result_json["test_cases"] = _update_test_cases(test_result_json["test_cases"], test_cases)
+        test_result_json["test_summary"] = _update_test_summary(test_result_json["test_summary"], test_summary)
+        parsed_count += 1
+
+    if not parsed_count:
+        print("No XML file needs to be parsed or the file is empty.")
+        return
+
+    print(f"Parsed {parsed_count} XML document(s) into test result JSON.")
+    return test_result_json
+
+
+def _stream_junit_xml_document(document_name):
+    """Validate and parse a JUnit XML file in a single pass.
+
+    The checks are the same as validate_junit_xml_file, and the results are the same as parse_test_result, errors
+    are returned instead of being raised, so that they can be passed back from the worker processes.
+
+    Returns:
+        ((root metadata, test metadata, test cases, test summary), None) if the file is valid, otherwise
+        (None, error).
+    """
+    try:
+        if os.path.getsize(document_name) > MAXIMUM_XML_SIZE:
+            raise JUnitXMLValidationError("provided file is too large")
+
+        root = None
+        testsuite = None
+        path = []
+        test_case_results = defaultdict(list)
+        try:
+            for event, element in ET.iterparse(document_name, events=("start", "end"), forbid_dtd=True):
+                if event == "start":
+                    if root is None:
+                        root = element
+                        if root.tag == TESTSUITE_TAG:
+                            testsuite = root
+                            _validate_testsuite_attributes(testsuite)
+                        elif root.tag != TESTSUITES_TAG:
+                            raise JUnitXMLValidationError(
+                                f"Either {TESTSUITES_TAG} or {TESTSUITE_TAG} tag are not found on root element")
+                    elif testsuite is None and element.tag == TESTSUITE_TAG and path[-1] is root:
+                        testsuite = element
+                        _validate_testsuite_attributes(testsuite)
+                    path.append(element)
+                    continue
+
+                path.pop()
+                if element.tag != TESTCASE_TAG or not path:
+                    continue
+                # Only the test cases right under the root are validated, same as _validate_test_cases
+                if path[-1] is root:
+                    _validate_test_case(element)
+                if path[-1] is testsuite:
+                    feature, result = _parse_test_case(element)
+                    if feature is not None and result is not None:
+                        test_case_results[feature].append(result)
+                element.clear()
+        except JUnitXMLValidationError:
+            raise
+        except Exception as e:
+            raise JUnitXMLValidationError(f"could not parse {document_name}: {e}") from e
+
+        if testsuite is None:
+            raise JUnitXMLValidationError(f"{TESTSUITE_TAG} tag not found")
+        _validate_test_metadata(root)
+
+        root_metadata = _get_run_metadata(_parse_test_metadata(root))
+        parsed = (root_metadata, _parse_test_metadata(testsuite), dict(test_case_results),
+                  _parse_test_summary(testsuite))
+        return parsed, None
+    except Exception as e:
+        return None, e
+
+
 def _parse_test_summary(root):
     test_result_summary = {}
     for attribute, _ in REQUIRED_TESTSUITE_ATTRIBUTES:
@@ -449,69 +602,70 @@ def _parse_testcase_properties(root):
     return testcase_properties
 
 
-def _parse_test_cases(root):
-    test_case_results = defaultdict(list)
-
-    def _parse_test_case(test_case):
+def _parse_test_case(test_case):
+
+    # For special case like: <testcase time="17.190" />
+    # There is no required attributes in it, then just return None, None
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        if attribute not in test_case.keys():
+            return None, None
+
+    result = {}
+
+    # FIXME: This is specific to pytest, needs to be extended to support spytest.
+    test_class_tokens = test_case.get("classname").split(".")
+    feature = test_class_tokens[0]
+
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        result[attribute] = test_case.get(attribute)
+    testcase_properties = _parse_testcase_properties(test_case)
+    for attribute in REQUIRED_TESTCASE_PROPERTIES:
+        if attribute in testcase_properties:
+            result[attribute] = testcase_properties[attribute]
+
+    # NOTE: "if failure" and "if error" does not work with the ETree library.
+    failure = test_case.find("failure")
+    error = test_case.find("error")
+    skipped = test_case.find("skipped")
+
+    # Any test which marked as xfail will drop out a property to the report xml file.
+    # Add prefix "xfail_" to tests which are marked with xfail
+    properties_element = test_case.find(PROPERTIES_TAG)
+    xfail_case = ""
+    if properties_element:
+        for prop in properties_element.iterfind(PROPERTY_TAG):
+            if prop.get("name") == "xfail":
+                xfail_case = "xfail_"
+                break
+
+    # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
+    # Because of this, we track errors separately so that the error can be correlated with the stage it
+    # occurred.
+    # By looking into test results from past 300 days, error only occur with skipped test result.
+    #
+    # If there is *only* an error tag we note that as well, as this indicates that the framework
+    # errored out during setup or teardown.
+    if failure is not None:
+        result["result"] = "{}failure".format(xfail_case)
+        summary = failure.get("message", "")
+    elif skipped is not None:
+        result["result"] = "{}skipped".format(xfail_case)
+        summary = skipped.get("message", "")
+    elif error is not None:
+        result["result"] = "{}error".format(xfail_case)
+        summary = error.get("message", "")
+    else:
+        result["result"] = "{}success".format(xfail_case)
+        summary = ""
 
-        # For special case like: <testcase time="17.190" />
-        # There is no required attributes in it, then just return None, None
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            if attribute not in test_case.keys():
-                return None, None
+    result["summary"] = summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]
+    result["error"] = error is not None
 
-        result = {}
+    return feature, result
 
-        # FIXME: This is specific to pytest, needs to be extended to support spytest.
-        test_class_tokens = test_case.get("classname").split(".")
-        feature = test_class_tokens[0]
 
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            result[attribute] = test_case.get(attribute)
-        for attribute in REQUIRED_TESTCASE_PROPERTIES:
-            testcase_properties = _parse_testcase_properties(test_case)
-            if attribute in testcase_properties:
-                result[attribute] = testcase_properties[attribute]
-
-        # NOTE: "if failure" and "if error" does not work with the ETree library.
-        failure = test_case.find("failure")
-        error = test_case.find("error")
-        skipped = test_case.find("skipped")
-
-        # Any test which marked as xfail will drop out a property to the report xml file.
-        # Add prefix "xfail_" to tests which are marked with xfail
-        properties_element = test_case.find(PROPERTIES_TAG)
-        xfail_case = ""
-        if properties_element:
-            for prop in properties_element.iterfind(PROPERTY_TAG):
-                if prop.get("name") == "xfail":
-                    xfail_case = "xfail_"
-                    break
-
-        # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
-        # Because of this, we track errors separately so that the error can be correlated with the stage it
-        # occurred.
-        # By looking into test results from past 300 days, error only occur with skipped test result.
-        #
-        # If there is *only* an error tag we note that as well, as this indicates that the framework
-        # errored out during setup or teardown.
-        if failure is not None:
-            result["result"] = "{}failure".format(xfail_case)
-            summary = failure.get("message", "")
-        elif skipped is not None:
-            result["result"] = "{}skipped".format(xfail_case)
-            summary = skipped.get("message", "")
-        elif error is not None:
-            result["result"] = "{}error".format(xfail_case)
-            summary = error.get("message", "")
-        else:
-            result["result"] = "{}success".format(xfail_case)
-            summary = ""
-
-        result["summary"] = summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]
-        result["error"] = error is not None
-
-        return feature, result
+def _parse_test_cases(root):
+    test_case_results = defaultdict(list)
 
     for test_case in root.findall("testcase"):
         feature, result = _parse_test_case(test_case)
@@ -703,13 +857,24 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
 
     args = parser.parse_args()
 
+    test_result_json = None
     try:
         if args.json:
             validate_junit_json_file(args.file_name)
+        elif args.validate_only:
+            if args.directory:
+                validate_junit_xml_archive(args.file_name, args.strict)
+            else:
+                validate_junit_xml_file(args.file_name)
         elif args.directory:
-            roots = validate_junit_xml_archive(args.file_name, args.strict)
+            if os.path.isdir(args.file_name):
+                test_result_json = parse_junit_xml_path(args.file_name, args.strict)
+            else:
+                print("directory {} not found".format(args.file_name))
+        elif os.path.isfile(args.file_name):
+            test_result_json = parse_junit_xml_path(args.file_name)
         else:
-            roots = [(validate_junit_xml_file(args.file_name), args.file_name)]
+            raise JUnitXMLValidationError("file not found")
     except JUnitXMLValidationError as e:
         print(f"XML validation failed: {e}")
         sys.exit(1)
@@ -724,7 +889,6 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
         print(f"{args.file_name} validated succesfully!")
         sys.exit(0)
 
-    test_result_json = parse_test_result(roots)
     if test_result_json is None:
         print("XML file doesn't exist or no data in the file.")
         sys.exit(1)
@@ -4,6 +4,7 @@ import pytest
 
 from test_reporting.junit_xml_parser import validate_junit_xml_stream, validate_junit_xml_file
 from test_reporting.junit_xml_parser import validate_junit_xml_archive, parse_test_result, JUnitXMLValidationError
+from test_reporting.junit_xml_parser import validate_junit_xml_path, parse_junit_xml_path
 
 
 VALID_TEST_RESULT = """<?xml version="1.0" encoding="utf-8"?>
@@ -242,6 +243,29 @@ def test_json_output_from_archive():
     assert ordered(parse_test_result(roots)) == ordered(EXPECTED_JSON_OUTPUT)
 
 
+@pytest.mark.parametrize("path", [VALID_TEST_RESULT_FILE, VALID_TEST_RESULT_ARCHIVE])
+@pytest.mark.parametrize("processes", [1, 2])
+def test_json_output_from_streaming_parser(path, processes):
+    expected = parse_test_result(validate_junit_xml_path(path))
+    assert ordered(parse_junit_xml_path(path, processes=processes)) == ordered(expected)
+
+
+@pytest.mark.parametrize(
+    "token,replacement,message",
+    [
+        ("testsuite", "fail", ".* tag are not found on root element"),
+        ("hwsku", "host", "duplicate metadata element: .*"),
+        ("classname", "hehe", ".* not found in test case .*"),
+        ("</", "<", "could not parse .*"),
+    ],
+)
+def test_invalid_junit_xml_from_streaming_parser(tmp_path, token, replacement, message):
+    test_file = tmp_path / "tr.xml"
+    test_file.write_text(VALID_TEST_RESULT.replace(token, replacement))
+    with pytest.raises(JUnitXMLValidationError, match=message):
+        parse_junit_xml_path(str(test_file))
+
+
 def test_xml_file_not_found():
     with pytest.raises(JUnitXMLValidationError, match="file not found"):
         validate_junit_xml_file("nonexistent.xml")
@@ -4,16 +4,21 @@ import inspect
 import logging
 import os
 import pickle
-import random
 import shutil
 import sys
-import time
+import tempfile
 
-from collections import defaultdict
+from collections import OrderedDict
 from pickle import UnpicklingError
-from threading import Lock
+from threading import RLock, Lock
 from six import with_metaclass
 
+try:
+    from .facts_cache_server import FactsCacheClient, FactsCacheServerError, get_socket_path
+except ImportError:
+    # Run as a script to cleanup the cache
+    from facts_cache_server import FactsCacheClient, FactsCacheServerError, get_socket_path
+
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +27,13 @@ CACHE_LOCATION = os.path.join(CURRENT_PATH, '../../../_cache')
 
 SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
+MEMORY_ENTRY_LIMIT = 1000    # Max number of facts kept in memory by each process.
 DISABLE_CACHE_PARAM = "disable_cache"
 
+# Fields of the dictionary stored in cache files, plain types are used to keep the files loadable without this module
+FINGERPRINT_FIELD = "_facts_cache_fingerprint"
+VALUE_FIELD = "_facts_cache_value"
+
 
 class Singleton(type):
 
@@ -43,6 +53,13 @@ class FactsCache(with_metaclass(Singleton, object)):
 
     Used singleton design pattern. Only a single instance of this class can be initialized.
 
+    The facts are kept in a bounded in-memory LRU and in pickle files, which are written atomically so that
+    concurrent readers never see a partially written file. The disk usage is tracked in an index built once per
+    process, the least recently used files are evicted when the usage exceeds the limitations.
+
+    Each cached facts can be tagged with a fingerprint, like the image version and config hash of a DUT. A cached
+    facts whose fingerprint doesn't match the fingerprint passed to read() is treated as not existing.
+
     Args:
         with_metaclass ([function]): Python 2&3 compatible function from the six library for adding metaclass.
     """
@@ -51,80 +68,204 @@ class FactsCache(with_metaclass(Singleton, object)):
 
     def __init__(self, cache_location=CACHE_LOCATION):
         self._cache_location = os.path.abspath(cache_location)
-        self._cache = defaultdict(dict)
-        self._write_lock = Lock()
+        # (zone, key) => (fingerprint, value)
+        self._cache = OrderedDict()
+        # file path => file size, in least recently used order. None until the cache folder is scanned.
+        self._disk_index = None
+        self._disk_usage = 0
+        self._lock = RLock()
+        self._server = None
+
+    def _facts_file(self, zone, key):
+        return os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
+
+    def _remember(self, zone, key, fingerprint, value):
+        with self._lock:
+            self._cache[(zone, key)] = (fingerprint, value)
+            self._cache.move_to_end((zone, key))
+            while len(self._cache) > MEMORY_ENTRY_LIMIT:
+                self._cache.popitem(last=False)
+
+    def _load_disk_index(self):
+        """Scan the cache folder once to build the disk usage index, the oldest files are evicted first."""
+        files = []
+        for root, _, filenames in os.walk(self._cache_location):
+            for filename in filenames:
+                fp = os.path.join(root, filename)
+                try:
+                    stat = os.stat(fp)
+                except OSError:
+                    continue
+                files.append((max(stat.st_atime, stat.st_mtime), fp, stat.st_size))
+        files.sort()
+        self._disk_index = OrderedDict((fp, size) for _, fp, size in files)
+        self._disk_usage = sum(self._disk_index.values())
+
+    def _touch_file(self, facts_file, size=None):
+        """Record usage of a cache file in the disk usage index, or add the file if size is given."""
+        with self._lock:
+            if self._disk_index is None:
+                return
+            if size is not None:
+                self._disk_usage += size - self._disk_index.get(facts_file, 0)
+                self._disk_index[facts_file] = size
+            if facts_file in self._disk_index:
+                self._disk_index.move_to_end(facts_file)
+
+    def _forget_files(self, prefix):
+        """Remove the files under path prefix from the disk usage index."""
+        with self._lock:
+            if self._disk_index is None:
+                return
+            for fp in [fp for fp in self._disk_index if fp == prefix or fp.startswith(prefix + os.sep)]:
+                self._disk_usage -= self._disk_index.pop(fp)
+
+    def _evict(self, new_size):
+        """Remove the least recently used cache files until there is room for a new file of new_size bytes."""
+        with self._lock:
+            if self._disk_index is None:
+                self._load_disk_index()
+            while self._disk_index and (self._disk_usage + new_size > SIZE_LIMIT or
+                                        len(self._disk_index) + 1 > ENTRY_LIMIT):
+                fp, size = self._disk_index.popitem(last=False)
+                self._disk_usage -= size
+                try:
+                    os.remove(fp)
+                    logger.info('[Cache] Evicted cache file "{}"'.format(fp))
+                except OSError:
+                    pass
+            if new_size > SIZE_LIMIT:
+                msg = 'Cache entry size exceeds limitations. size={}, SIZE_LIMIT={}'.format(new_size, SIZE_LIMIT)
+                raise Exception(msg)
+
+    def enable_server(self, start_server=True):
+        """Share the cached facts with the other processes through the facts cache server.
 
-    def _check_usage(self):
-        """Check cache usage, raise exception if usage exceeds the limitations.
+        Args:
+            start_server (bool): Start the facts cache server if it is not running.
+
+        Returns:
+            boolean: The facts cache server is used or not.
         """
-        total_size = 0
-        total_entries = 0
-        for root, _, files in os.walk(self._cache_location):
-            for f in files:
-                fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
-
-        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
-            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
-                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
-
-    def _read_facts_file(self, facts_file, z, k):
+        client = FactsCacheClient(get_socket_path(self._cache_location), self._cache_location)
+        try:
+            client.connect(start_server)
+        except FactsCacheServerError as e:
+            logger.warning('[Cache] Facts cache server is not available: {}'.format(repr(e)))
+            return False
+        self._server = client
+        return True
+
+    def _server_failed(self, e):
+        logger.warning('[Cache] Facts cache server failed, stop using it: {}'.format(repr(e)))
+        self._server = None
+
+    @staticmethod
+    def _unpack(data):
+        facts = pickle.loads(data)
+        if not isinstance(facts, dict) or FINGERPRINT_FIELD not in facts:
+            # File written by a previous version of the cache, without fingerprint
+            return None, facts
+        return facts[FINGERPRINT_FIELD], facts[VALUE_FIELD]
+
+    def _read_facts_file(self, facts_file):
         with open(facts_file, 'rb') as f:
-            self._cache[z][k] = pickle.load(f)
-            logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
-            return self._cache[z][k]
+            data = f.read()
+        cached = self._unpack(data)
+        self._touch_file(facts_file)
+        return data, cached
+
+    def _read_from_server(self, zone, key, fingerprint, claim):
+        if self._server is None:
+            return None
+        try:
+            data = self._server.get(zone, key, fingerprint, claim)
+        except FactsCacheServerError as e:
+            self._server_failed(e)
+            return None
+        if data is None:
+            return None
+        try:
+            return self._unpack(data)
+        except Exception as e:
+            logger.warning('[Cache] Load facts "{}.{}" from cache server failed: {}'.format(zone, key, repr(e)))
+            return None
 
-    def read(self, zone, key):
+    def read(self, zone, key, fingerprint=None, claim=False):
         """Read cached facts.
 
         Args:
             zone (str): Cached facts are organized by zones. This argument is to specify the zone name.
                 The zone name could be hostname.
             key (str): Name of cached facts.
+            fingerprint (str): Fingerprint of the current state of the zone. If specified, cached facts written with
+                a different fingerprint are stale and not returned.
+            claim (bool): When the facts cache server is used and the facts are not cached, the caller is going
+                to gather and write the facts, or call release(). Other processes reading the same facts in the
+                meantime wait for them instead of gathering them again.
 
         Returns:
             obj: Cached object, usually a dictionary.
         """
+        def is_fresh(cached):
+            return fingerprint is None or cached[0] == fingerprint
+
         # Lazy load
-        if zone in self._cache and key in self._cache[zone]:
+        with self._lock:
+            cached = self._cache.get((zone, key))
+            if cached is not None:
+                self._cache.move_to_end((zone, key))
+        if cached is not None and is_fresh(cached):
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
-            return self._cache[zone][key]
-        else:
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+            return cached[1]
+
+        from_server = self._read_from_server(zone, key, fingerprint, claim)
+        if from_server is not None:
+            logger.debug('[Cache] Loaded cached facts "{}.{}" from cache server'.format(zone, key))
+            self._remember(zone, key, *from_server)
+            return from_server[1]
+
+        facts_file = self._facts_file(zone, key)
+        try:
+            data, cached = self._read_facts_file(facts_file)
+            logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(zone, key, facts_file))
+        except (IOError, ValueError) as e:
+            logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
+                        .format(os.path.abspath(facts_file), repr(e)))
+            return self.NOTEXIST
+        except (EOFError, UnpicklingError) as e:
+            # Cache files are written atomically, a file that can't be unpickled is corrupted. Return NOTEXIST
+            # to overwrite the file.
+            logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
+                         .format(facts_file, repr(e)))
+            return self.NOTEXIST
+        except Exception as e:
+            logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
+                        .format(os.path.abspath(facts_file), repr(e)))
+            return self.NOTEXIST
+        self._remember(zone, key, *cached)
+
+        if not is_fresh(cached):
+            logger.info('[Cache] Cached facts "{}.{}" is stale, fingerprint "{}" doesn\'t match "{}"'
+                        .format(zone, key, cached[0], fingerprint))
+            return self.NOTEXIST
+        if self._server is not None:
+            # Share the facts loaded from file with the other processes, this also releases the claim
+            try:
+                self._server.put(zone, key, cached[0], data, persist=False)
+            except FactsCacheServerError as e:
+                self._server_failed(e)
+        return cached[1]
+
+    def release(self, zone, key):
+        """Release the claim of facts taken by read() when the facts are not going to be written."""
+        if self._server is not None:
             try:
-                return self._read_facts_file(facts_file, zone, key)
-            except (IOError, ValueError) as e:
-                logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
-            except (EOFError, UnpicklingError) as e:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that
-                #   - a file is being written by process1 while process2 is reading it, causing EOFError in process2
-                #   - a file is being read by multiple processes at the same time, causing UnpicklingError in some of
-                #     the processes
-                # In these cases, we will retry to read the file after a short random sleep. If we still get the same
-                # error after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    time.sleep(random.randint(3, 6))
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except (EOFError, UnpicklingError):
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
-                logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
-                             .format(facts_file, repr(e)))
-                return self.NOTEXIST
-            except Exception as e:
-                logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
-
-    def write(self, zone, key, value):
+                self._server.release(zone, key)
+            except FactsCacheServerError as e:
+                self._server_failed(e)
+
+    def write(self, zone, key, value, fingerprint=None):
         """Store facts to cache.
 
         Args:
@@ -132,27 +273,48 @@ class FactsCache(with_metaclass(Singleton, object)):
                 The zone name could be hostname.
             key (str): Name of cached facts.
             value (obj): Value of cached facts. Usually a dictionary.
+            fingerprint (str): Fingerprint of the current state of the zone, stored with the facts.
 
         Returns:
             boolean: Caching facts is successful or not.
         """
-        with self._write_lock:
-            self._check_usage()
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
-            try:
-                cache_subfolder = os.path.join(self._cache_location, zone)
-                if not os.path.exists(cache_subfolder):
-                    logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
-
-                with open(facts_file, 'wb') as f:
-                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+        facts_file = self._facts_file(zone, key)
+        try:
+            data = pickle.dumps({FINGERPRINT_FIELD: fingerprint, VALUE_FIELD: value}, pickle.HIGHEST_PROTOCOL)
+            self._evict(len(data))
+
+            if self._server is not None:
+                # The cache server is the single writer of the cache files when it is used
+                try:
+                    self._server.put(zone, key, fingerprint, data)
+                    self._touch_file(facts_file, len(data))
+                    self._remember(zone, key, fingerprint, value)
+                    logger.info('[Cache] Cached facts "{}.{}" to cache server'.format(zone, key))
                     return True
-            except (IOError, ValueError) as e:
-                logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
-                return False
+                except FactsCacheServerError as e:
+                    self._server_failed(e)
+
+            cache_subfolder = os.path.join(self._cache_location, zone)
+            if not os.path.exists(cache_subfolder):
+                logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
+                os.makedirs(cache_subfolder, exist_ok=True)
+
+            # Write to a temporary file then rename it, so that the cache file is replaced atomically
+            fd, tmp_file = tempfile.mkstemp(dir=cache_subfolder, prefix='.{}.'.format(key), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_file, facts_file)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+            self._touch_file(facts_file, len(data))
+            self._remember(zone, key, fingerprint, value)
+            logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+            return True
+        except (IOError, ValueError, pickle.PicklingError) as e:
+            logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+            return False
 
     def cleanup(self, zone=None, key=None):
         """Cleanup cached files.
@@ -163,30 +325,41 @@ class FactsCache(with_metaclass(Singleton, object)):
                 will be cleaned up.
             key (str): Name of cached facts. Default is None.
         """
+        if self._server is not None:
+            try:
+                self._server.cleanup(zone, key)
+            except FactsCacheServerError as e:
+                self._server_failed(e)
         if zone:
             if key:
-                if zone in self._cache and key in self._cache[zone]:
-                    del self._cache[zone][key]
-                    logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                with self._lock:
+                    if self._cache.pop((zone, key), None) is not None:
+                        logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                cache_file = self._facts_file(zone, key)
+                self._forget_files(cache_file)
                 try:
-                    cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
                     os.remove(cache_file)
                     logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
                 except OSError as e:
                     logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
                                  .format(zone, key, repr(e)))
             else:
-                if zone in self._cache:
-                    del self._cache[zone]
-                    logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                with self._lock:
+                    for cached_key in [cached_key for cached_key in self._cache if cached_key[0] == zone]:
+                        del self._cache[cached_key]
+                logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                cache_subfolder = os.path.join(self._cache_location, zone)
+                self._forget_files(cache_subfolder)
                 try:
-                    cache_subfolder = os.path.join(self._cache_location, zone)
                     shutil.rmtree(cache_subfolder)
                     logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
                 except OSError as e:
                     logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
         else:
-            self._cache = defaultdict(dict)
+            with self._lock:
+                self._cache = OrderedDict()
+                self._disk_index = None
+                self._disk_usage = 0
             try:
                 shutil.rmtree(self._cache_location)
                 logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
@@ -222,6 +395,18 @@ def _get_default_zone(function, func_args, func_kargs):
     return zone
 
 
+def _get_default_fingerprint(function, func_args, func_kargs):
+    """
+        Default fingerprint getter used for decorator cached.
+        If the function is a bound method of an object with attribute 'facts_fingerprint', like SonicHost, the
+        cached facts are invalidated when the fingerprint changes.
+    """
+    if not func_args:
+        return None
+    fingerprint = getattr(func_args[0], "facts_fingerprint", None)
+    return fingerprint if isinstance(fingerprint, str) else None
+
+
 def _get_disable_cache(target, args, kwargs):
     """
     For the function with signature:
@@ -241,7 +426,7 @@ def _get_disable_cache(target, args, kwargs):
     return bound_args.arguments.get(DISABLE_CACHE_PARAM, False)
 
 
-def cached(name, zone_getter=None, after_read=None, before_write=None):
+def cached(name, zone_getter=None, after_read=None, before_write=None, fingerprint_getter=None):
     """Decorator for enabling cache for facts.
 
     The cached facts are to be stored by <name>.pickle. Because the cached pickle files must be stored under subfolder
@@ -252,12 +437,16 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
     With default zone getter function, this decorator can try to find zone:
     if the function is a bound method of class AnsibleHostBase and its derivatives, it will try to use its
     attribute 'hostname' as zone, or raises an error if 'hostname' doesn't exists or is not a string.
+    The cached facts are tagged with a fingerprint returned by the fingerprint getter function, which has the same
+    signature as the zone getter function. The default fingerprint getter uses attribute 'facts_fingerprint' of the
+    instance, cached facts with a different fingerprint are gathered again.
 
     Args:
         name ([str]): Name of the cached facts.
         zone_getter ([function]): Function used to get hostname used as zone.
         after_read ([function]): Hook function used to process facts after read from cache.
         before_write ([function]): Hook function used to process facts before write into cache.
+        fingerprint_getter ([function]): Function used to get the fingerprint the cached facts must match.
     Returns:
         [function]: Decorator function.
     """
@@ -274,26 +463,38 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
             _zone_getter = zone_getter or _get_default_zone
             zone = _zone_getter(target, args, kargs)
 
-            cached_facts = cache.read(zone, name)
-            if after_read:
-                cached_facts = after_read(cached_facts, target, args, kargs)
-            if cached_facts is not FactsCache.NOTEXIST:
-                logger.debug(f"[Cache] Use cache for func[{target}], zone[{zone}], key[{name}]")
-                return cached_facts
-            else:
-                facts = target(*args, **kargs)
-                if before_write:
-                    _facts = before_write(facts, target, args, kargs)
-                    cache.write(zone, name, _facts)
+            _fingerprint_getter = fingerprint_getter or _get_default_fingerprint
+            fingerprint = _fingerprint_getter(target, args, kargs)
+
+            cached_facts = cache.read(zone, name, fingerprint=fingerprint, claim=True)
+            # The facts are claimed on a miss, other workers wait for them until they are written or released
+            claimed = cached_facts is FactsCache.NOTEXIST
+            written = False
+            try:
+                if after_read:
+                    cached_facts = after_read(cached_facts, target, args, kargs)
+                if cached_facts is not FactsCache.NOTEXIST:
+                    logger.debug(f"[Cache] Use cache for func[{target}], zone[{zone}], key[{name}]")
+                    return cached_facts
                 else:
-                    cache.write(zone, name, facts)
-                return facts
+                    facts = target(*args, **kargs)
+                    if before_write:
+                        _facts = before_write(facts, target, args, kargs)
+                        written = cache.write(zone, name, _facts, fingerprint=fingerprint)
+                    else:
+                        written = cache.write(zone, name, facts, fingerprint=fingerprint)
+                    return facts
+            finally:
+                if claimed and written is not True:
+                    cache.release(zone, name)
         return wrapper
     return decorator
 
 
 if __name__ == '__main__':
     cache = FactsCache()
+    # Also drop the facts held by a running cache server
+    cache.enable_server(start_server=False)
     if len(sys.argv) == 2:
         zone = sys.argv[1]
     else:
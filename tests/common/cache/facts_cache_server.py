@@ -0,0 +1,325 @@
+"""Local facts cache server shared by the pytest processes of a parallel run.
+
+The server keeps the cached facts in memory and is the single writer of the cache files. Clients talk to it over a
+Unix socket in a directory only accessible by the current user. Both ends check that the peer runs as the same user
+before unpickling anything from the socket. When several processes miss the same facts at the same time, only the
+first one gets to gather the facts, the others wait until the facts are stored and then get them from the server.
+
+The server is started on demand by the first client and exits after it has been idle for IDLE_TIMEOUT seconds.
+It only uses the standard library and handles the cached facts as opaque pickled bytes, so it can be run directly:
+
+    python facts_cache_server.py <socket_path> <cache_location>
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 120          # Seconds without connected clients before the server exits
+PENDING_TIMEOUT = 600       # Max seconds other clients wait for the facts being gathered by a client
+CONNECT_TIMEOUT = 10        # Max seconds to wait for a started server to accept connections
+MEMORY_ENTRY_LIMIT = 10000  # Max number of facts kept in memory by the server
+
+HEADER = struct.Struct("!I")
+# struct ucred: pid, uid, gid
+PEERCRED = struct.Struct("3i")
+
+
+class FactsCacheServerError(Exception):
+    """Raised when the facts cache server can't be reached, the cache should work without the server then."""
+    pass
+
+
+def get_socket_path(cache_location):
+    """Get the socket path of the server for a cache location, it is short enough for the Unix socket path limit."""
+    digest = hashlib.sha1(os.path.abspath(cache_location).encode("utf-8")).hexdigest()[:16]
+    socket_dir = os.path.join(tempfile.gettempdir(), "facts_cache_{}".format(os.getuid()))
+    return os.path.join(socket_dir, "{}.sock".format(digest))
+
+
+def make_socket_dir(socket_path):
+    """Create the directory of the socket, it must be owned by the current user and not accessible by others."""
+    socket_dir = os.path.dirname(socket_path)
+    try:
+        os.mkdir(socket_dir, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(socket_dir)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise FactsCacheServerError("{} is not a private directory of the current user".format(socket_dir))
+
+
+def check_peer(sock):
+    """Check that the peer of the connected socket runs as the current user."""
+    _, uid, _ = PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEERCRED.size))
+    if uid != os.getuid():
+        raise FactsCacheServerError("peer uid {} is not the current user".format(uid))
+
+
+def _send(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock):
+    size, = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        server.client_connected()
+        try:
+            check_peer(self.request)
+            while True:
+                try:
+                    request = _recv(self.request)
+                except EOFError:
+                    return
+                handler = getattr(server, "do_" + request[0])
+                _send(self.request, handler(self, *request[1:]))
+        except Exception as e:
+            logger.warning("[Cache server] Client error: {}".format(repr(e)))
+        finally:
+            server.client_disconnected(self)
+
+
+class FactsCacheServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    In-memory facts cache with request coalescing.
+
+    Cached facts are (fingerprint, data) tuples keyed by (zone, key), where data is the pickled content of the cache
+    file. A client which misses a facts can claim it, other clients asking for the same facts then wait until the
+    claiming client stores the facts or releases the claim.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, cache_location):
+        self.cache_location = os.path.abspath(cache_location)
+        self.entries = OrderedDict()
+        # (zone, key) => (claiming handler, deadline)
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.clients = 0
+        self.idle_since = time.time()
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def client_connected(self):
+        with self.condition:
+            self.clients += 1
+
+    def client_disconnected(self, handler):
+        with self.condition:
+            self.clients -= 1
+            self.idle_since = time.time()
+            for cache_key in [k for k, (owner, _) in self.pending.items() if owner is handler]:
+                del self.pending[cache_key]
+            self.condition.notify_all()
+
+    def is_idle(self):
+        with self.condition:
+            return self.clients == 0 and time.time() - self.idle_since > IDLE_TIMEOUT
+
+    def do_get(self, handler, zone, key, fingerprint, claim):
+        cache_key = (zone, key)
+        with self.condition:
+            while True:
+                entry = self.entries.get(cache_key)
+                if entry is not None and (fingerprint is None or entry[0] == fingerprint):
+                    self.entries.move_to_end(cache_key)
+                    return ("hit", entry[1])
+                owner, deadline = self.pending.get(cache_key, (None, 0))
+                now = time.time()
+                if owner is not None and owner is not handler and deadline > now:
+                    # Another client is gathering the facts
+                    self.condition.wait(deadline - now)
+                    continue
+                if claim:
+                    self.pending[cache_key] = (handler, now + PENDING_TIMEOUT)
+                return ("miss",)
+
+    def do_put(self, handler, zone, key, fingerprint, data, persist):
+        cache_key = (zone, key)
+        with self.condition:
+            self.entries[cache_key] = (fingerprint, data)
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > MEMORY_ENTRY_LIMIT:
+                self.entries.popitem(last=False)
+            self.pending.pop(cache_key, None)
+            self.condition.notify_all()
+        if persist:
+            with self.write_lock:
+                self._write_file(zone, key, data)
+        return ("ok",)
+
+    def do_release(self, handler, zone, key):
+        with self.condition:
+            owner, _ = self.pending.get((zone, key), (None, 0))
+            if owner is handler:
+                del self.pending[(zone, key)]
+                self.condition.notify_all()
+        return ("ok",)
+
+    def do_cleanup(self, handler, zone, key):
+        with self.condition:
+            for cache_key in list(self.entries):
+                if zone is None or cache_key[0] == zone and (key is None or cache_key[1] == key):
+                    del self.entries[cache_key]
+        return ("ok",)
+
+    def _write_file(self, zone, key, data):
+        cache_subfolder = os.path.join(self.cache_location, zone)
+        try:
+            os.makedirs(cache_subfolder, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_subfolder, prefix=".{}.".format(key), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_file, os.path.join(cache_subfolder, "{}.pickle".format(key)))
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+        except (IOError, OSError) as e:
+            logger.error("[Cache server] Dump cache file {}/{}.pickle failed with exception: {}"
+                         .format(zone, key, repr(e)))
+
+
+class FactsCacheClient(object):
+    """
+    Client of the facts cache server.
+
+    Each thread uses its own connection, so a thread waiting for facts being gathered by another process doesn't
+    block the other threads. The connections are re-created in forked processes.
+    """
+
+    def __init__(self, socket_path, cache_location):
+        self.socket_path = socket_path
+        self.cache_location = cache_location
+        self._local = threading.local()
+
+    def _start_server(self):
+        logger.info("[Cache] Start facts cache server on {}".format(self.socket_path))
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), self.socket_path, self.cache_location],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         close_fds=True, start_new_session=True)
+
+    def _connect(self, start_server=True):
+        try:
+            make_socket_dir(self.socket_path)
+        except (IOError, OSError) as e:
+            raise FactsCacheServerError("failed to create the directory of {}: {}".format(self.socket_path, repr(e)))
+        deadline = time.time() + CONNECT_TIMEOUT
+        started = False
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                check_peer(sock)
+                return sock
+            except FactsCacheServerError:
+                sock.close()
+                raise
+            except (IOError, OSError) as e:
+                sock.close()
+                if not start_server or time.time() > deadline:
+                    raise FactsCacheServerError("failed to connect to {}: {}".format(self.socket_path, repr(e)))
+            if not started:
+                self._start_server()
+                started = True
+            time.sleep(0.1)
+
+    def connect(self, start_server=True):
+        """Connect the current thread to the server, start the server if it is not running."""
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.sock = self._connect(start_server)
+            self._local.pid = os.getpid()
+        return self._local.sock
+
+    def _call(self, *request):
+        try:
+            sock = self.connect()
+            _send(sock, request)
+            return _recv(sock)
+        except FactsCacheServerError:
+            raise
+        except Exception as e:
+            self._local.pid = None
+            raise FactsCacheServerError("request {} failed: {}".format(request[0], repr(e)))
+
+    def get(self, zone, key, fingerprint=None, claim=False):
+        """Get the pickled facts, or None on miss. With claim, other clients wait until put() or release()."""
+        response = self._call("get", zone, key, fingerprint, claim)
+        return response[1] if response[0] == "hit" else None
+
+    def put(self, zone, key, fingerprint, data, persist=True):
+        """Store the pickled facts, and write them to the cache file if persist is True."""
+        self._call("put", zone, key, fingerprint, data, persist)
+
+    def release(self, zone, key):
+        """Release the claim of facts that were not stored."""
+        self._call("release", zone, key)
+
+    def cleanup(self, zone=None, key=None):
+        self._call("cleanup", zone, key)
+
+
+def main(socket_path, cache_location):
+    # The socket and the lock file are only accessible by the current user from their creation
+    os.umask(0o077)
+    make_socket_dir(socket_path)
+
+    # Only one server can hold the lock, so the stale socket file can be removed safely
+    lock_file = open(socket_path + ".lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        return
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = FactsCacheServer(socket_path, cache_location)
+
+    def watchdog():
+        while not server.is_idle():
+            time.sleep(5)
+        server.shutdown()
+
+    threading.Thread(target=watchdog, daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
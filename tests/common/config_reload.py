@@ -202,6 +202,9 @@ def config_reload(sonic_host, config_source='config_db', wait=120, start_bgp=Tru
             cmd = f'config reload -y -f -l {golden_path}'
         sonic_host.shell(cmd, executable="/bin/bash")
 
+    # The configuration may have changed with the reload, don't use the facts cached before it
+    sonic_host.refresh_facts_fingerprint()
+
     modular_chassis = sonic_host.get_facts().get("modular_chassis")
     wait = max(wait, 600) if modular_chassis else wait
 
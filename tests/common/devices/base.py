@@ -1,3 +1,4 @@
+import functools
 import inspect
 import json
 import logging
@@ -5,6 +6,7 @@ import collections
 from multiprocessing.pool import ThreadPool
 
 from tests.common.errors import RunAnsibleModuleFail
+from tests.common.devices.persistent_executor import PersistentExecutorError, PersistentModuleExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,11 @@ class AnsibleHostBase(object):
     on the host.
     """
 
+    # Executor for running 'shell' and 'command' modules over a persistent connection, see
+    # enable_persistent_executor(). Defined as a class attribute, because of the __getattr__ override.
+    persistent_executor = None
+    facts_fingerprint = None
+
     class CustomEncoder(json.JSONEncoder):
         def default(self, obj):
             if isinstance(obj, bytes):
@@ -52,17 +59,32 @@ class AnsibleHostBase(object):
                 self.mgmt_ipv6 = None
         self.hostname = hostname
 
+    def enable_persistent_executor(self):
+        """
+        @summary: Run 'shell' and 'command' modules over a persistent SSH connection instead of pytest-ansible.
+
+        Module calls which can't be served by the executor (other modules, unsupported arguments, async calls)
+        still go through pytest-ansible.
+        """
+        if self.hostname == 'localhost' or self.persistent_executor is not None:
+            return
+        self.persistent_executor = PersistentModuleExecutor(self)
+
+    def disable_persistent_executor(self):
+        if self.persistent_executor is not None:
+            self.persistent_executor.close()
+            self.persistent_executor = None
+
     def __getattr__(self, module_name):
         if self.host.has_module(module_name):
-            self.module_name = module_name
-            self.module = getattr(self.host, module_name)
-
-            return self._run
+            # bind the module to the call, the host can be used by several threads at once
+            module = getattr(self.host, module_name)
+            return functools.partial(self._run, module_name, module)
         raise AttributeError(
             "'%s' object has no attribute '%s'" % (self.__class__, module_name)
             )
 
-    def _run(self, *module_args, **complex_args):
+    def _run(self, module_name, module, *module_args, **complex_args):
 
         previous_frame = inspect.currentframe().f_back
         filename, line_number, function_name, lines, index = inspect.getframeinfo(previous_frame)
@@ -76,7 +98,7 @@ class AnsibleHostBase(object):
                     function_name,
                     line_number,
                     self.hostname,
-                    self.module_name,
+                    module_name,
                     json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder),
                     json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder)
                 )
@@ -88,7 +110,7 @@ class AnsibleHostBase(object):
                     function_name,
                     line_number,
                     self.hostname,
-                    self.module_name
+                    module_name
                 )
             )
 
@@ -97,14 +119,23 @@ class AnsibleHostBase(object):
 
         if module_async:
             def run_module(module_args, complex_args):
-                return self.module(*module_args, **complex_args)[self.hostname]
+                return module(*module_args, **complex_args)[self.hostname]
             pool = ThreadPool()
             result = pool.apply_async(run_module, (module_args, complex_args))
             return pool, result
 
-        module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
-        complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
-        res = self.module(*module_args, **complex_args)[self.hostname]
+        res = None
+        if self.persistent_executor is not None and \
+                self.persistent_executor.supports(module_name, module_args, complex_args):
+            try:
+                res = self.persistent_executor.run(module_name, module_args, complex_args)
+            except PersistentExecutorError as e:
+                logger.warning("{}, falling back to ansible".format(repr(e)))
+
+        if res is None:
+            module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
+            complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
+            res = module(*module_args, **complex_args)[self.hostname]
         res.encoder = AnsibleHostBase.CustomEncoder
 
         if verbose:
@@ -114,7 +145,7 @@ class AnsibleHostBase(object):
                     function_name,
                     line_number,
                     self.hostname,
-                    self.module_name, json.dumps(res, cls=AnsibleHostBase.CustomEncoder)
+                    module_name, json.dumps(res, cls=AnsibleHostBase.CustomEncoder)
                 )
             )
         else:
@@ -124,14 +155,14 @@ class AnsibleHostBase(object):
                     function_name,
                     line_number,
                     self.hostname,
-                    self.module_name,
+                    module_name,
                     res.is_failed,
                     res.get('rc', None)
                 )
             )
 
         if (res.is_failed or 'exception' in res) and not module_ignore_errors:
-            raise RunAnsibleModuleFail("run module {} failed".format(self.module_name), res)
+            raise RunAnsibleModuleFail("run module {} failed".format(module_name), res)
 
         return res
 
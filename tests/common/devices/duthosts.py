@@ -2,6 +2,7 @@ import logging
 import sys
 
 from tests.common.devices.multi_asic import MultiAsicSonicHost
+from tests.common.helpers.multi_thread_utils import DEFAULT_FANOUT_WORKERS, fanout
 from tests.common.helpers.parallel_utils import is_initial_checks_active
 
 logger = logging.getLogger(__name__)
@@ -19,9 +20,21 @@ class DutHosts(object):
     """
     class _Nodes(list):
         """ Internal class representing a list of MultiAsicSonicHosts """
+        def __init__(self, nodes=(), fanout_workers=DEFAULT_FANOUT_WORKERS):
+            super(DutHosts._Nodes, self).__init__(nodes)
+            self.fanout_workers = fanout_workers
+
         def _run_on_nodes(self, *module_args, **complex_args):
-            """ Delegate the call to each of the nodes, return the results in a dict."""
-            return {node.hostname: getattr(node, self.attr)(*module_args, **complex_args) for node in self}
+            """ Delegate the call to each of the nodes, return the results in a dict.
+
+            The nodes are called concurrently, unless 'sequential=True' is passed in complex_args.
+            """
+            return self.__run_on_nodes(self.attr, *module_args, **complex_args)
+
+        def __run_on_nodes(self, attr, *module_args, **complex_args):
+            max_workers = 1 if complex_args.pop("sequential", False) else self.fanout_workers
+            results = fanout(lambda node: getattr(node, attr)(*module_args, **complex_args), self, max_workers)
+            return {node.hostname: result for node, result in zip(self, results)}
 
         def __getattr__(self, attr):
             """ To support calling ansible modules on a list of MultiAsicSonicHost
@@ -33,7 +46,7 @@ class DutHosts(object):
                and value being the output of ansible module on that MultiAsicSonicHost
             """
             self.attr = attr
-            return self._run_on_nodes
+            return lambda *module_args, **complex_args: self.__run_on_nodes(attr, *module_args, **complex_args)
 
         def __eq__(self, o):
             """ To support eq operator on the DUTs (nodes) in the testbed """
@@ -62,6 +75,9 @@ class DutHosts(object):
         self.request = request
         self.duts = duts
         self.is_parallel_run = target_hostname is not None
+        self.fanout_workers = DEFAULT_FANOUT_WORKERS
+        if request is not None:
+            self.fanout_workers = request.config.getoption("--fanout_workers", default=DEFAULT_FANOUT_WORKERS)
         # TODO: Initialize the nodes in parallel using multi-threads?
         if self.is_parallel_run:
             self.parallel_run_stage = NON_INITIAL_CHECKS_STAGE
@@ -80,11 +96,11 @@ class DutHosts(object):
                     self,
                     self.tbinfo['topo']['type'],
                 ) for hostname in self.tbinfo["duts"]
-            ])
+            ], self.fanout_workers)
 
             self._nodes_for_parallel_tests = self._Nodes([
                 node for node in self._nodes_for_parallel_initial_checks if node.hostname == self.target_hostname
-            ])
+            ], self.fanout_workers)
         else:
             self._nodes_for_parallel_initial_checks = None
             self._nodes_for_parallel_tests = self._Nodes([
@@ -94,7 +110,7 @@ class DutHosts(object):
                     self,
                     self.tbinfo['topo']['type'],
                 )
-            ])
+            ], self.fanout_workers)
 
         self._nodes_for_parallel = (
             self._nodes_for_parallel_initial_checks if self.is_parallel_leader else self._nodes_for_parallel_tests
@@ -102,11 +118,12 @@ class DutHosts(object):
 
         self._supervisor_nodes = self._Nodes([
             node for node in self._nodes_for_parallel if node.is_supervisor_node()
-        ])
+        ], self.fanout_workers)
 
         self._frontend_nodes = self._Nodes([
             node for node in self._nodes_for_parallel if node.is_frontend_node()
-        ])
+        ], self.fanout_workers)
+        self.__enable_persistent_executor(self._nodes_for_parallel_initial_checks or self._nodes_for_parallel_tests)
 
     def __initialize_nodes(self):
         self._nodes = self._Nodes([
@@ -116,10 +133,21 @@ class DutHosts(object):
                 self,
                 self.tbinfo['topo']['type'],
             ) for hostname in self.tbinfo["duts"] if hostname in self.duts
-        ])
+        ], self.fanout_workers)
 
-        self._supervisor_nodes = self._Nodes([node for node in self._nodes if node.is_supervisor_node()])
-        self._frontend_nodes = self._Nodes([node for node in self._nodes if node.is_frontend_node()])
+        self._supervisor_nodes = self._Nodes(
+            [node for node in self._nodes if node.is_supervisor_node()], self.fanout_workers
+        )
+        self._frontend_nodes = self._Nodes(
+            [node for node in self._nodes if node.is_frontend_node()], self.fanout_workers
+        )
+        self.__enable_persistent_executor(self._nodes)
+
+    def __enable_persistent_executor(self, nodes):
+        if self.request is None or not self.request.config.getoption("--persistent_executor", default=False):
+            return
+        for node in nodes:
+            node.sonichost.enable_persistent_executor()
 
     def __should_reinit_when_parallel(self):
         return (
@@ -137,8 +165,12 @@ class DutHosts(object):
             self.parallel_run_stage = NON_INITIAL_CHECKS_STAGE
             self._nodes_for_parallel = self._nodes_for_parallel_tests
 
-        self._supervisor_nodes = self._Nodes([node for node in self._nodes_for_parallel if node.is_supervisor_node()])
-        self._frontend_nodes = self._Nodes([node for node in self._nodes_for_parallel if node.is_frontend_node()])
+        self._supervisor_nodes = self._Nodes(
+            [node for node in self._nodes_for_parallel if node.is_supervisor_node()], self.fanout_workers
+        )
+        self._frontend_nodes = self._Nodes(
+            [node for node in self._nodes_for_parallel if node.is_frontend_node()], self.fanout_workers
+        )
 
     @property
     def nodes(self):
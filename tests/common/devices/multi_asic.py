@@ -3,6 +3,7 @@ from functools import lru_cache
 import ipaddress
 import json
 import logging
+import shlex
 
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common.devices.sonic import SonicHost
@@ -10,6 +11,7 @@ from tests.common.devices.sonic_asic import SonicAsic
 from tests.common.devices.sonic_docker import SonicDockerManager
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE, ASICS_PRESENT
+from tests.common.helpers.multi_thread_utils import DEFAULT_FANOUT_WORKERS, fanout
 from tests.common.platform.interface_utils import get_dut_interfaces_status
 
 logger = logging.getLogger(__name__)
@@ -145,7 +147,10 @@ class MultiAsicSonicHost(object):
                 else if asic_index is string 'all', then a list of ansible module output
                 for all the asics on the SonicHost
                     - for single asic, this would be a list of size 1.
+                    - the asics are called concurrently, unless 'sequential=True' is passed in complex_args.
         """
+        complex_args = dict(complex_args)
+        sequential = complex_args.pop("sequential", False)
         if "asic_index" not in complex_args:
             # Default ASIC/namespace
             return getattr(self.sonichost, self.multi_asic_attr)(*module_args, **complex_args)
@@ -161,10 +166,53 @@ class MultiAsicSonicHost(object):
                 return getattr(self.asic_instance(asic_index), self.multi_asic_attr)(*module_args, **asic_complex_args)
             elif type(asic_index) == str and asic_index.lower() == "all":
                 # All ASICs/namespace
-                return [getattr(asic, self.multi_asic_attr)(*module_args, **asic_complex_args) for asic in self.asics]
+                attr = self.multi_asic_attr
+                max_workers = 1 if sequential else getattr(self.duthosts, "fanout_workers", DEFAULT_FANOUT_WORKERS)
+                return fanout(lambda asic: getattr(asic, attr)(*module_args, **asic_complex_args), self.asics,
+                              max_workers)
             else:
                 raise ValueError("Argument 'asic_index' must be an int or string 'all'.")
 
+    def shell_batch(self, cmds, asic_index=None, parallel=False, stop_on_error=False):
+        """ Run a list of shell commands on asics in a single remote execution, see SonicHost.shell_batch
+
+        Args:
+            cmds: the shell commands to run in the namespace of each asic requested
+            asic_index: None to run the commands in the global namespace, an int to run the commands
+                in that asic namespace, or string 'all' to run the commands in all the asic namespaces
+            parallel: run all the commands concurrently
+            stop_on_error: do not run the remaining commands after a command failed
+
+        Returns:
+            if asic_index is None or an int, the list of results of the commands
+            else if asic_index is string 'all', a list with the list of results of the commands for each asic
+        """
+        if asic_index is None:
+            return self.sonichost.shell_batch(cmds, parallel=parallel, stop_on_error=stop_on_error)
+        if isinstance(asic_index, int):
+            asics = [self.asic_instance(asic_index)]
+        elif isinstance(asic_index, str) and asic_index.lower() == "all":
+            asics = self.asics
+        else:
+            raise ValueError("Argument 'asic_index' must be an int or string 'all'.")
+
+        asic_cmds = []
+        for asic in asics:
+            for cmd in cmds:
+                asic_cmds.append("{}bash -c {}".format(asic.ns_arg, shlex.quote(cmd)) if asic.ns_arg else cmd)
+        results = self.sonichost.shell_batch(asic_cmds, parallel=parallel, stop_on_error=stop_on_error)
+
+        # With stop_on_error, the results of the commands which were not run are missing
+        per_asic = [[] for _ in asics]
+        results = iter(results)
+        result = next(results, None)
+        for i, asic_cmd in enumerate(asic_cmds):
+            if result is not None and result["cmd"] == asic_cmd:
+                result["cmd"] = cmds[i % len(cmds)]
+                per_asic[i // len(cmds)].append(result)
+                result = next(results, None)
+        return per_asic[0] if isinstance(asic_index, int) else per_asic
+
     def get_dut_iface_mac(self, iface_name):
         """
         Gets the MAC address of specified interface.
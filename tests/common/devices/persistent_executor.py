@@ -0,0 +1,272 @@
+"""
+Persistent executor of the 'shell' and 'command' ansible modules.
+
+Running a module through pytest-ansible builds a new task and ships the module to the host on every call. For the
+plain 'shell' and 'command' modules this overhead dominates the execution time of the command itself. The executor
+keeps one SSH connection per host and a pool of resident runner processes on the host, which read JSON encoded
+commands from stdin and write the results in the same format as the 'command' module does.
+"""
+import base64
+import json
+import logging
+import os
+import socket
+import threading
+
+from ansible.errors import AnsibleConnectionFailure
+from ansible.template import Templar
+from pytest_ansible.results import ModuleResult
+
+from tests.common.utilities import paramiko_ssh
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_MODULES = ("shell", "command")
+SUPPORTED_MODULE_ARGS = ("cmd", "_raw_params", "chdir", "executable", "stdin", "stdin_add_newline")
+
+# Interval of SSH keepalive messages, so a connection broken by a reboot of the host is detected while idle
+KEEPALIVE_INTERVAL = 15
+
+# Max seconds to wait for the runner to report that it is ready
+RUNNER_START_TIMEOUT = 30
+RUNNER_READY = "persistent-executor-runner-ready"
+
+# The runner is started once per channel and executes the commands one by one.
+RUNNER_SOURCE = r'''
+import datetime
+import json
+import shlex
+import subprocess
+import sys
+
+sys.stdout.write(__READY__ + "\n")
+sys.stdout.flush()
+for request_line in iter(sys.stdin.readline, ""):
+    request = json.loads(request_line)
+    stdin = request.get("stdin")
+    start = datetime.datetime.now()
+    try:
+        proc = subprocess.Popen(request["cmd"] if request["shell"] else shlex.split(request["cmd"]),
+                                shell=request["shell"], executable=request.get("executable"),
+                                cwd=request.get("chdir"), stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = proc.communicate(stdin.encode("utf-8") if stdin is not None else None)
+        rc = proc.returncode
+    except OSError as e:
+        stdout, stderr, rc = b"", str(e).encode("utf-8"), 2
+    end = datetime.datetime.now()
+    sys.stdout.write(json.dumps({
+        "rc": rc,
+        "stdout": stdout.decode("utf-8", "replace").rstrip("\r\n"),
+        "stderr": stderr.decode("utf-8", "replace").rstrip("\r\n"),
+        "start": str(start),
+        "end": str(end),
+        "delta": str(end - start),
+    }) + "\n")
+    sys.stdout.flush()
+'''
+
+RUNNER_COMMAND = "sudo python3 -u -c \"import base64; exec(base64.b64decode('{}'))\"".format(
+    base64.b64encode(RUNNER_SOURCE.replace("__READY__", repr(RUNNER_READY)).encode("utf-8")).decode("ascii"))
+
+
+class PersistentExecutorError(Exception):
+    """Raised when the command can't be delivered to the host, it is safe to run the command through ansible then."""
+    pass
+
+
+class _Runner(object):
+    """A resident runner process on the host, attached to one channel of the SSH connection."""
+
+    def __init__(self, transport):
+        self.channel = transport.open_session()
+        try:
+            self.channel.exec_command(RUNNER_COMMAND)
+            self.stdin = self.channel.makefile("wb")
+            self.stdout = self.channel.makefile("rb")
+            self._wait_ready()
+        except Exception:
+            self.channel.close()
+            raise
+
+    def _wait_ready(self):
+        # No command is sent before the runner is ready, so a runner failing to start is not a lost connection
+        self.channel.settimeout(RUNNER_START_TIMEOUT)
+        try:
+            ready = self.stdout.readline()
+            if ready.decode("utf-8", "replace").strip() == RUNNER_READY:
+                return
+            if not ready:
+                # The runner exited, get its error
+                ready = self.channel.makefile_stderr("rb").read()
+        except socket.timeout:
+            raise PersistentExecutorError("runner not ready in {} seconds".format(RUNNER_START_TIMEOUT))
+        finally:
+            self.channel.settimeout(None)
+        raise PersistentExecutorError("runner failed to start: {}".format(ready.decode("utf-8", "replace")))
+
+    def is_alive(self):
+        return not self.channel.closed and not self.channel.exit_status_ready()
+
+    def run(self, request):
+        try:
+            self.stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+            self.stdin.flush()
+        except Exception as e:
+            raise PersistentExecutorError("failed to send command to runner: {}".format(repr(e)))
+        response = self.stdout.readline()
+        if not response:
+            raise AnsibleConnectionFailure("runner exited: {}".format(
+                self.channel.makefile_stderr("rb").read().decode("utf-8", "replace")))
+        return json.loads(response)
+
+    def close(self):
+        self.channel.close()
+
+
+class PersistentModuleExecutor(object):
+    """
+    Run the 'shell' and 'command' modules on a host over a warm SSH connection.
+
+    The SSH connection is shared by all the callers, every concurrent caller gets its own runner channel from a pool,
+    so commands issued from multiple threads are multiplexed over the single connection. The connection is re-created
+    in forked processes, because the SSH transport can't be shared with the parent process.
+    """
+
+    def __init__(self, ansible_host):
+        self.ansible_host = ansible_host
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ssh = None
+        self._idle_runners = []
+
+    @staticmethod
+    def supports(module_name, module_args, complex_args):
+        """Check whether the module call can be served by the executor, otherwise it has to go through ansible."""
+        if module_name not in SUPPORTED_MODULES:
+            return False
+        if any(key not in SUPPORTED_MODULE_ARGS for key in complex_args):
+            return False
+        return len(module_args) == 1 and isinstance(module_args[0], str) or \
+            len(module_args) == 0 and isinstance(complex_args.get("cmd"), str)
+
+    def _get_connection_params(self):
+        host = self.ansible_host.host
+        inventory_manager = host.options["inventory_manager"]
+        variable_manager = host.options["variable_manager"]
+        hostvars = variable_manager.get_vars(host=inventory_manager.get_host(self.ansible_host.hostname))
+        templar = Templar(loader=variable_manager._loader, variables=hostvars)
+
+        def lookup(*names):
+            for name in names:
+                if name in hostvars:
+                    return templar.template(hostvars[name])
+            return None
+
+        username = lookup("ansible_ssh_user", "ansible_user")
+        passwords = [lookup("ansible_ssh_pass", "ansible_password", "ansible_ssh_password")]
+        passwords.append(lookup("ansible_altpassword", "ansible_ssh_altpass", "ansible_ssh_altpassword"))
+        passwords.extend(lookup("ansible_altpasswords", "ansible_ssh_altpasswords") or [])
+        return username, [password for password in passwords if password]
+
+    def _connect(self):
+        username, passwords = self._get_connection_params()
+        addresses = [self.ansible_host.mgmt_ip]
+        if getattr(self.ansible_host, "mgmt_ipv6", None):
+            addresses.append(self.ansible_host.mgmt_ipv6)
+        for address in addresses:
+            try:
+                return paramiko_ssh(address, username, passwords)
+            except Exception as e:
+                logger.warning("[{}] persistent executor failed to connect to {}: {}"
+                               .format(self.ansible_host.hostname, address, repr(e)))
+        raise PersistentExecutorError("unable to connect to {}".format(self.ansible_host.hostname))
+
+    def _acquire_runner(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked process, the connection of the parent process must not be used or closed
+                self._ssh = None
+                self._idle_runners = []
+                self._pid = os.getpid()
+            if self._ssh is None or not self._ssh.get_transport().is_active():
+                self._ssh = self._connect()
+                self._ssh.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+                self._idle_runners = []
+            while self._idle_runners:
+                runner = self._idle_runners.pop()
+                if runner.is_alive():
+                    return runner
+                runner.close()
+            transport = self._ssh.get_transport()
+        return _Runner(transport)
+
+    def _release_runner(self, runner):
+        with self._lock:
+            self._idle_runners.append(runner)
+
+    def close(self):
+        with self._lock:
+            if self._ssh is not None and self._pid == os.getpid():
+                for runner in self._idle_runners:
+                    runner.close()
+                self._ssh.close()
+            self._ssh = None
+            self._idle_runners = []
+
+    def run(self, module_name, module_args, complex_args):
+        """
+        Run the 'shell' or 'command' module on the host.
+
+        Returns:
+            ModuleResult: The result in the same format as returned by the ansible module.
+
+        Raises:
+            PersistentExecutorError: The command was not delivered to the host, it can be run through ansible.
+            AnsibleConnectionFailure: The connection was lost while the command was running.
+        """
+        cmd = module_args[0] if module_args else complex_args["cmd"]
+        request = {
+            "cmd": cmd,
+            "shell": module_name == "shell",
+            "chdir": complex_args.get("chdir"),
+            "executable": complex_args.get("executable"),
+        }
+        if complex_args.get("stdin") is not None:
+            request["stdin"] = complex_args["stdin"]
+            if complex_args.get("stdin_add_newline", True):
+                request["stdin"] += "\n"
+
+        try:
+            runner = self._acquire_runner()
+            response = runner.run(request)
+        except PersistentExecutorError:
+            self.close()
+            raise
+        except AnsibleConnectionFailure as e:
+            self.close()
+            raise AnsibleConnectionFailure("[{}] connection lost while running '{}': {}".format(
+                self.ansible_host.hostname, cmd, e.message))
+        except Exception as e:
+            # Failed to connect or to start the runner, the command was not sent
+            self.close()
+            raise PersistentExecutorError("[{}] failed to run '{}': {}".format(
+                self.ansible_host.hostname, cmd, repr(e)))
+        self._release_runner(runner)
+
+        rc = response["rc"]
+        return ModuleResult(
+            changed=True,
+            cmd=cmd,
+            rc=rc,
+            failed=rc != 0,
+            msg="non-zero return code" if rc != 0 else "",
+            stdout=response["stdout"],
+            stderr=response["stderr"],
+            stdout_lines=response["stdout"].splitlines(),
+            stderr_lines=response["stderr"].splitlines(),
+            start=response["start"],
+            end=response["end"],
+            delta=response["delta"],
+            invocation={"module_args": dict(complex_args, _raw_params=cmd, _uses_shell=module_name == "shell")}
+        )
@@ -1,4 +1,5 @@
 
+import hashlib
 import ipaddress
 import json
 import logging
@@ -83,6 +84,7 @@ class SonicHost(AnsibleHostBase):
             }
             self.host.options['variable_manager'].extra_vars.update(evars)
 
+        self.facts_fingerprint = self._get_facts_fingerprint()
         self._facts = self._gather_facts()
         self._os_version = self._get_os_version()
 
@@ -382,6 +384,27 @@ class SonicHost(AnsibleHostBase):
         output = self.command('uname -r')
         return output["stdout"].split('-')[0]
 
+    def _get_facts_fingerprint(self):
+        """
+        Gets a fingerprint of the image version and configuration files of this device. Cached facts of this device
+        are gathered again when the fingerprint changes.
+        """
+        try:
+            output = self.shell(
+                "md5sum /etc/sonic/sonic_version.yml /etc/sonic/minigraph.xml /etc/sonic/config_db*.json",
+                module_ignore_errors=True)
+            return hashlib.sha1(output["stdout"].encode("utf-8")).hexdigest()
+        except Exception as e:
+            logging.warning("Failed to get facts fingerprint of {}: {}".format(self.hostname, repr(e)))
+            return None
+
+    def refresh_facts_fingerprint(self):
+        """
+        Refresh the facts fingerprint after the image or configuration of this device may have changed, like after
+        config reload or reboot, so that stale cached facts are not used.
+        """
+        self.facts_fingerprint = self._get_facts_fingerprint()
+
     def get_service_props(self, service, props=["ActiveState", "SubState"]):
         """
         @summary: Use 'systemctl show' command to get detailed properties of a service. By default, only get
@@ -1127,6 +1150,41 @@ class SonicHost(AnsibleHostBase):
         ret['installed_list'] = images
         return ret
 
+    def shell_batch(self, cmds, parallel=False, stop_on_error=False):
+        """
+            Run a list of shell commands on the DUT in a single remote execution
+
+            Args:
+                cmds (list): the shell commands to run
+                parallel (bool): run the commands concurrently instead of one by one
+                stop_on_error (bool): do not run the remaining commands after a command failed. When the commands
+                    are run in parallel, the commands that already started are still waited for.
+
+            Returns:
+                list: One dict for each command that was run, in the order of cmds, with keys 'cmd', 'rc',
+                    'stdout', 'stderr', 'stdout_lines', 'stderr_lines' and 'duration' (seconds).
+        """
+        if not cmds:
+            return []
+        res = self.shell_cmds(cmds=cmds, continue_on_fail=not stop_on_error, parallel=parallel,
+                              module_ignore_errors=True)
+        if "results" not in res:
+            raise RunAnsibleModuleFail("run module shell_cmds failed", res)
+        return [{
+            "cmd": result["cmd"],
+            "rc": result["rc"],
+            "stdout": result["stdout"].rstrip("\n"),
+            "stderr": result["stderr"].rstrip("\n"),
+            "stdout_lines": result["stdout_lines"],
+            "stderr_lines": result["stderr_lines"],
+            "duration": result["duration"],
+        } for result in res["results"]]
+
+    def _shell_batch_or_fail(self, cmds):
+        failed = [result for result in self.shell_batch(cmds, stop_on_error=True) if result["rc"] != 0]
+        if failed:
+            raise RunAnsibleModuleFail("run command '{}' failed".format(failed[0]["cmd"]), failed[0])
+
     def shutdown(self, ifname):
         """
             Shutdown interface specified by ifname
@@ -1146,11 +1204,11 @@ class SonicHost(AnsibleHostBase):
         """
         image_info = self.get_image_info()
         # 201811 & 201911 images do not support multiple interface shutdown
-        # Change the batch shutdown call to individual call here
+        # Run the individual calls in one batch here
         current_image = image_info.get("current")
         if "201811" in current_image or "201911" in current_image:
-            for ifname in ifnames:
-                self.shutdown(ifname)
+            logging.info("Shutting down {}".format(ifnames))
+            self._shell_batch_or_fail(["sudo config interface shutdown {}".format(ifname) for ifname in ifnames])
             return
         else:
             intf_str = ','.join(ifnames)
@@ -1175,11 +1233,11 @@ class SonicHost(AnsibleHostBase):
         """
         image_info = self.get_image_info()
         # 201811 & 201911 images do not support multiple interface startup
-        # Change the batch startup call to individual call here
+        # Run the individual calls in one batch here
         current_image = image_info.get("current")
         if "201811" in current_image or "201911" in current_image:
-            for ifname in ifnames:
-                self.no_shutdown(ifname)
+            logging.info("Starting up {}".format(ifnames))
+            self._shell_batch_or_fail(["sudo config interface startup {}".format(ifname) for ifname in ifnames])
             return
         else:
             intf_str = ','.join(ifnames)
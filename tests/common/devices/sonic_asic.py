@@ -55,6 +55,11 @@ class SonicAsic(object):
     def __repr__(self):
         return self.__str__()
 
+    @property
+    def facts_fingerprint(self):
+        """ The cached facts of the asic are invalidated together with the facts of the SonicHost """
+        return self.sonichost.facts_fingerprint
+
     def get_critical_services(self):
         """This function returns the list of the critical services
            for the namespace(asic)
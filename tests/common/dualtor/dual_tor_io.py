@@ -1,3 +1,4 @@
+import array
 import datetime
 import time
 import socket
@@ -8,7 +9,6 @@ import logging
 import jinja2
 import json
 import os
-import six
 import scapy.all as scapyall
 import ptf.testutils as testutils
 from itertools import groupby
@@ -30,9 +30,249 @@ SUPERVISOR_CONFIG_DIR = "/etc/supervisor/conf.d/"
 DUAL_TOR_SNIFFER_CONF_TEMPL = "dual_tor_sniffer.conf.j2"
 DUAL_TOR_SNIFFER_CONF = "dual_tor_sniffer.conf"
 
+PCAP_GLOBAL_HEADER_LEN = 24
+PCAP_RECORD_HEADER_LEN = 16
+# pcap magic number => (byte order, timestamp fraction resolution)
+PCAP_MAGICS = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAP_LINKTYPE_ETHERNET = 1
+ETHER_TYPE_VLAN = 0x8100
+ETHER_TYPE_IPV4 = 0x0800
+IP_PROTO_TCP = 6
+
 logger = logging.getLogger(__name__)
 
 
+def _ones_complement_sum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack("!{}H".format(len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+
+def _update_checksum(checksum, old_data, new_data):
+    """Update an internet checksum for the data changed from old_data to new_data (RFC 1624, eqn. 3)."""
+    total = (~checksum & 0xFFFF) + (~_ones_complement_sum(old_data) & 0xFFFF) + _ones_complement_sum(new_data)
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+class PacketTemplate:
+    """
+    Packets of a TCP flow rendered from one template packet into a preallocated byte buffer.
+
+    The template is serialized by scapy once. Every packet is a copy of the template in the buffer with the
+    Ethernet source, the IP addresses and the sequence number in the TCP payload patched in place, the IP and
+    TCP checksums are updated incrementally instead of being calculated over the whole packet. The sequence
+    number is padded with 'X' to the width of the maximum sequence number, so the packets have the same length
+    as the template. Hence the payload and the IP total length of a packet with a shorter sequence number differ
+    from the str(seq) + 'X' * 60 payload of the scapy-built packets, the flow analysis strips the 'X's anyway.
+    """
+
+    def __init__(self, packet, max_seq, count):
+        """
+        @param packet: Scapy Ether/IP/TCP template packet, its payload is replaced.
+        @param max_seq: Maximum sequence number of the flow.
+        @param count: Number of packets to be rendered.
+        """
+        self.seq_width = len(str(max_seq))
+        packet = packet.copy()
+        packet[scapyall.TCP].remove_payload()
+        packet = packet / scapyall.Raw(self._seq_field(0) + b"X" * 60)
+        packet[scapyall.TCP].chksum = None
+        packet[scapyall.IP].chksum = None
+        self.template = convert_scapy_packet_to_bytes(packet)
+        packet = scapyall.Ether(self.template)
+
+        self.length = len(self.template)
+        self.ip_start = self.length - len(packet[scapyall.IP])
+        self.tcp_start = self.length - len(packet[scapyall.TCP])
+        self.payload_start = self.length - len(packet[scapyall.TCP].payload)
+        self.ip_checksum = packet[scapyall.IP].chksum
+        self.tcp_checksum = packet[scapyall.TCP].chksum
+        self.addresses = self.template[self.ip_start + 12:self.ip_start + 20]
+        self.seq = self.template[self.payload_start:self.payload_start + self.seq_width]
+
+        self.count = count
+        self.rendered = 0
+        self.buffer = bytearray(self.length * count)
+        self.view = memoryview(self.buffer)
+        self.macs = {}
+
+    def _seq_field(self, seq):
+        seq = str(seq).encode()
+        return seq + b"X" * (self.seq_width - len(seq))
+
+    def render(self, seq, eth_src=None, ip_src=None, ip_dst=None):
+        """
+        @summary: Render the next packet of the flow into the buffer.
+
+        @param seq: Sequence number carried in the TCP payload.
+        @param eth_src: Ethernet source address, the template one if not set.
+        @param ip_src: IP source address, the template one if not set.
+        @param ip_dst: IP destination address, the template one if not set.
+
+        Returns: memoryview of the packet in the buffer.
+        """
+        if self.rendered == self.count:
+            raise ValueError("All the {} packets of the template were rendered".format(self.count))
+        start = self.rendered * self.length
+        end = start + self.length
+        self.rendered += 1
+        buf = self.buffer
+        buf[start:end] = self.template
+
+        if eth_src is not None:
+            if eth_src not in self.macs:
+                self.macs[eth_src] = bytes.fromhex(eth_src.replace(":", ""))
+            buf[start + 6:start + 12] = self.macs[eth_src]
+        addresses = (socket.inet_aton(ip_src) if ip_src is not None else self.addresses[:4]) + \
+            (socket.inet_aton(ip_dst) if ip_dst is not None else self.addresses[4:])
+        seq_field = self._seq_field(seq)
+
+        ip_start = start + self.ip_start
+        buf[ip_start + 12:ip_start + 20] = addresses
+        buf[start + self.payload_start:start + self.payload_start + self.seq_width] = seq_field
+        # Both the IP header and the TCP pseudo header contain the addresses
+        struct.pack_into("!H", buf, ip_start + 10,
+                         _update_checksum(self.ip_checksum, self.addresses, addresses))
+        struct.pack_into("!H", buf, start + self.tcp_start + 16,
+                         _update_checksum(self.tcp_checksum, self.addresses + self.seq, addresses + seq_field))
+        return self.view[start:end]
+
+
+class CapturedPackets:
+    """
+    TCP packets of the IO test captured by the ptf sniffer, kept in compact column arrays.
+
+    The pcap file is streamed record by record and only the Ethernet/IPv4/TCP header fields and the
+    sequence number carried in the TCP payload are parsed from the raw bytes, so the memory used is
+    a few bytes per packet instead of a dissected scapy packet. Packets which don't belong to the
+    test flow are dropped while reading.
+    """
+
+    def __init__(self, pcap_file, tcp_sport, tcp_dport, sent_dst_macs, received_src_macs, server_is_dst):
+        """
+        @param pcap_file: Path of the pcap file.
+        @param tcp_sport: TCP source port of the test flow.
+        @param tcp_dport: TCP destination port of the test flow.
+        @param sent_dst_macs: Destination MACs of the packets sent by ptf.
+        @param received_src_macs: Source MACs of the packets received by ptf.
+        @param server_is_dst: The server address is the IP destination, otherwise it is the IP source.
+        """
+        self.pcap_file = pcap_file
+        self.total = 0
+        self.record_header = None
+        # Columns, one item per packet of the test flow
+        self.timestamps = array.array("d")
+        self.server_ips = array.array("L")
+        self.seqs = array.array("l")
+        self.received = array.array("b")
+        self.offsets = array.array("Q")
+
+        sent_dst_macs = set(self._mac_to_bytes(mac) for mac in sent_dst_macs)
+        received_src_macs = set(self._mac_to_bytes(mac) for mac in received_src_macs)
+        server_ip_offset = 16 if server_is_dst else 12
+        ports = struct.pack("!HH", tcp_sport, tcp_dport)
+
+        with open(pcap_file, "rb") as fp:
+            global_header = fp.read(PCAP_GLOBAL_HEADER_LEN)
+            if len(global_header) < PCAP_GLOBAL_HEADER_LEN:
+                return
+            if global_header[:4] not in PCAP_MAGICS:
+                raise ValueError("{} is not a pcap file".format(pcap_file))
+            byte_order, ts_resolution = PCAP_MAGICS[global_header[:4]]
+            linktype = struct.unpack(byte_order + "I", global_header[20:24])[0]
+            if linktype != PCAP_LINKTYPE_ETHERNET:
+                raise ValueError("Unsupported link type {} of {}".format(linktype, pcap_file))
+            self.record_header = record_header = struct.Struct(byte_order + "IIII")
+
+            offset = PCAP_GLOBAL_HEADER_LEN
+            while True:
+                header = fp.read(PCAP_RECORD_HEADER_LEN)
+                if len(header) < PCAP_RECORD_HEADER_LEN:
+                    break
+                ts_sec, ts_frac, caplen, _ = record_header.unpack(header)
+                frame = fp.read(caplen)
+                if len(frame) < caplen:
+                    break
+                self.total += 1
+                record_offset = offset
+                offset += PCAP_RECORD_HEADER_LEN + caplen
+
+                if frame[0:6] in sent_dst_macs:
+                    received = 0
+                elif frame[6:12] in received_src_macs:
+                    received = 1
+                else:
+                    continue
+                ip_start = 14
+                ether_type = struct.unpack("!H", frame[12:14])[0]
+                if ether_type == ETHER_TYPE_VLAN:
+                    ip_start = 18
+                    ether_type = struct.unpack("!H", frame[16:18])[0]
+                if ether_type != ETHER_TYPE_IPV4 or len(frame) < ip_start + 20 or \
+                        frame[ip_start + 9] != IP_PROTO_TCP:
+                    continue
+                ip_header_len = (frame[ip_start] & 0x0F) * 4
+                ip_end = ip_start + struct.unpack("!H", frame[ip_start + 2:ip_start + 4])[0]
+                tcp_start = ip_start + ip_header_len
+                if frame[tcp_start:tcp_start + 4] != ports or len(frame) < tcp_start + 20:
+                    continue
+                payload = frame[tcp_start + (frame[tcp_start + 12] >> 4) * 4:ip_end]
+                try:
+                    seq = int(payload.replace(b"X", b""))
+                except ValueError:
+                    # Corrupted payload
+                    continue
+
+                self.timestamps.append(ts_sec + ts_frac * ts_resolution)
+                self.server_ips.append(struct.unpack(
+                    "!L", frame[ip_start + server_ip_offset:ip_start + server_ip_offset + 4])[0])
+                self.seqs.append(seq)
+                self.received.append(received)
+                self.offsets.append(record_offset)
+
+    @staticmethod
+    def _mac_to_bytes(mac):
+        return bytes.fromhex(mac.replace(":", ""))
+
+    def __len__(self):
+        return len(self.seqs)
+
+    def group_by_server(self):
+        """
+        @summary: Split the packets by server IP address.
+
+        Returns: dict of server IP address => packet indices sorted by sequence number, then by timestamp.
+        """
+        server_to_indices = defaultdict(list)
+        for index, server_ip in enumerate(self.server_ips):
+            server_to_indices[server_ip].append(index)
+        for indices in server_to_indices.values():
+            indices.sort(key=lambda index: (self.seqs[index], self.timestamps[index]))
+        return dict((socket.inet_ntoa(struct.pack("!L", server_ip)), indices)
+                    for server_ip, indices in server_to_indices.items())
+
+    def dump(self, filename, indices):
+        """
+        @summary: Write the packets at the given indices to a pcap file, by copying their raw records.
+        """
+        with open(self.pcap_file, "rb") as src, open(filename, "wb") as dst:
+            dst.write(src.read(PCAP_GLOBAL_HEADER_LEN))
+            for index in indices:
+                src.seek(self.offsets[index])
+                header = src.read(PCAP_RECORD_HEADER_LEN)
+                dst.write(header + src.read(self.record_header.unpack(header)[2]))
+
+
 class DualTorIO:
     """Class to conduct IO over ports in `active-standby` mode."""
 
@@ -129,7 +369,7 @@ class DualTorIO:
         else:
             self.packets_per_server = self.packets_to_send // len(self.test_interfaces)
 
-        self.all_packets = []
+        self.captured_packets = None
 
     def setup_ptf_sniffer(self):
         """Setup ptf sniffer supervisor config."""
@@ -307,10 +547,10 @@ class DualTorIO:
             tcp_sport=self.tcp_sport
         )
         tcp_tx_packet_orig = scapyall.Ether(convert_scapy_packet_to_bytes(tcp_tx_packet_orig))
-        payload_suffix = "X" * 60
+        template = PacketTemplate(tcp_tx_packet_orig, self.packets_per_server - 1,
+                                  self.packets_per_server * len(server_ip_list))
         for i in range(self.packets_per_server):
             for server_ip in server_ip_list:
-                packet = tcp_tx_packet_orig.copy()
                 if random_source:
                     tor_pc_src_intf = random.choice(
                         self.tor_pc_intfs
@@ -319,14 +559,8 @@ class DualTorIO:
                     eth_src = self.ptfadapter.dataplane.get_mac(
                         0, ptf_t1_src_intf
                     )
-                packet[scapyall.Ether].src = eth_src
-                packet[scapyall.IP].src = self.random_host_ip()
-                packet[scapyall.IP].dst = server_ip
-                payload = str(i) + payload_suffix
-                packet.load = payload
-                packet[scapyall.TCP].chksum = None
-                packet[scapyall.IP].chksum = None
-                self.packets_list.append((ptf_t1_src_intf, convert_scapy_packet_to_bytes(packet)))
+                packet = template.render(i, eth_src=eth_src, ip_src=self.random_host_ip(), ip_dst=server_ip)
+                self.packets_list.append((ptf_t1_src_intf, packet, server_ip))
 
         self.sent_pkt_dst_mac = self.dut_mac
         self.received_pkt_src_mac = [self.vlan_mac]
@@ -382,7 +616,8 @@ class DualTorIO:
             tcp_sport=self.tcp_sport
         )
         tcp_tx_packet_orig = scapyall.Ether(convert_scapy_packet_to_bytes(tcp_tx_packet_orig))
-        payload_suffix = "X" * 60
+        template = PacketTemplate(tcp_tx_packet_orig, self.packets_per_server - 1,
+                                  self.packets_per_server * len(vlan_src_intfs))
 
         # use the same dst ip to ensure that packets from one server are always forwarded
         # to the same active ToR by the server NiC
@@ -392,18 +627,9 @@ class DualTorIO:
                 ptf_src_intf = self.tor_to_ptf_intf_map[vlan_intf]
                 server_ip = ptf_intf_to_ip_map[ptf_src_intf]
                 eth_src = self.ptf_intf_to_mac_map[ptf_src_intf]
-                payload = str(i) + payload_suffix
-                packet = tcp_tx_packet_orig.copy()
-                packet[scapyall.Ether].src = eth_src
-                packet[scapyall.IP].src = server_ip
-                if self.random_dst:
-                    packet[scapyall.IP].dst = self.random_host_ip()
-                else:
-                    packet[scapyall.IP].dst = dst_ips[vlan_intf]
-                packet.load = payload
-                packet[scapyall.TCP].chksum = None
-                packet[scapyall.IP].chksum = None
-                self.packets_list.append((ptf_src_intf, convert_scapy_packet_to_bytes(packet)))
+                dst_ip = self.random_host_ip() if self.random_dst else dst_ips[vlan_intf]
+                packet = template.render(i, eth_src=eth_src, ip_src=server_ip, ip_dst=dst_ip)
+                self.packets_list.append((ptf_src_intf, packet, server_ip))
         self.sent_pkt_dst_mac = self.vlan_mac
         self.received_pkt_src_mac = [self.active_mac, self.standby_mac]
 
@@ -504,14 +730,9 @@ class DualTorIO:
         tcp_tx_packet_orig[scapyall.IP].dst = dst_ip
         tcp_tx_packet_orig = self._generate_upstream_packet_to_target_duthost(vlan_src_intf, tcp_tx_packet_orig)
 
-        payload_suffix = "X" * 60
+        template = PacketTemplate(tcp_tx_packet_orig, self.packets_per_server - 1, self.packets_per_server)
         for i in range(self.packets_per_server):
-            payload = str(i) + payload_suffix
-            packet = tcp_tx_packet_orig.copy()
-            packet.load = payload
-            packet[scapyall.TCP].chksum = None
-            packet[scapyall.IP].chksum = None
-            self.packets_list.append((src_ptf_port, convert_scapy_packet_to_bytes(packet)))
+            self.packets_list.append((src_ptf_port, template.render(i), src_ip))
 
         self.sent_pkt_dst_mac = self.vlan_mac
         self.received_pkt_src_mac = [self.vlan_mac]
@@ -622,8 +843,10 @@ class DualTorIO:
         """Fetch the captured packet file generated by the ptf sniffer."""
         logger.info('Fetching pcap file from ptf')
         self.ptfhost.fetch(src=self.capture_pcap, dest='/tmp/', flat=True, fail_on_missing=False)
-        self.all_packets = scapyall.rdpcap(self.capture_pcap)
-        logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
+        server_is_dst = self.traffic_direction in ("t1_to_server", "t1_to_soc")
+        self.captured_packets = CapturedPackets(self.capture_pcap, self.tcp_sport, TCP_DST_PORT,
+                                                [self.sent_pkt_dst_mac], self.received_pkt_src_mac, server_is_dst)
+        logger.info("Number of all packets captured: {}".format(self.captured_packets.total))
 
     def send_packets(self):
         """Send packets generated."""
@@ -636,14 +859,12 @@ class DualTorIO:
         self.io_ready_event.set()
 
         sent_packets_count = 0
-        for entry in self.packets_list:
-            _, packet = entry
-            server_addr = self.get_server_address(scapyall.Ether(convert_scapy_packet_to_bytes(packet)))
+        for ptf_intf, packet, server_addr in self.packets_list:
             time.sleep(self.send_interval)
             # the stop_early flag can be set to True by data_plane_utils to stop prematurely
             if self.stop_early:
                 break
-            testutils.send_packet(self.ptfadapter, *entry)
+            testutils.send_packet(self.ptfadapter, ptf_intf, packet)
             self.packets_sent_per_server[server_addr] =\
                 self.packets_sent_per_server.get(server_addr, 0) + 1
             sent_packets_count = sent_packets_count + 1
@@ -658,19 +879,6 @@ class DualTorIO:
         if not self._is_ptf_sniffer_running():
             raise RuntimeError("ptf sniffer is not running enough time to cover packets sending.")
 
-    def get_server_address(self, packet):
-        if self.traffic_direction == "t1_to_server":
-            server_addr = packet[scapyall.IP].dst
-        elif self.traffic_direction == "server_to_t1":
-            server_addr = packet[scapyall.IP].src
-        elif self.traffic_direction == "t1_to_soc":
-            server_addr = packet[scapyall.IP].dst
-        elif self.traffic_direction == "soc_to_t1":
-            server_addr = packet[scapyall.IP].src
-        elif self.traffic_direction == "server_to_server":
-            server_addr = packet[scapyall.IP].src
-        return server_addr
-
     def get_test_results(self):
         return self.test_results
 
@@ -687,50 +895,24 @@ class DualTorIO:
         examine_start = datetime.datetime.now()
         logger.info("Packet flow examine started {}".format(str(examine_start)))
 
-        if not self.all_packets:
-            logger.error("self.all_packets not defined.")
+        if not self.captured_packets or not self.captured_packets.total:
+            logger.error("self.captured_packets not defined.")
             return None
 
-        # Filter out packets:
-        filtered_packets = [pkt for pkt in self.all_packets if
-                            scapyall.TCP in pkt and
-                            scapyall.ICMP not in pkt and
-                            pkt[scapyall.TCP].sport == self.tcp_sport and
-                            pkt[scapyall.TCP].dport == TCP_DST_PORT and
-                            self.check_tcp_payload(pkt) and
-                            (
-                                pkt[scapyall.Ether].dst == self.sent_pkt_dst_mac or
-                                pkt[scapyall.Ether].src in self.received_pkt_src_mac
-                            )]
-        logger.info("Number of filtered packets captured: {}".format(len(filtered_packets)))
-        if not filtered_packets or len(filtered_packets) == 0:
+        # Packets which don't belong to the test flow were filtered out while reading the capture
+        captured_packets = self.captured_packets
+        logger.info("Number of filtered packets captured: {}".format(len(captured_packets)))
+        if len(captured_packets) == 0:
             logger.error("Sniffer failed to capture any traffic")
 
-        server_to_packet_map = defaultdict(list)
-
-        # Split packets into separate lists based on server IP
-        for packet in filtered_packets:
-            server_addr = self.get_server_address(packet)
-            server_to_packet_map[server_addr].append(packet)
-
-        # E731 Use a def instead of a lambda
-        def get_packet_sort_key(packet):
-            payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-            if six.PY2:
-                payload_int = int(payload_bytes.replace('X', ''))
-            else:
-                payload_int = int(payload_bytes.decode().replace('X', ''))
-            return (payload_int, packet.time)
-
-        # For each server's packet list, sort by payload then timestamp
-        # (in case of duplicates)
-        for server in list(server_to_packet_map.keys()):
-            server_to_packet_map[server].sort(key=get_packet_sort_key)
+        # Split packets into separate lists based on server IP,
+        # and sort each server's packet list by payload then timestamp (in case of duplicates)
+        server_to_packet_map = captured_packets.group_by_server()
 
         logger.info("Measuring traffic disruptions...")
         for server_ip, packet_list in list(server_to_packet_map.items()):
             filename = '/tmp/capture_filtered_{}.pcap'.format(server_ip)
-            scapyall.wrpcap(filename, packet_list)
+            captured_packets.dump(filename, packet_list)
             logger.info("Filtered pcap dumped to {}".format(filename))
 
         self.test_results = {}
@@ -742,6 +924,14 @@ class DualTorIO:
             self.test_results[server_ip] = result
 
     def examine_each_packet(self, server_ip, packets):
+        """
+        @summary: Find the disruptions and duplications of the packets to/from a server.
+
+        @param server_ip: Server IP address.
+        @param packets: Indices of the server's packets in self.captured_packets, sorted by payload then timestamp.
+        """
+        captured_packets = self.captured_packets
+        timestamps, seqs, received = captured_packets.timestamps, captured_packets.seqs, captured_packets.received
         num_sent_packets = 0
         received_packet_list = list()
         duplicate_packet_list = list()
@@ -751,42 +941,36 @@ class DualTorIO:
         duplicate_ranges = []
 
         for packet in packets:
-            if packet[scapyall.Ether].dst == self.sent_pkt_dst_mac:
+            if not received[packet]:
                 # This is a sent packet
                 num_sent_packets += 1
                 continue
-            if packet[scapyall.Ether].src in self.received_pkt_src_mac:
-                # This is a received packet.
-                # scapy 2.4.5 will use Decimal to calulcate time, but json.dumps
-                # can't recognize Decimal, transform to float here
-                curr_time = float(packet.time)
-                curr_payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-                if six.PY2:
-                    curr_payload = int(curr_payload_bytes.replace('X', ''))
-                else:
-                    curr_payload = int(curr_payload_bytes.decode().replace('X', ''))
-
-                # Look back at the previous received packet to check for gaps/duplicates
-                # Only if we've already received some packets
-                if len(received_packet_list) > 0:
-                    prev_payload, prev_time = received_packet_list[-1]
-
-                    if prev_payload == curr_payload:
-                        # Duplicate packet detected, increment the counter
-                        duplicate_packet_list.append((curr_payload, curr_time))
-                    if prev_payload + 1 < curr_payload:
-                        # Non-sequential packets indicate a disruption
-                        disruption_dict = {
-                            'start_time': prev_time,
-                            'end_time': curr_time,
-                            'start_id': prev_payload,
-                            'end_id': curr_payload
-                        }
-                        disruption_ranges.append(disruption_dict)
-
-                # Save packets as (payload_id, timestamp) tuples
-                # for easier timing calculations later
-                received_packet_list.append((curr_payload, curr_time))
+
+            # This is a received packet.
+            curr_time = timestamps[packet]
+            curr_payload = seqs[packet]
+
+            # Look back at the previous received packet to check for gaps/duplicates
+            # Only if we've already received some packets
+            if len(received_packet_list) > 0:
+                prev_payload, prev_time = received_packet_list[-1]
+
+                if prev_payload == curr_payload:
+                    # Duplicate packet detected, increment the counter
+                    duplicate_packet_list.append((curr_payload, curr_time))
+                if prev_payload + 1 < curr_payload:
+                    # Non-sequential packets indicate a disruption
+                    disruption_dict = {
+                        'start_time': prev_time,
+                        'end_time': curr_time,
+                        'start_id': prev_payload,
+                        'end_id': curr_payload
+                    }
+                    disruption_ranges.append(disruption_dict)
+
+            # Save packets as (payload_id, timestamp) tuples
+            # for easier timing calculations later
+            received_packet_list.append((curr_payload, curr_time))
 
         if len(received_packet_list) == 0:
             logger.error("Sniffer failed to filter any traffic from DUT")
@@ -846,29 +1030,9 @@ class DualTorIO:
         }
 
         if num_sent_packets < self.packets_sent_per_server.get(server_ip):
-            server_addr = self.get_server_address(packet)
             logger.error('Not all sent packets were captured. '
                          'Something went wrong!')
             logger.error('Dumping server {} results and continuing:\n{}'
-                         .format(server_addr, json.dumps(result, indent=4)))
+                         .format(server_ip, json.dumps(result, indent=4)))
 
         return result
-
-    def check_tcp_payload(self, packet):
-        """
-        @summary: Helper method
-
-        Returns: Bool: True if a packet is not corrupted and has a valid TCP
-            sequential TCP Payload
-        """
-        try:
-            payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-            if six.PY2:
-                int(payload_bytes.replace('X', '')) in range(
-                    self.packets_to_send)
-            else:
-                int(payload_bytes.decode().replace('X', '')) in range(
-                    self.packets_to_send)
-            return True
-        except Exception:
-            return False
@@ -1,4 +1,5 @@
 import multiprocessing.pool
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.pool import ThreadPool
 from typing import List
 
@@ -78,3 +79,52 @@ class SafeThreadPoolExecutor:
         self.shutdown(wait=True)
         # Returning False to ensure that any exception in the "with" statement is not suppressed.
         return False
+
+
+# Default maximum number of concurrent calls of fanout()
+DEFAULT_FANOUT_WORKERS = 8
+
+
+class FanoutError(Exception):
+    """
+    Raised by fanout() when more than one call failed.
+
+    Attributes:
+        errors: list of (item, exception) tuples of the failed calls, in the order of the items.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(FanoutError, self).__init__("{} calls failed:\n{}".format(
+            len(errors), "\n".join("{}: {}".format(item, repr(error)) for item, error in errors)))
+
+
+def fanout(fn, items, max_workers=DEFAULT_FANOUT_WORKERS):
+    """
+    Call fn(item) for each of the items concurrently, with at most `max_workers` calls running at the same time.
+
+    Example Usage:
+
+    results = fanout(lambda duthost: duthost.shell("uptime"), duthosts)
+
+    Behavior Summary:
+      1. The results are returned in a list in the order of the items, regardless of the order the calls finish.
+      2. All the calls are run even if some of them fail.
+      3. If a single call fails, its exception is re-raised as is. If more calls fail, a FanoutError holding all
+         the exceptions is raised.
+      4. With `max_workers` of 1 or less, or a single item, the calls are run one by one in the calling thread,
+         stopping at the first failure.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(fn, item) for item in items]
+
+    errors = [(item, future.exception()) for item, future in zip(items, futures) if future.exception() is not None]
+    if len(errors) == 1:
+        raise errors[0][1]
+    if errors:
+        raise FanoutError(errors)
+    return [future.result() for future in futures]
@@ -3,9 +3,13 @@
 This plugin supports adding any mark to specified test cases based on conditions. All the information of test cases,
 marks, and conditions can be specified in a centralized file.
 """
+import hashlib
+import importlib.util
 import json
 import logging
+import marshal
 import os
+import pickle
 import re
 import subprocess
 import yaml
@@ -14,12 +18,14 @@ import pytest
 
 from tests.common.testbed import TestbedInfo
 from .issue import check_issues
-from tests.common.utilities import get_duts_from_host_pattern
+from tests.common.utilities import get_duts_from_host_pattern, get_inventory_files
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CONDITIONS_FILE = 'common/plugins/conditional_mark/tests_mark_conditions*.yaml'
 ASIC_NAME_PATH = '/../../../../ansible/group_vars/sonic/variables'
+CONDITIONS_BUNDLE_DIR = 'conditional_mark'
+CONDITIONS_BUNDLE_VERSION = 1
 MARK_CONDITIONS_CONSTANTS = {
     "QOS_SAI_TOPO": ['t0', 't0-64', 't0-116', 't0-118', 't0-35', 't0-56', 't0-80',
                      't0-standalone-32', 't0-standalone-64', 't0-standalone-128', 't0-standalone-256',
@@ -66,17 +72,15 @@ def pytest_addoption(parser):
              "by default it will not use the static reason specified in the mark conditions file")
 
 
-def load_conditions(session):
-    """Load the content from mark conditions file
+def get_conditions_files(session):
+    """Get the paths of the mark conditions files to load
 
     Args:
         session (obj): The pytest session object.
 
     Returns:
-        dict or None: Return the mark conditions dict or None if there something went wrong.
+        list: The existing mark conditions files.
     """
-    conditions_list = list()
-
     conditions_files = session.config.option.mark_conditions_files
     for condition in conditions_files:
         if '*' in condition:
@@ -92,7 +96,21 @@ def load_conditions(session):
     conditions_files = [f for f in conditions_files if os.path.exists(f)]
     if not conditions_files:
         pytest.fail('There is no conditions files')
+    return conditions_files
+
+
+def load_conditions(session):
+    """Load the content from mark conditions file
+
+    Args:
+        session (obj): The pytest session object.
+
+    Returns:
+        dict or None: Return the mark conditions dict or None if there something went wrong.
+    """
+    conditions_list = list()
 
+    conditions_files = get_conditions_files(session)
     try:
         logger.debug('Trying to load test mark conditions files: {}'.format(conditions_files))
         for conditions_file in conditions_files:
@@ -180,13 +198,28 @@ def get_dut_name(session):
     return dut_name
 
 
+def get_basic_facts_signature(session, dut_name):
+    """Get the signature of the testbed and inventory the basic facts are loaded from."""
+    option = session.config.option
+    inventory_dir = os.path.join(os.path.dirname(__file__), '../../../../ansible')
+    inv_files = list(get_inventory_files(session))
+    if option.customize_inventory_file:
+        inv_files.append(os.path.join(inventory_dir, option.customize_inventory_file))
+    files_digest = get_files_digest([f for f in [option.testbed_file] + inv_files if f])
+    return [dut_name, option.testbed, option.customize_inventory_file, files_digest,
+            session.config.getoption("--dut_vendor", "sonic"), session.config.getoption("--enable_macsec", False)]
+
+
 def get_basic_facts(session):
     dut_name = get_dut_name(session)
     cached_facts_name = f'BASIC_FACTS_{dut_name}'
+    cached_signature_name = f'BASIC_FACTS_SIGNATURE_{dut_name}'
+    signature = get_basic_facts_signature(session, dut_name)
     basic_facts_cached = session.config.cache.get(cached_facts_name, None)
-    if not basic_facts_cached:
+    if not basic_facts_cached or session.config.cache.get(cached_signature_name, None) != signature:
         basic_facts = load_basic_facts(dut_name, session)
         session.config.cache.set(cached_facts_name, basic_facts)
+        session.config.cache.set(cached_signature_name, signature)
 
 
 def get_http_proxies(inv_name):
@@ -423,6 +456,159 @@ def load_basic_facts(dut_name, session):
     return results
 
 
+class ConditionsIndex(object):
+    """Precompiled index of the mark conditions entries for finding the entries matching a test case.
+
+    Literal entries are stored in a prefix trie, so all the entries which are prefixes of a test case name are found
+    in one walk along the name. Entries with 'regex: true' are compiled once, and combined into a single regex used
+    to skip them all when none of them matches.
+    """
+
+    ENTRIES = None  # Key of the entry indices in a trie node
+
+    def __init__(self, conditions):
+        self.trie = {}
+        self.regexes = []
+        self.use_longest = set()
+
+        for index, condition in enumerate(conditions):
+            # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry]
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    self.regexes.append((index, re.compile(condition_entry)))
+                continue
+
+            if "use_longest" in condition_items.keys():
+                assert isinstance(condition_items["use_longest"], bool), \
+                    "The value of 'use_longest' in the mark conditions yaml should be bool type."
+                if condition_items["use_longest"] is True:
+                    self.use_longest.add(index)
+
+            node = self.trie
+            for char in condition_entry:
+                node = node.setdefault(char, {})
+            node.setdefault(self.ENTRIES, []).append(index)
+
+        self.combined_regex = None
+        if self.regexes and all(regex.groups == 0 for _, regex in self.regexes):
+            # Without groups, there is no backreference that could be broken by combining the regexes
+            self.combined_regex = re.compile("|".join("(?:{})".format(regex.pattern) for _, regex in self.regexes))
+
+    def match(self, nodeid):
+        """Find the indices of the entries matching the test case name, in the order of the conditions list."""
+        matches = []
+        node = self.trie
+        matches.extend(node.get(self.ENTRIES, []))
+        for char in nodeid:
+            node = node.get(char)
+            if node is None:
+                break
+            matches.extend(node.get(self.ENTRIES, []))
+
+        if self.regexes and (self.combined_regex is None or self.combined_regex.search(nodeid)):
+            matches.extend(index for index, regex in self.regexes if regex.search(nodeid))
+
+        matches.sort()
+        return matches
+
+
+_conditions_index = (None, None)
+
+
+def get_conditions_index(conditions):
+    """Get the index of the conditions list, the index is built once and reused for the same list."""
+    global _conditions_index
+    if _conditions_index[0] is not conditions:
+        _conditions_index = (conditions, ConditionsIndex(conditions))
+    return _conditions_index[1]
+
+
+def get_files_digest(files):
+    """Get the digest of the content of the files, missing files are included by their names only."""
+    digest = hashlib.sha1()
+    for path in files:
+        digest.update(path.encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except (IOError, OSError):
+            digest.update(b'<missing>')
+    return digest.hexdigest()
+
+
+def load_conditions_bundle(session):
+    """Load the mark conditions from the compiled bundle in the pytest cache, or from the conditions files.
+
+    The bundle holds the parsed conditions, their index and the compiled condition strings. It is reused as long as
+    the content of the conditions files is unchanged, and rebuilt otherwise.
+
+    Args:
+        session (obj): The pytest session object.
+
+    Returns:
+        list: The mark conditions list.
+    """
+    global _conditions_index
+    conditions_files = get_conditions_files(session)
+    # The compiled conditions are marshalled code objects, only loadable by the same Python version
+    signature = [CONDITIONS_BUNDLE_VERSION, importlib.util.MAGIC_NUMBER, get_files_digest(sorted(conditions_files))]
+    bundle_file = os.path.join(str(session.config.cache.mkdir(CONDITIONS_BUNDLE_DIR)), 'bundle.pickle')
+
+    try:
+        with open(bundle_file, 'rb') as f:
+            bundle = pickle.load(f)
+        if bundle['signature'] == signature:
+            logger.debug('Loaded test mark conditions bundle: {}'.format(bundle_file))
+            _compiled_conditions.update(marshal.loads(bundle['compiled_conditions']))
+            _conditions_index = (bundle['conditions'], bundle['index'])
+            return bundle['conditions']
+    except Exception as e:
+        logger.debug('Unable to use test mark conditions bundle {}: {}'.format(bundle_file, repr(e)))
+
+    conditions = load_conditions(session)
+    index = get_conditions_index(conditions)
+    for condition_str in iter_condition_strings(conditions):
+        try:
+            compile_condition(condition_str)
+        except SyntaxError:
+            # Reported when the condition is evaluated
+            pass
+
+    try:
+        bundle = {
+            'signature': signature,
+            'conditions': conditions,
+            'index': index,
+            'compiled_conditions': marshal.dumps(_compiled_conditions),
+        }
+        tmp_file = '{}.{}'.format(bundle_file, os.getpid())
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(bundle, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, bundle_file)
+    except Exception as e:
+        logger.warning('Failed to save test mark conditions bundle {}: {}'.format(bundle_file, repr(e)))
+    return conditions
+
+
+def iter_condition_strings(conditions):
+    """Iterate over all the condition strings in the mark conditions list."""
+    for condition in conditions:
+        for mark_details in list(condition.values())[0].values():
+            if not isinstance(mark_details, dict):
+                continue
+            mark_conditions = mark_details.get('conditions')
+            if isinstance(mark_conditions, list):
+                for condition_str in mark_conditions:
+                    if isinstance(condition_str, str) and condition_str.strip():
+                        yield condition_str
+            elif isinstance(mark_conditions, str) and mark_conditions.strip():
+                yield mark_conditions
+
+
 def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts):
     """Find all matches of the given test case name in the conditions list.
 
@@ -438,30 +624,11 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
-        condition_entry = list(condition.keys())[0]
-        condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
-            else:
-                match = None
-
-        elif "use_longest" in condition_items.keys():
-            assert isinstance(condition_items["use_longest"], bool), \
-                "The value of 'use_longest' in the mark conditions yaml should be bool type."
-            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
-                all_matches = []
-
-            match = nodeid.startswith(condition_entry)
-        else:
-            match = nodeid.startswith(condition_entry)
-
-        if match:
-            all_matches.append(condition)
+    index = get_conditions_index(conditions)
+    for condition_index in index.match(nodeid):
+        if condition_index in index.use_longest:
+            all_matches = []
+        all_matches.append(conditions[condition_index])
 
     for match in all_matches:
         case_starting_substring = list(match.keys())[0]
@@ -542,6 +709,30 @@ def update_issue_status(condition_str, session):
     return condition_str
 
 
+# Condition string => code object, also saved in the conditions bundle
+_compiled_conditions = {}
+
+
+def compile_condition(condition_str):
+    """Compile a condition string to a code object once, it is evaluated for many test cases."""
+    code = _compiled_conditions.get(condition_str)
+    if code is None:
+        code = compile(condition_str, '<condition>', 'eval')
+        _compiled_conditions[condition_str] = code
+    return code
+
+
+# Results of the evaluated raw condition strings, only valid for the basic facts and session they were evaluated with
+_condition_results = {'basic_facts': None, 'session': None, 'results': {}}
+
+
+def get_condition_results(basic_facts, session):
+    """Get the memoized results of the conditions evaluated with the basic facts and session."""
+    if _condition_results['basic_facts'] is not basic_facts or _condition_results['session'] is not session:
+        _condition_results.update({'basic_facts': basic_facts, 'session': session, 'results': {}})
+    return _condition_results['results']
+
+
 def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session):
     """Evaluate a condition string based on supplied basic facts.
 
@@ -561,25 +752,29 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
     if condition is None or condition.strip() == '':
         return True    # Empty condition item will be evaluated as True. Equivalent to be ignored.
 
-    condition_str = update_issue_status(condition, session)
-    try:
-        safe_facts = {k: v for k, v in basic_facts.items()}
-        safe_globals = {}
-        safe_globals.update(safe_facts)
+    results = get_condition_results(basic_facts, session)
+    condition_result = results.get(condition)
+    if condition_result is None:
+        condition_str = update_issue_status(condition, session)
+        try:
+            safe_facts = {k: v for k, v in basic_facts.items()}
+            safe_globals = {}
+            safe_globals.update(safe_facts)
 
-        for var in ["asic_type"]:
-            if var not in safe_globals:
-                safe_globals[var] = None
+            for var in ["asic_type"]:
+                if var not in safe_globals:
+                    safe_globals[var] = None
 
-        condition_result = bool(eval(condition_str, safe_globals))
+            condition_result = bool(eval(compile_condition(condition_str), safe_globals))
+        except Exception:
+            raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
+                condition,
+                condition_str))
+        results[condition] = condition_result
 
-        if condition_result and dynamic_update_skip_reason:
-            mark_details['reason'].append(condition)
-        return condition_result
-    except Exception:
-        raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
-            condition,
-            condition_str))
+    if condition_result and dynamic_update_skip_reason:
+        mark_details['reason'].append(condition)
+    return condition_result
 
 
 def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, basic_facts,
@@ -621,22 +816,23 @@ def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, ba
 def pytest_collection(session):
     """Hook for loading conditions and basic facts.
 
-    The pytest session.config.cache is used for caching loaded conditions and basic facts for later use.
+    The pytest session.config.cache is used for caching the compiled conditions bundle and basic facts across
+    sessions. Both are reused only when the files they are loaded from are unchanged.
 
     Args:
         session (obj): Pytest session object.
     """
 
     # Always clear cached conditions of previous run.
-    session.config.cache.set('TESTS_MARK_CONDITIONS', None)
+    session.config.mark_conditions = None
 
     if session.config.option.ignore_conditional_mark:
         logger.info('Ignore conditional mark')
         return
 
-    conditions = load_conditions(session)
+    conditions = load_conditions_bundle(session)
     if conditions:
-        session.config.cache.set('TESTS_MARK_CONDITIONS', conditions)
+        session.config.mark_conditions = conditions
 
         # Only load basic facts if conditions are defined.
         get_basic_facts(session)
@@ -650,7 +846,7 @@ def pytest_collection_modifyitems(session, config, items):
         config (obj): Pytest config object.
         items (obj): List of pytest Item objects.
     """
-    conditions = config.cache.get('TESTS_MARK_CONDITIONS', None)
+    conditions = getattr(config, 'mark_conditions', None)
     if not conditions:
         logger.debug('No mark condition is defined')
         return
@@ -292,6 +292,35 @@ class TestFindAllMatches(unittest.TestCase):
         self.assertEqual(len(marks_found), 1)
         self.assertIn('xfail', marks_found)
 
+    # Test case: regex entry matches anywhere in the test case name
+    def test_regex_match(self):
+        conditions, session_mock = load_test_conditions()
+        nodeid = "test_conditional_regex.py::test_mark[IPv6-1]"
+
+        marks_found = []
+        matches = find_all_matches(nodeid, conditions, session_mock, DYNAMIC_UPDATE_SKIP_REASON, CUSTOM_BASIC_FACTS)
+
+        for match in matches:
+            for mark_name, mark_details in list(list(match.values())[0].items()):
+                if mark_name == "regex":
+                    continue
+                marks_found.append(mark_name)
+
+                if mark_name == "skip":
+                    self.assertEqual(mark_details.get("reason"), "Skip test_conditional_regex.py::test_mark IPv6")
+
+        self.assertEqual(len(marks_found), 1)
+        self.assertIn('skip', marks_found)
+
+    # Test case: entry with 'regex: False' never matches
+    def test_regex_false_no_match(self):
+        conditions, session_mock = load_test_conditions()
+        nodeid = "test_conditional_regex.py::test_mark[IPv4-1]"
+
+        matches = find_all_matches(nodeid, conditions, session_mock, DYNAMIC_UPDATE_SKIP_REASON, CUSTOM_BASIC_FACTS)
+
+        self.assertFalse(matches)
+
 
 if __name__ == "__main__":
     unittest.main()
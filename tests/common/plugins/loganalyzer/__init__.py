@@ -14,6 +14,10 @@ def pytest_addoption(parser):
                      help="store loganalyzer errors")
     parser.addoption("--ignore_la_failure", action="store_true", default=False,
                      help="do not fail the test if new bugs were found")
+    parser.addoption("--loganalyzer_incremental", action="store_true", default=False,
+                     help="extract only the syslog appended since the checkpoint saved on the DUT by loganalyzer init")
+    parser.addoption("--loganalyzer_remote", action="store_true", default=False,
+                     help="analyze the extracted logs on the DUT, only the matched lines are sent to the test server")
     parser.addoption("--loganalyzer_rotate_logs", action="store_true", default=True,
                      help="rotate log on all the dut engines at the beginning of the log analyzer fixture")
     parser.addoption("--bug_handler_params", action="store", default=None,
@@ -1,7 +1,10 @@
+import gzip
+import hashlib
 import json
 import logging
 import os
 import re
+import shlex
 import time
 import pprint
 import shutil
@@ -10,6 +13,7 @@ from . import system_msg_handler
 from .bug_handler_helper import get_bughandler_instance, BugHandler
 
 from .system_msg_handler import AnsibleLogAnalyzer as ansible_loganalyzer
+from .system_msg_handler import MessagePatternSet, find_unused_regex
 from os.path import join, split
 
 ANSIBLE_LOGANALYZER_MODULE = system_msg_handler.__file__.replace(r".pyc", ".py")
@@ -17,6 +21,18 @@ COMMON_MATCH = join(split(__file__)[0], "loganalyzer_common_match.txt")
 COMMON_IGNORE = join(split(__file__)[0], "loganalyzer_common_ignore.txt")
 COMMON_EXPECT = join(split(__file__)[0], "loganalyzer_common_expect.txt")
 SYSLOG_TMP_FOLDER = "/tmp/syslog"
+COMMON_REGEX_CACHE_KEY = "loganalyzer/common_regex"
+
+
+def _common_config_digest():
+    """
+    Get digest of the common match/ignore/expect files, used to validate the cached regular expressions.
+    """
+    digest = hashlib.sha1()
+    for path in (COMMON_MATCH, COMMON_IGNORE, COMMON_EXPECT):
+        with open(path, "rb") as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()
 
 
 class DisableLogrotateCronContext:
@@ -81,6 +97,8 @@ class LogAnalyzer:
         ansible_host.loganalyzer = self
         self.dut_run_dir = dut_run_dir
         self.extracted_syslog = os.path.join(self.dut_run_dir, "syslog")
+        # extract_log module saves the syslog compressed, the incremental extraction saves it as is
+        self.extracted_syslog_compressed = False
         self.marker_prefix = marker_prefix.replace(' ', '_')
         # use existing syslog msg as marker to search in logs instead of writing a new one
         self.start_marker = start_marker
@@ -93,6 +111,8 @@ class LogAnalyzer:
         self._markers = []
         self.fail = True
         self.store_la_logs = False
+        self.incremental = False
+        self.remote_analysis = False
 
         self.additional_files = list(additional_files.keys())
         self.additional_start_str = list(additional_files.values())
@@ -101,6 +121,8 @@ class LogAnalyzer:
             # override the fail and store_la_logs if they are set in the request config options
             self.fail = not (self.request.config.getoption("--ignore_la_failure"))
             self.store_la_logs = self.request.config.getoption("--store_la_logs")
+            self.incremental = self.request.config.getoption("--loganalyzer_incremental")
+            self.remote_analysis = self.request.config.getoption("--loganalyzer_remote")
 
         self._la_logs_dir = "/tmp/loganalyzer/{}".format(self.ansible_host.hostname)
         self.bughandler = bughandler
@@ -119,6 +141,28 @@ class LogAnalyzer:
         logging.debug("Adding end marker '{}'".format(marker))
         self.ansible_host.command(cmd)
 
+    def _extract_incremental_log(self, marker):
+        """
+        @summary: Add stop marker into syslog on the DUT and extract syslog appended since the checkpoint
+                  saved by "init".
+
+        @return: True if syslog was extracted, False if it has to be extracted by extract_log module.
+        """
+        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+
+        cmd = "python {run_dir}/loganalyzer.py --action extract_incremental --run_id {marker} --out_dir {run_dir}"\
+            .format(run_dir=self.dut_run_dir, marker=marker)
+
+        logging.debug("Adding end marker '{}' and extracting syslog since checkpoint".format(marker))
+        stdout_lines = self.ansible_host.command(cmd)["stdout_lines"]
+        try:
+            extracted = json.loads(stdout_lines[-1])["extracted"]
+        except (IndexError, ValueError, KeyError):
+            extracted = False
+        if not extracted:
+            logging.debug("Syslog checkpoint is not available, fall back to extract_log")
+        return extracted
+
     def __call__(self, **kwargs):
         """
         Pass additional arguments when the instance is called
@@ -232,11 +276,27 @@ class LogAnalyzer:
         @summary: Load regular expressions from common files, which are located in folder with legacy loganalyzer.
                   Loaded regular expressions are used by "analyze" method
                   to match expected text in the downloaded log file.
+                  Parsed expressions are kept in the pytest cache until the common files change.
         """
-        self.match_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_MATCH])[1]
-        self.ignore_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_IGNORE])[1]
-        self.expect_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_EXPECT])[1]
-        logging.debug('Loaded common config.')
+        cache = getattr(self.request.session.config, "cache", None) if self.request else None
+        digest = _common_config_digest()
+        common_config = cache.get(COMMON_REGEX_CACHE_KEY, {}) if cache else {}
+
+        if common_config.get("digest") == digest:
+            self.match_regex = common_config["match"]
+            self.ignore_regex = common_config["ignore"]
+            self.expect_regex = common_config["expect"]
+            logging.debug('Loaded common config from cache.')
+        else:
+            self.match_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_MATCH])[1]
+            self.ignore_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_IGNORE])[1]
+            self.expect_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_EXPECT])[1]
+            if cache:
+                cache.set(COMMON_REGEX_CACHE_KEY, {"digest": digest,
+                                                   "match": self.match_regex,
+                                                   "ignore": self.ignore_regex,
+                                                   "expect": self.expect_regex})
+            logging.debug('Loaded common config.')
 
         if self.request:
             extended_ignore_list = self.request.session.config.cache.get("extended_ignore_list", [])
@@ -330,6 +390,8 @@ class LogAnalyzer:
         start_marker = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
         cmd = "python {run_dir}/loganalyzer.py --action init --run_id {start_marker}"\
             .format(run_dir=self.dut_run_dir, start_marker=start_marker)
+        if self.incremental:
+            cmd += " --incremental --out_dir {}".format(self.dut_run_dir)
         if log_files:
             cmd += " --logs {}".format(','.join(log_files))
 
@@ -337,6 +399,57 @@ class LogAnalyzer:
         self.ansible_host.command(cmd)
         return start_marker
 
+    def _extract_additional_files(self, start_string, compress):
+        """
+        @summary: On DUT extract additional log files, each one by its own start string.
+
+        @param start_string: Default start string, used for files without configured start string.
+
+        @param compress: Save the extracted files gzip compressed, with ".gz" suffix.
+        """
+        for idx, path in enumerate(self.additional_files):
+            file_dir, file_name = split(path)
+            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
+            if self.additional_start_str and self.additional_start_str[idx] != '':
+                start_str = self.additional_start_str[idx]
+            else:
+                start_str = start_string
+            if compress:
+                extracted_file_name += ".gz"
+            self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
+                                          target_filename=extracted_file_name, compress=compress)
+
+    def _analyze_on_dut(self, marker, log_files, maximum_log_length=None):
+        """
+        @summary: Analyze the extracted log files on the DUT, only the matched and expected lines are returned.
+
+        The regular expressions are copied to the DUT in a file named by their digest, so they are copied
+        only once while they don't change.
+
+        @param marker: Marker obtained from "init" method.
+        @param log_files: Paths of the extracted log files on the DUT.
+        @param maximum_log_length: The long message (length > maximum_log_length) will be skipped.
+        @return: Dictionary of log file path: [matching lines, expected lines], as from analyze_file_list.
+        """
+        patterns = json.dumps({"match": self.match_regex, "ignore": self.ignore_regex, "expect": self.expect_regex},
+                              sort_keys=True)
+        patterns_file = os.path.join(self.dut_run_dir, "loganalyzer.patterns.{}.json".format(
+            hashlib.sha1(patterns.encode("utf-8")).hexdigest()))
+        cmd = "python {run_dir}/loganalyzer.py --action analyze_remote --run_id {marker} --logs {logs} " \
+              "--patterns_file {patterns_file}".format(run_dir=self.dut_run_dir, marker=marker,
+                                                       logs=",".join(log_files), patterns_file=patterns_file)
+        if self.start_marker:
+            cmd += " --start_marker {}".format(shlex.quote(self.start_marker))
+        if maximum_log_length is not None:
+            cmd += " --maximum_log_length {}".format(maximum_log_length)
+
+        logging.debug("Analyze files {} on DUT".format(log_files))
+        response = json.loads(self.ansible_host.command(cmd)["stdout_lines"][-1])
+        if not response["patterns_found"]:
+            self.ansible_host.copy(content=patterns, dest=patterns_file)
+            response = json.loads(self.ansible_host.command(cmd)["stdout_lines"][-1])
+        return response["result"]
+
     def analyze(self, marker, fail=None, maximum_log_length=None, store_la_logs=None):
         """
         @summary: Extract syslog logs based on the start/stop markers and compose one file.
@@ -369,53 +482,42 @@ class LogAnalyzer:
         else:
             start_string = self.start_marker
 
-        with DisableLogrotateCronContext(self.ansible_host):
-            # Add end marker into DUT syslog
-            self._add_end_marker(marker)
-
-            # On DUT extract syslog files from /var/log/ and create one file by location - /tmp/syslog
-            self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
-                                          target_filename=self.extracted_syslog)
-            for idx, path in enumerate(self.additional_files):
-                file_dir, file_name = split(path)
-                extracted_file_name = os.path.join(self.dut_run_dir, file_name)
-                if self.additional_start_str and self.additional_start_str[idx] != '':
-                    start_str = self.additional_start_str[idx]
-                else:
-                    start_str = start_string
-                self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
-                                              target_filename=extracted_file_name)
-
-        # Download extracted logs from the DUT to the temporal folder defined in SYSLOG_TMP_FOLDER
-        self.save_extracted_log(dest=tmp_folder)
-        file_list = [tmp_folder]
-
-        for path in self.additional_files:
-            file_dir, file_name = split(path)
-            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
-            tmp_folder = ".".join((extracted_file_name, timestamp))
-            self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
-            file_list.append(tmp_folder)
-
-        match_messages_regex = re.compile('|'.join(self.match_regex)) if len(self.match_regex) else None
-        ignore_messages_regex = re.compile('|'.join(self.ignore_regex)) if len(self.ignore_regex) else None
-        expect_messages_regex = re.compile('|'.join(self.expect_regex)) if len(self.expect_regex) else None
-
-        logging.debug("Analyze files {}".format(file_list))
-        logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
-        logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
-        logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
-        analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
-            file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-            maximum_log_length=maximum_log_length)
-        # Print file content and remove the file
-        for folder in file_list:
-            with open(folder) as fo:
-                logging.debug("{} file content:\n\n{}".format(folder, fo.read()))
-            os.remove(folder)
+        # In incremental mode, only syslog appended since the checkpoint saved by "init" is extracted.
+        # The extraction follows one log rotation, so logrotate does not need to be disabled for it.
+        end_marker_added = False
+        syslog_extracted = False
+        if self.incremental and not self.start_marker:
+            syslog_extracted = self._extract_incremental_log(marker)
+            end_marker_added = True
+
+        if not syslog_extracted or self.additional_files:
+            with DisableLogrotateCronContext(self.ansible_host):
+                if not end_marker_added:
+                    # Add end marker into DUT syslog
+                    self._add_end_marker(marker)
+
+                if not syslog_extracted:
+                    # On DUT extract the syslog window between the start and end markers from /var/log/
+                    # and create one file - /tmp/syslog, saved compressed if it is to be downloaded - /tmp/syslog.gz
+                    result = self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog',
+                                                           start_string=start_string,
+                                                           end_string='end-LogAnalyzer-{}'.format(marker),
+                                                           target_filename=self.extracted_syslog + (
+                                                               "" if self.remote_analysis else ".gz"),
+                                                           compress=not self.remote_analysis)
+                    logging.debug("Extracted syslog ranges {}".format(result.get("manifest")))
+                self._extract_additional_files(start_string, compress=not self.remote_analysis)
+        self.extracted_syslog_compressed = not syslog_extracted and not self.remote_analysis
+
+        if self.remote_analysis:
+            # Analyze the extracted logs on the DUT, nothing is downloaded
+            dut_file_list = [self.extracted_syslog]
+            dut_file_list.extend([os.path.join(self.dut_run_dir, split(path)[1]) for path in self.additional_files])
+            analyzer_parse_result = self._analyze_on_dut(marker, dut_file_list, maximum_log_length=maximum_log_length)
+        else:
+            analyzer_parse_result = self._analyze_locally(tmp_folder, timestamp, maximum_log_length)
 
         expected_lines_total = []
-        unused_regex_messages = []
 
         for key, value in list(analyzer_parse_result.items()):
             matching_lines, expecting_lines = value
@@ -428,12 +530,7 @@ class LogAnalyzer:
             expected_lines_total.extend(expecting_lines)
 
         # Find unused regex matches
-        for regex in self.expect_regex:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
-            else:
-                unused_regex_messages.append(regex)
+        unused_regex_messages = find_unused_regex(self.expect_regex, expected_lines_total)
         analyzer_summary["total"]["expected_missing_match"] = len(unused_regex_messages)
         analyzer_summary["unused_expected_regexp"] = unused_regex_messages
         logging.debug("Analyzer summary: {}".format(pprint.pformat(analyzer_summary)))
@@ -454,20 +551,69 @@ class LogAnalyzer:
             logging.warning("Skip bug handler execution because it is not a valid BugHandler")
         return analyzer_summary
 
+    def _analyze_locally(self, tmp_folder, timestamp, maximum_log_length=None):
+        """
+        @summary: Download the extracted log files from the DUT and analyze them.
+
+        @param tmp_folder: File path to store downloaded syslog.
+        @param timestamp: Suffix of the file paths to store downloaded additional files.
+        @param maximum_log_length: The long message (length > maximum_log_length) will be skipped.
+        @return: Dictionary of log file path: [matching lines, expected lines], as from analyze_file_list.
+        """
+        # Download extracted logs from the DUT to the temporal folder defined in SYSLOG_TMP_FOLDER
+        self.save_extracted_log(dest=tmp_folder)
+        file_list = [tmp_folder]
+
+        for path in self.additional_files:
+            file_dir, file_name = split(path)
+            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
+            tmp_folder = ".".join((extracted_file_name, timestamp))
+            self.save_extracted_file(dest=tmp_folder, src=extracted_file_name + ".gz", compressed=True)
+            file_list.append(tmp_folder)
+
+        match_messages_regex = MessagePatternSet(self.match_regex) if len(self.match_regex) else None
+        ignore_messages_regex = MessagePatternSet(self.ignore_regex) if len(self.ignore_regex) else None
+        expect_messages_regex = MessagePatternSet(self.expect_regex) if len(self.expect_regex) else None
+
+        logging.debug("Analyze files {}".format(file_list))
+        logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
+        logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
+        logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
+        analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
+            file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+            maximum_log_length=maximum_log_length)
+        # Remove the downloaded files
+        for folder in file_list:
+            logging.debug("Analyzed file {}, size {}".format(folder, os.path.getsize(folder)))
+            os.remove(folder)
+        return analyzer_parse_result
+
     def save_extracted_log(self, dest):
         """
         @summary: Download extracted syslog log file to the ansible host.
 
         @param dest: File path to store downloaded log file.
         """
-        self.ansible_host.fetch(dest=dest, src=self.extracted_syslog, flat="yes")
+        if self.extracted_syslog_compressed:
+            self.save_extracted_file(dest=dest, src=self.extracted_syslog + ".gz", compressed=True)
+        else:
+            self.ansible_host.fetch(dest=dest, src=self.extracted_syslog, flat="yes")
 
-    def save_extracted_file(self, dest, src):
+    def save_extracted_file(self, dest, src, compressed=False):
         """
         @summary: Download extracted file to the ansible host.
 
         @param dest: File path to store downloaded file.
 
         @param src: Source path to store downloaded file.
+
+        @param compressed: The source file is gzip compressed, it is decompressed into dest after download.
         """
-        self.ansible_host.fetch(dest=dest, src=src, flat="yes")
+        if not compressed:
+            self.ansible_host.fetch(dest=dest, src=src, flat="yes")
+            return
+
+        self.ansible_host.fetch(dest=dest + ".gz", src=src, flat="yes")
+        with gzip.open(dest + ".gz", "rb") as fi, open(dest, "wb") as fo:
+            shutil.copyfileobj(fi, fo)
+        os.remove(dest + ".gz")
@@ -379,6 +379,9 @@ def reboot(duthost, localhost, reboot_type='cold', delay=10,
         pool.terminate()
         raise Exception(f"dut not start: {err}")
 
+    # The image or configuration may have changed with the reboot, don't use the facts cached before it
+    duthost.refresh_facts_fingerprint()
+
     if return_after_reconnect:
         return
 
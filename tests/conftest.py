@@ -254,6 +254,10 @@ def pytest_addoption(parser):
     #   ansible inventory option #
     ##############################
     parser.addoption("--trim_inv", action="store_true", default=False, help="Trim inventory files")
+    parser.addoption("--persistent_executor", action="store_true", default=False,
+                     help="Run shell and command modules on DUTs over a persistent SSH connection")
+    parser.addoption("--fanout_workers", action="store", type=int, default=8,
+                     help="Maximum number of DUTs or ASICs a delegated call is run on concurrently, 1 to disable")
 
     ##############################
     # gnmi connection options      #
@@ -274,6 +278,9 @@ def pytest_addoption(parser):
                      help="File to store the state of the parallel run")
     parser.addoption("--is_parallel_leader", action="store_true", default=False, help="Is the parallel leader")
     parser.addoption("--parallel_followers", action="store", default=0, type=int, help="Number of parallel followers")
+    parser.addoption("--facts_cache_server", action="store_true", default=False,
+                     help="Share cached facts between processes through a local cache server, "
+                          "enabled by default for parallel run")
     parser.addoption("--parallel_mode", action="store", default=None, type=str,
                      help="Parallel mode to run the test. Either FULL_PARALLEL or RP_FIRST if parallel run enabled")
 
@@ -321,6 +328,9 @@ def pytest_addoption(parser):
 
 
 def pytest_configure(config):
+    if config.getoption("facts_cache_server") or config.getoption("target_hostname"):
+        cache.enable_server()
+
     if config.getoption("enable_macsec"):
         topo = config.getoption("topology")
         if topo is not None and "t2" in topo: